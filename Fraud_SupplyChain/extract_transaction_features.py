@@ -7,56 +7,86 @@ import pandas as pd
 import numpy as np
 from sklearn.preprocessing import LabelEncoder
 import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import data_io, ingest
 
-def load_dataset(file_path):
-    """Load the main dataset"""
+# Raw columns used for fraud detection features
+FEATURE_COLUMNS = [
+    # Fraud indicators
+    'Late_delivery_risk',
+    'Benefit per order',
+    'Order Profit Per Order',
+    'Order Item Profit Ratio',
+    
+    # Transaction values
+    'Sales',
+    'Order Item Total',
+    'Order Item Quantity',
+    'Order Item Discount',
+    'Order Item Discount Rate',
+    
+    # Time features
+    'order month',
+    'order day',
+    'Days for shipping (real)',
+    
+    # Payment & Delivery
+    'Type',
+    'Delivery Status',
+    'Shipping Mode',
+    
+    # Customer info
+    'Customer Segment',
+    'Market',
+    
+    # Product info
+    'Category Name',
+    'Department Name',
+    
+    # Target
+    'Order Status',
+    
+    # Customer ID for grouping
+    'Customer Id'
+]
+
+# Numerical features to aggregate (mean, sum, std, min, max)
+NUMERICAL_FEATURES = [
+    'Late_delivery_risk',
+    'Benefit per order',
+    'Order Profit Per Order',
+    'Order Item Profit Ratio',
+    'Sales',
+    'Order Item Total',
+    'Order Item Quantity',
+    'Order Item Discount',
+    'Order Item Discount Rate',
+    'order month',
+    'order day',
+    'Days for shipping (real)',
+]
+
+# Categorical features (label encoded, aggregated by mode)
+CATEGORICAL_FEATURES = [
+    'Type', 'Delivery Status', 'Shipping Mode',
+    'Customer Segment', 'Market',
+    'Category Name', 'Department Name'
+]
+
+# Rows per chunk for streaming extraction (None = load the whole dataset at once)
+CHUNK_SIZE = None
+
+def load_dataset(file_path, columns=None):
+    """Load the main dataset (only `columns` if given) through the shared ingest cache"""
     print(f"Loading dataset from {file_path}...")
-    df = pd.read_csv(file_path, encoding='latin1')
+    df = ingest.load_raw_dataset(file_path, columns=columns)
     print(f"Dataset loaded: {df.shape[0]} rows, {df.shape[1]} columns")
     return df
 
 def select_features(df):
     """Select relevant features for fraud detection"""
-    
-    # Define feature columns
-    feature_columns = [
-        # Fraud indicators
-        'Late_delivery_risk',
-        'Benefit per order',
-        'Order Profit Per Order',
-        'Order Item Profit Ratio',
-        
-        # Transaction values
-        'Sales',
-        'Order Item Total',
-        'Order Item Quantity',
-        'Order Item Discount',
-        'Order Item Discount Rate',
-        
-        # Time features
-        'order month',
-        'order day',
-        'Days for shipping (real)',
-        
-        # Payment & Delivery
-        'Type',
-        'Delivery Status',
-        'Shipping Mode',
-        
-        # Customer info
-        'Customer Segment',
-        'Market',
-        
-        # Product info
-        'Category Name',
-        'Department Name',
-        
-        # Target
-        'Order Status',
-        
-        # Customer ID for grouping
-        'Customer Id'
-    ]
+    feature_columns = FEATURE_COLUMNS
     
     # Check which columns exist
     missing_cols = [col for col in feature_columns if col not in df.columns]
@@ -73,11 +103,7 @@ def encode_categorical(df):
     """Encode categorical variables"""
     print("\nEncoding categorical variables...")
     
-    categorical_cols = [
-        'Type', 'Delivery Status', 'Shipping Mode',
-        'Customer Segment', 'Market', 
-        'Category Name', 'Department Name'
-    ]
+    categorical_cols = CATEGORICAL_FEATURES
     
     # Label encoding for each categorical column
     le_dict = {}
@@ -106,32 +132,36 @@ def create_fraud_label(df):
     
     return df
 
+def categorical_mode(df, group_col, columns):
+    """
+    Most frequent value of each column per group, vectorized
+    
+    Same result as groupby(group_col).agg(lambda x: x.mode()[0]): ties go to the
+    smallest value. Counts come from one bincount over (group, value) codes per column.
+    Output columns are named '<col>_<lambda>' to match the original aggregation.
+    """
+    group_codes, group_index = pd.factorize(df[group_col], sort=True)
+    df_mode = pd.DataFrame(index=pd.Index(group_index, name=group_col))
+    
+    for col in columns:
+        value_codes, values = pd.factorize(df[col], sort=True)
+        num_values = len(values)
+        counts = np.bincount(group_codes * num_values + value_codes,
+                             minlength=len(group_index) * num_values)
+        counts = counts.reshape(len(group_index), num_values)
+        # argmax returns the first maximum, i.e. the smallest value among ties
+        df_mode[f'{col}_<lambda>'] = values.to_numpy()[counts.argmax(axis=1)]
+    
+    return df_mode
+
 def aggregate_by_customer(df):
     """Aggregate features by Customer Id"""
     print("\nAggregating features by customer...")
     
-    # Numerical features to aggregate
-    numerical_features = [
-        'Late_delivery_risk',
-        'Benefit per order',
-        'Order Profit Per Order',
-        'Order Item Profit Ratio',
-        'Sales',
-        'Order Item Total',
-        'Order Item Quantity',
-        'Order Item Discount',
-        'Order Item Discount Rate',
-        'order month',
-        'order day',
-        'Days for shipping (real)',
-    ]
+    numerical_features = NUMERICAL_FEATURES
     
     # Categorical features (already encoded) - take mode
-    categorical_features = [
-        'Type', 'Delivery Status', 'Shipping Mode',
-        'Customer Segment', 'Market',
-        'Category Name', 'Department Name'
-    ]
+    categorical_features = CATEGORICAL_FEATURES
     
     # Aggregation dictionary
     agg_dict = {}
@@ -141,11 +171,6 @@ def aggregate_by_customer(df):
         if col in df.columns:
             agg_dict[col] = ['mean', 'sum', 'std', 'min', 'max']
     
-    # Categorical: mode (most frequent)
-    for col in categorical_features:
-        if col in df.columns:
-            agg_dict[col] = lambda x: x.mode()[0] if len(x.mode()) > 0 else x.iloc[0]
-    
     # Fraud label: max (if any transaction is fraud, customer is fraud)
     agg_dict['is_fraud'] = 'max'
     
@@ -156,6 +181,11 @@ def aggregate_by_customer(df):
     df_agg.columns = ['_'.join(col).strip() if isinstance(col, tuple) else col 
                       for col in df_agg.columns.values]
     
+    # Categorical: mode (most frequent), placed between numerical features and is_fraud
+    categorical_features = [col for col in categorical_features if col in df.columns]
+    df_mode = categorical_mode(df, 'Customer Id', categorical_features)
+    df_agg = pd.concat([df_agg.drop(columns='is_fraud_max'), df_mode, df_agg['is_fraud_max']], axis=1)
+    
     # Rename is_fraud column
     df_agg.rename(columns={'is_fraud_max': 'is_fraud'}, inplace=True)
     
@@ -167,8 +197,97 @@ def aggregate_by_customer(df):
     
     return df_agg
 
-def main():
-    """Main execution"""
+def _chunk_moments(values, customer_ids):
+    """Per-customer count, sum, min, max and M2 (sum of squared deviations) of one chunk"""
+    grouped = values.groupby(customer_ids)
+    part = grouped.agg(['count', 'sum', 'min', 'max'])
+    part['m2'] = (grouped.var(ddof=0) * part['count']).fillna(0.0)
+    return part
+
+def _merge_moments(acc, part):
+    """Combine running and chunk moments per customer (parallel variance update)"""
+    if acc is None:
+        return part
+
+    both = pd.concat([acc, part])
+    grouped = both.groupby(level=0)
+    merged = grouped.agg({'count': 'sum', 'sum': 'sum', 'min': 'min', 'max': 'max'})
+
+    # M2 = sum(M2_i) + sum(n_i * (mean_i - mean)^2)
+    mean = (merged['sum'] / merged['count']).reindex(both.index).to_numpy()
+    shift = (both['count'] * (both['sum'] / both['count'] - mean) ** 2).fillna(0.0)
+    merged['m2'] = (both['m2'] + shift).groupby(level=0).sum()
+    return merged
+
+def aggregate_by_customer_streaming(file_path, chunksize):
+    """
+    Streaming version of select_features -> encode_categorical -> aggregate_by_customer
+
+    Reads the dataset in chunks and keeps per-customer running accumulators
+    (count, sum, M2, min, max per numerical column, value counts per categorical column),
+    so memory grows with the number of customers rather than transactions. Categorical
+    values are label encoded at the end with the classes seen over the whole file, which
+    gives the same codes and modes as the in-memory path.
+    """
+    print(f"Streaming dataset from {file_path} in chunks of {chunksize:,} rows...")
+
+    moments = {}
+    value_counts = {}
+    fraud = None
+    num_rows = 0
+
+    for chunk in ingest.iter_raw_chunks(file_path, columns=FEATURE_COLUMNS, chunksize=chunksize):
+        num_rows += len(chunk)
+        customer_ids = chunk['Customer Id']
+
+        for col in NUMERICAL_FEATURES:
+            if col in chunk.columns:
+                moments[col] = _merge_moments(moments.get(col), _chunk_moments(chunk[col], customer_ids))
+
+        for col in CATEGORICAL_FEATURES:
+            if col in chunk.columns:
+                part = chunk[col].astype(str).groupby(customer_ids).value_counts()
+                value_counts[col] = part if col not in value_counts else value_counts[col].add(part, fill_value=0)
+
+        chunk_fraud = (chunk['Order Status'] == 'SUSPECTED_FRAUD').astype(int).groupby(customer_ids).max()
+        fraud = chunk_fraud if fraud is None else pd.concat([fraud, chunk_fraud]).groupby(level=0).max()
+        print(f"  Processed {num_rows:,} rows, {len(fraud):,} customers so far")
+
+    print(f"Dataset streamed: {num_rows} rows")
+
+    columns = {}
+    for col, stats in moments.items():
+        stats = stats.reindex(fraud.index)
+        columns[f'{col}_mean'] = stats['sum'] / stats['count']
+        columns[f'{col}_sum'] = stats['sum']
+        columns[f'{col}_std'] = np.sqrt(stats['m2'] / (stats['count'] - 1)).where(stats['count'] > 1)
+        columns[f'{col}_min'] = stats['min']
+        columns[f'{col}_max'] = stats['max']
+
+    print("\nEncoding categorical variables...")
+    for col, counts in value_counts.items():
+        le = LabelEncoder()
+        counts = counts.rename('count').reset_index()
+        counts[col] = le.fit_transform(counts[col])
+        print(f"  - {col}: {len(le.classes_)} classes")
+
+        # Mode per customer, ties -> smallest code (same as Series.mode()[0])
+        counts = counts.sort_values(['Customer Id', 'count', col], ascending=[True, False, True])
+        columns[f'{col}_<lambda>'] = counts.drop_duplicates('Customer Id').set_index('Customer Id')[col]
+
+    columns['is_fraud'] = fraud
+    df_agg = pd.DataFrame(columns).reset_index()
+
+    print(f"  Aggregated to {len(df_agg)} unique customers")
+    print(f"  Total features: {df_agg.shape[1] - 2} (excluding Customer Id and is_fraud)")
+
+    return df_agg
+
+def main(fmt=data_io.ARTIFACT_FORMAT, chunksize=CHUNK_SIZE):
+    """
+    Main execution (fmt: 'csv', 'parquet' or 'arrow' for the output file;
+    chunksize: stream the dataset in chunks of this many rows instead of loading it whole)
+    """
     # Paths - adjust based on current directory
     current_dir = os.path.dirname(os.path.abspath(__file__))
     dataset_path = os.path.join(current_dir, '..', 'data', 'DataCoSupplyChainDataset.csv')
@@ -180,24 +299,29 @@ def main():
         print("Please ensure DataCoSupplyChainDataset.csv is in the data/ folder")
         return
     
-    # Step 1: Load dataset
-    df = load_dataset(dataset_path)
-    
-    # Step 2: Select features
-    df = select_features(df)
-    
-    # Step 3: Create fraud label
-    df = create_fraud_label(df)
-    
-    # Step 4: Encode categorical variables
-    df, le_dict = encode_categorical(df)
-    
-    # Step 5: Aggregate by customer
-    df_customer = aggregate_by_customer(df)
+    if chunksize:
+        # Steps 1-5 in one pass over the file, chunk by chunk
+        df_customer = aggregate_by_customer_streaming(dataset_path, chunksize)
+    else:
+        # Step 1: Load dataset
+        df = load_dataset(dataset_path, columns=FEATURE_COLUMNS)
+        
+        # Step 2: Select features
+        df = select_features(df)
+        
+        # Step 3: Create fraud label
+        df = create_fraud_label(df)
+        
+        # Step 4: Encode categorical variables
+        df, le_dict = encode_categorical(df)
+        
+        # Step 5: Aggregate by customer
+        df_customer = aggregate_by_customer(df)
     
-    # Step 6: Save to CSV
+    # Step 6: Save (CSV by default, Parquet/Arrow if requested)
+    output_path = data_io.artifact_path(output_path, fmt)
     print(f"\nSaving transaction features to {output_path}...")
-    df_customer.to_csv(output_path, index=False)
+    data_io.write_table(df_customer, output_path, fmt)
     print(f"Saved {len(df_customer)} customers with {df_customer.shape[1]} columns")
     
     # Show sample
@@ -0,0 +1,397 @@
+"""
+Online Per-Customer Feature Store
+Keeps the running customer aggregates of extract_transaction_features up to date
+one transaction at a time, and serves ready-to-score feature rows for the model
+"""
+
+import pandas as pd
+import numpy as np
+import threading
+import json
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import data_io, ingest
+from extract_transaction_features import (
+    FEATURE_COLUMNS, NUMERICAL_FEATURES, CATEGORICAL_FEATURES, _chunk_moments
+)
+
+# Network features appended after the transaction features (same order as merge_features)
+NETWORK_FEATURES = ['degree_centrality', 'betweenness_centrality',
+                    'closeness_centrality', 'community_id']
+
+# Aggregates per numerical column, in the column order of aggregate_by_customer
+NUMERICAL_STATS = ['mean', 'sum', 'std', 'min', 'max']
+
+# Running accumulators per numerical column: count, sum, M2, min, max
+COUNT, SUM, M2, MIN, MAX = range(5)
+
+# Rows reserved when a store is created (doubled whenever it fills up)
+INITIAL_CAPACITY = 1024
+
+# Customer Id of an unallocated row: rows are allocated in order, so the customer
+# count is the position of the first EMPTY_ID and cannot go out of sync with the arrays
+EMPTY_ID = -1
+
+# Order ids already folded into the store, one per line (retried orders are skipped)
+ORDER_LOG = 'orders.log'
+
+def feature_names():
+    """Column order of a store row: transaction features, then network features"""
+    names = [f'{col}_{stat}' for col in NUMERICAL_FEATURES for stat in NUMERICAL_STATS]
+    names += [f'{col}_<lambda>' for col in CATEGORICAL_FEATURES]
+    return names + NETWORK_FEATURES
+
+def numerical_values(transaction):
+    """
+    Numerical fields of a raw transaction as floats (NUMERICAL_FEATURES order)
+
+    Missing or null fields become NaN; a field that is not a number raises ValueError.
+    """
+    values = np.empty(len(NUMERICAL_FEATURES), dtype=np.float64)
+    for i, col in enumerate(NUMERICAL_FEATURES):
+        value = transaction.get(col)
+        try:
+            values[i] = np.nan if value is None else float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Transaction field '{col}' must be a number, got {value!r}") from None
+    return values
+
+class CustomerFeatureStore:
+    """
+    Memory-mapped per-customer feature store indexed by Customer Id
+
+    Arrays on disk (one .npy each, opened with mmap):
+        ids       (capacity,)                      Customer Id of each row (EMPTY_ID if unused)
+        moments   (capacity, numerical, 5)         count, sum, M2, min, max
+        counts    (capacity, categorical, classes) value counts for the mode
+        features  (capacity, features)             current ready-to-score row
+
+    update() folds one transaction into the accumulators and rewrites only that
+    customer's feature row, so get() is a dictionary lookup plus a row copy.
+    Every access holds the store lock, so reads never see the arrays mid-_grow().
+    Categorical values are encoded with the classes of the batch extraction
+    (sorted strings, as LabelEncoder does); unseen values do not count toward the mode.
+    """
+
+    ARRAY_NAMES = ['ids', 'moments', 'counts', 'features']
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, 'meta.json')) as f:
+            meta = json.load(f)
+
+        self.feature_names = meta['feature_names']
+        self.classes = meta['classes']
+        self._codes = [{value: code for code, value in enumerate(self.classes[col])}
+                       for col in CATEGORICAL_FEATURES]
+        self._lock = threading.Lock()
+        self._open_arrays()
+
+        if 'num_customers' in meta:
+            # Stores built before EMPTY_ID kept the count in meta.json: mark the unused rows
+            self.ids[meta.pop('num_customers'):] = EMPTY_ID
+            self._mmaps['ids'].flush()
+            with open(os.path.join(store_dir, 'meta.json'), 'w') as f:
+                json.dump(meta, f)
+
+        empty = np.flatnonzero(self.ids == EMPTY_ID)
+        self.num_customers = int(empty[0]) if len(empty) else len(self.ids)
+        self._rows = {int(customer_id): row for row, customer_id in enumerate(self.ids[:self.num_customers])}
+
+        self._order_log = os.path.join(store_dir, ORDER_LOG)
+        self._applied_orders = set()
+        if os.path.exists(self._order_log):
+            with open(self._order_log) as f:
+                self._applied_orders = set(f.read().split())
+
+    @classmethod
+    def create(cls, store_dir, classes, capacity=INITIAL_CAPACITY):
+        """
+        Create an empty store
+
+        Args:
+            store_dir: Directory for the arrays and meta.json
+            classes: {categorical column: list of raw values}, encoded in sorted order
+        """
+        os.makedirs(store_dir, exist_ok=True)
+        classes = {col: sorted(str(value) for value in classes[col]) for col in CATEGORICAL_FEATURES}
+        num_classes = max(len(values) for values in classes.values())
+
+        shapes = cls._shapes(capacity, num_classes)
+        for name in cls.ARRAY_NAMES:
+            array = np.lib.format.open_memmap(os.path.join(store_dir, f'{name}.npy'), mode='w+',
+                                              dtype=shapes[name][1], shape=shapes[name][0])
+            cls._reset_rows(name, array, slice(None))
+            array.flush()
+
+        with open(os.path.join(store_dir, 'meta.json'), 'w') as f:
+            json.dump({'feature_names': feature_names(), 'classes': classes}, f)
+
+        return cls(store_dir)
+
+    @staticmethod
+    def _shapes(capacity, num_classes):
+        return {
+            'ids': ((capacity,), np.int64),
+            'moments': ((capacity, len(NUMERICAL_FEATURES), 5), np.float64),
+            'counts': ((capacity, len(CATEGORICAL_FEATURES), num_classes), np.int32),
+            'features': ((capacity, len(feature_names())), np.float64),
+        }
+
+    @staticmethod
+    def _reset_rows(name, array, rows):
+        """Initial values of unused rows"""
+        if name == 'moments':
+            array[rows] = 0.0
+            array[rows, :, MIN] = np.inf
+            array[rows, :, MAX] = -np.inf
+        elif name == 'features':
+            array[rows] = np.nan
+        elif name == 'ids':
+            array[rows] = EMPTY_ID
+        else:
+            array[rows] = 0
+
+    def _open_arrays(self):
+        # Plain ndarray views of the mapped files: same memory, without np.memmap's
+        # per-indexing overhead (the memmap objects are kept for flush)
+        self._mmaps = {name: np.load(os.path.join(self.store_dir, f'{name}.npy'), mmap_mode='r+')
+                       for name in self.ARRAY_NAMES}
+        for name, array in self._mmaps.items():
+            setattr(self, name, array.view(np.ndarray))
+
+    def _grow(self):
+        """Double the capacity (copy each array into a larger file, then swap it in)"""
+        capacity = 2 * len(self.ids)
+        shapes = self._shapes(capacity, self.counts.shape[2])
+        for name in self.ARRAY_NAMES:
+            path = os.path.join(self.store_dir, f'{name}.npy')
+            old = getattr(self, name)
+            new = np.lib.format.open_memmap(f'{path}.tmp', mode='w+',
+                                            dtype=shapes[name][1], shape=shapes[name][0])
+            new[:len(old)] = old
+            self._reset_rows(name, new, slice(len(old), None))
+            new.flush()
+            del new, old
+            setattr(self, name, None)
+            self._mmaps[name] = None
+            os.replace(f'{path}.tmp', path)
+        self._open_arrays()
+
+    def _row(self, customer_id):
+        """Row of customer_id, allocated (reset, then claimed in ids) on first sight"""
+        customer_id = int(customer_id)
+        row = self._rows.get(customer_id)
+        if row is None:
+            if self.num_customers == len(self.ids):
+                self._grow()
+            row = self.num_customers
+            # The row may hold accumulators written before an unclean exit
+            for name in self.ARRAY_NAMES:
+                self._reset_rows(name, getattr(self, name), row)
+            self.ids[row] = customer_id
+            self._rows[customer_id] = row
+            self.num_customers += 1
+        return row
+
+    def _refresh(self, rows):
+        """Recompute the transaction part of the feature rows (one row index or an array of them)"""
+        moments = self.moments[rows]
+        count = moments[..., COUNT]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = moments[..., SUM] / count
+            std = np.where(count > 1, np.sqrt(moments[..., M2] / (count - 1)), np.nan)
+        empty = count == 0
+        stats = np.stack([mean, moments[..., SUM], std,
+                          np.where(empty, np.nan, moments[..., MIN]),
+                          np.where(empty, np.nan, moments[..., MAX])], axis=-1)
+
+        num_numerical = len(NUMERICAL_FEATURES) * len(NUMERICAL_STATS)
+        self.features[rows, :num_numerical] = stats.reshape(stats.shape[:-2] + (-1,))
+        self.features[rows, num_numerical:num_numerical + len(CATEGORICAL_FEATURES)] = \
+            self.counts[rows].argmax(axis=-1)
+
+    def update(self, customer_id, transaction, order_id=None):
+        """
+        Fold one transaction into its customer's aggregates
+
+        Args:
+            customer_id: Customer Id
+            transaction: Raw dataset fields (dict-like with the FEATURE_COLUMNS names);
+                         missing or NaN numerical values are skipped, as in pandas;
+                         a non-numeric value raises ValueError before anything changes
+            order_id: If given, an order already folded into the store is skipped,
+                      so a retried request does not count its transaction twice
+
+        Returns:
+            False if order_id had already been applied, True otherwise
+        """
+        values = numerical_values(transaction)
+        valid = ~np.isnan(values)
+        codes = [self._codes[i].get(str(transaction.get(col))) for i, col in enumerate(CATEGORICAL_FEATURES)]
+
+        with self._lock:
+            if order_id is not None and str(order_id) in self._applied_orders:
+                return False
+            row = self._row(customer_id)
+            moments = np.array(self.moments[row])
+            count, total = moments[:, COUNT], moments[:, SUM]
+
+            # Welford update of M2 around the running mean (columns with a value only)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                old_mean = np.where(count > 0, total / count, values)
+            new_mean = (total + values) / (count + 1)
+            moments[:, M2] += np.where(valid, (values - old_mean) * (values - new_mean), 0.0)
+            moments[:, COUNT] += valid
+            moments[:, SUM] += np.where(valid, values, 0.0)
+            moments[:, MIN] = np.fmin(moments[:, MIN], values)
+            moments[:, MAX] = np.fmax(moments[:, MAX], values)
+            self.moments[row] = moments
+
+            for i, code in enumerate(codes):
+                if code is not None:
+                    self.counts[row, i, code] += 1
+
+            self._refresh(row)
+
+            if order_id is not None:
+                self._applied_orders.add(str(order_id))
+                with open(self._order_log, 'a') as f:
+                    f.write(f'{order_id}\n')
+            return True
+
+    def has_customer(self, customer_id):
+        """True if the store has a row for customer_id"""
+        with self._lock:
+            return int(customer_id) in self._rows
+
+    def update_batch(self, df):
+        """
+        Fold a DataFrame of raw transactions (with 'Customer Id') into the aggregates
+
+        Chunk moments are merged into the running ones with the parallel variance
+        update, so loading history in chunks gives the same rows as aggregate_by_customer.
+        """
+        with self._lock:
+            customer_ids = df['Customer Id'].to_numpy()
+            unique_ids, inverse = np.unique(customer_ids, return_inverse=True)
+            rows = np.array([self._row(customer_id) for customer_id in unique_ids])
+            row_of = pd.Series(rows[inverse], index=df.index)
+
+            for i, col in enumerate(NUMERICAL_FEATURES):
+                if col not in df.columns:
+                    continue
+                part = _chunk_moments(df[col], row_of)
+                part = part[part['count'] > 0]
+                part_rows = part.index.to_numpy()
+                acc = self.moments[part_rows, i]
+
+                # M2 = M2_a + M2_b + (mean_b - mean_a)^2 * n_a * n_b / n
+                n_a, n_b = acc[:, COUNT], part['count'].to_numpy(dtype=np.float64)
+                n = n_a + n_b
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    delta = np.where(n_a > 0, part['sum'].to_numpy() / n_b - acc[:, SUM] / n_a, 0.0)
+                acc[:, M2] += part['m2'].to_numpy() + delta ** 2 * n_a * n_b / n
+                acc[:, COUNT] = n
+                acc[:, SUM] += part['sum'].to_numpy()
+                acc[:, MIN] = np.fmin(acc[:, MIN], part['min'].to_numpy())
+                acc[:, MAX] = np.fmax(acc[:, MAX], part['max'].to_numpy())
+                self.moments[part_rows, i] = acc
+
+            for i, col in enumerate(CATEGORICAL_FEATURES):
+                if col not in df.columns:
+                    continue
+                codes = pd.Categorical(df[col].astype(str), categories=self.classes[col]).codes
+                known = codes >= 0
+                np.add.at(self.counts, (row_of.to_numpy()[known], i, codes[known]), 1)
+
+            self._refresh(rows)
+
+    def set_network_features(self, df_network):
+        """Write network features (Customer Id / customer_id + NETWORK_FEATURES columns)"""
+        if 'customer_id' in df_network.columns:
+            df_network = df_network.rename(columns={'customer_id': 'Customer Id'})
+
+        with self._lock:
+            known = [customer_id in self._rows for customer_id in df_network['Customer Id'].astype(np.int64)]
+            df_network = df_network[known]
+            rows = df_network['Customer Id'].astype(np.int64).map(self._rows).to_numpy()
+            self.features[rows, -len(NETWORK_FEATURES):] = df_network[NETWORK_FEATURES].to_numpy(dtype=np.float64)
+
+    def get(self, customer_id):
+        """
+        Current feature row of a customer (copy), or None if the customer is unknown
+
+        Network features are NaN until set_network_features covers the customer.
+        """
+        with self._lock:
+            row = self._rows.get(int(customer_id))
+            if row is None:
+                return None
+            return np.array(self.features[row])
+
+    def get_many(self, customer_ids):
+        """Feature rows (2D array) for several customers; unknown customers raise KeyError"""
+        with self._lock:
+            rows = [self._rows[int(customer_id)] for customer_id in customer_ids]
+            return np.array(self.features[rows])
+
+    def to_frame(self):
+        """All customers as a DataFrame in the merge_features column layout (without is_fraud)"""
+        with self._lock:
+            features = np.array(self.features[:self.num_customers])
+            ids = np.array(self.ids[:self.num_customers])
+        df = pd.DataFrame(features, columns=self.feature_names)
+        df.insert(0, 'Customer Id', ids)
+        return df
+
+    def flush(self):
+        """Write the arrays to disk (the customer count is read back from ids)"""
+        with self._lock:
+            for array in self._mmaps.values():
+                array.flush()
+
+def build_feature_store(store_dir, dataset_path, network_path=None, chunksize=500_000):
+    """
+    Create a store from the transaction history (and network features, if given)
+
+    Categorical classes come from the whole dataset, like encode_categorical, so the
+    codes match the ones the model was trained on.
+    """
+    print(f"Building feature store in {store_dir}...")
+    df_categorical = ingest.load_raw_dataset(dataset_path, columns=CATEGORICAL_FEATURES)
+    classes = {col: df_categorical[col].astype(str).unique() for col in CATEGORICAL_FEATURES}
+    del df_categorical
+
+    store = CustomerFeatureStore.create(store_dir, classes)
+    num_rows = 0
+    for chunk in ingest.iter_raw_chunks(dataset_path, columns=FEATURE_COLUMNS, chunksize=chunksize):
+        store.update_batch(chunk)
+        num_rows += len(chunk)
+        print(f"  Processed {num_rows:,} rows, {store.num_customers:,} customers so far")
+
+    if network_path is not None:
+        store.set_network_features(data_io.read_table(network_path))
+        print(f"  Network features loaded from {network_path}")
+
+    store.flush()
+    print(f"Feature store ready: {store.num_customers} customers, {len(store.feature_names)} features")
+    return store
+
+def main():
+    """Build the store next to the other feature files"""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    dataset_path = os.path.join(current_dir, '..', 'data', 'DataCoSupplyChainDataset.csv')
+    network_path = os.path.join(current_dir, '..', 'data', 'network_features.csv')
+    store_dir = os.path.join(current_dir, 'data', 'feature_store')
+
+    if not os.path.exists(dataset_path):
+        print(f"Error: Dataset not found at {dataset_path}")
+        return
+
+    build_feature_store(store_dir, dataset_path,
+                        network_path if data_io.table_exists(network_path) else None)
+
+if __name__ == '__main__':
+    main()
@@ -5,18 +5,21 @@ Creates combined dataset for model comparison
 
 import pandas as pd
 import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import data_io
 
 def load_transaction_features(file_path):
     """Load transaction features"""
     print(f"Loading transaction features from {file_path}...")
-    df = pd.read_csv(file_path)
+    df = data_io.read_table(file_path)
     print(f"  Loaded {len(df)} customers with {df.shape[1]} columns")
     return df
 
 def load_network_features(file_path):
     """Load network features"""
     print(f"\nLoading network features from {file_path}...")
-    df = pd.read_csv(file_path)
+    df = data_io.read_table(file_path)
     print(f"  Loaded {len(df)} customers with {df.shape[1]} columns")
     return df
 
@@ -28,6 +31,9 @@ def merge_features(df_transaction, df_network):
     if 'customer_id' in df_network.columns:
         df_network.rename(columns={'customer_id': 'Customer Id'}, inplace=True)
     
+    # Typed formats keep network ids as stored (e.g. strings), CSV re-parses them as ints
+    df_network['Customer Id'] = df_network['Customer Id'].astype(df_transaction['Customer Id'].dtype)
+    
     # Select only network features (exclude is_fraud from network_features)
     network_cols = ['Customer Id', 'degree_centrality', 'betweenness_centrality', 
                     'closeness_centrality', 'community_id']
@@ -54,7 +60,7 @@ def merge_features(df_transaction, df_network):
     
     return df_merged
 
-def save_separate_datasets(df_merged):
+def save_separate_datasets(df_merged, fmt=data_io.ARTIFACT_FORMAT):
     """Save 3 versions: transaction-only, network-only, combined"""
     
     # Identify feature columns
@@ -74,17 +80,17 @@ def save_separate_datasets(df_merged):
     
     # 1. Transaction-only
     df_transaction_only = df_merged[['Customer Id'] + transaction_features + ['is_fraud']].copy()
-    df_transaction_only.to_csv('data/transaction_only.csv', index=False)
-    print(f"  ✅ Transaction-only: {len(transaction_features)} features → data/transaction_only.csv")
+    path = data_io.write_table(df_transaction_only, 'data/transaction_only.csv', fmt)
+    print(f"  ✅ Transaction-only: {len(transaction_features)} features → {path}")
     
     # 2. Network-only
     df_network_only = df_merged[['Customer Id'] + network_features + ['is_fraud']].copy()
-    df_network_only.to_csv('data/network_only.csv', index=False)
-    print(f"  ✅ Network-only: {len(network_features)} features → data/network_only.csv")
+    path = data_io.write_table(df_network_only, 'data/network_only.csv', fmt)
+    print(f"  ✅ Network-only: {len(network_features)} features → {path}")
     
     # 3. Combined
-    df_merged.to_csv('data/combined_features.csv', index=False)
-    print(f"  ✅ Combined: {len(all_features)} features → data/combined_features.csv")
+    path = data_io.write_table(df_merged, 'data/combined_features.csv', fmt)
+    print(f"  ✅ Combined: {len(all_features)} features → {path}")
     
     return {
         'transaction': transaction_features,
@@ -92,20 +98,20 @@ def save_separate_datasets(df_merged):
         'combined': all_features
     }
 
-def main():
-    """Main execution"""
+def main(fmt=data_io.ARTIFACT_FORMAT):
+    """Main execution (fmt: 'csv', 'parquet' or 'arrow' for the 3 output files)"""
     # Paths - adjust based on current directory
     current_dir = os.path.dirname(os.path.abspath(__file__))
     transaction_path = os.path.join(current_dir, 'data', 'transaction_features.csv')
     network_path = os.path.join(current_dir, '..', 'data', 'network_features.csv')
     
     # Check if files exist
-    if not os.path.exists(transaction_path):
+    if not data_io.table_exists(transaction_path):
         print(f"Error: Transaction features not found at {transaction_path}")
         print("Please run extract_transaction_features.py first")
         return
     
-    if not os.path.exists(network_path):
+    if not data_io.table_exists(network_path):
         print(f"Error: Network features not found at {network_path}")
         print("Please ensure network_features.csv exists in data/ folder")
         return
@@ -118,7 +124,7 @@ def main():
     df_merged = merge_features(df_transaction, df_network)
     
     # Step 3: Save 3 versions
-    feature_dict = save_separate_datasets(df_merged)
+    feature_dict = save_separate_datasets(df_merged, fmt)
     
     # Show sample
     print("\nSample of combined features:")
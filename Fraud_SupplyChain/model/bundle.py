@@ -0,0 +1,131 @@
+## Preprocessing + ensemble bundle for inference (scaler, per-seed PCA, threshold)
+
+import numpy as np
+import pandas as pd
+import pickle
+import os
+
+BUNDLE_VERSION = 1
+
+def save_bundle(bundle_path, feature_names, scaler, pcas, seeds, threshold, model_paths):
+    """
+    Save everything inference needs besides the Keras weights
+
+    Args:
+        bundle_path: Output .pkl path (saved next to the .keras files)
+        feature_names: Column order the scaler was fitted on
+        scaler: Fitted StandardScaler
+        pcas: Fitted PCA per seed, same order as seeds
+        seeds: Ensemble seeds
+        threshold: Decision threshold on the averaged probability
+        model_paths: .keras file per seed (stored relative to the bundle directory)
+
+    Returns:
+        bundle_path
+    """
+    bundle_dir = os.path.dirname(os.path.abspath(bundle_path))
+    bundle = {
+        'version': BUNDLE_VERSION,
+        'feature_names': list(feature_names),
+        'scaler': scaler,
+        'pcas': list(pcas),
+        'seeds': list(seeds),
+        'threshold': float(threshold),
+        'model_files': [os.path.relpath(os.path.abspath(path), bundle_dir) for path in model_paths],
+    }
+
+    os.makedirs(bundle_dir, exist_ok=True)
+    with open(bundle_path, 'wb') as f:
+        pickle.dump(bundle, f)
+
+    print(f"Preprocessing bundle saved to: {bundle_path}")
+    return bundle_path
+
+def load_bundle(bundle_path):
+    """Load a bundle saved by save_bundle (no TensorFlow needed)"""
+    with open(bundle_path, 'rb') as f:
+        bundle = pickle.load(f)
+
+    if bundle.get('version') != BUNDLE_VERSION:
+        raise ValueError(f"Unsupported bundle version: {bundle.get('version')}")
+
+    bundle['bundle_dir'] = os.path.dirname(os.path.abspath(bundle_path))
+    return bundle
+
+def load_ensemble(bundle_path):
+    """
+    Load the bundle and its Keras models
+
+    Returns:
+        (bundle, models) - models in the same order as bundle['seeds']
+    """
+    from tensorflow import keras
+
+    bundle = load_bundle(bundle_path)
+    models = [
+        keras.models.load_model(os.path.join(bundle['bundle_dir'], model_file), compile=False)
+        for model_file in bundle['model_files']
+    ]
+    return bundle, models
+
+def load_fused(bundle_path, fused_path):
+    """
+    Load the bundle and the fused ensemble model written by export.py
+
+    Returns:
+        (bundle, fused_model) - fused_model takes scale(bundle, X) and returns the
+        averaged probability in one call
+    """
+    from tensorflow import keras
+
+    return load_bundle(bundle_path), keras.models.load_model(fused_path, compile=False)
+
+def scale(bundle, X):
+    """
+    Scale raw features with the training scaler (NaN/Inf -> 0, as in training)
+
+    Args:
+        bundle: Bundle from load_bundle
+        X: DataFrame with the training feature columns (extra columns are ignored)
+           or array already in bundle['feature_names'] order
+
+    Returns:
+        Scaled feature array (input of the fused model)
+    """
+    if not isinstance(X, pd.DataFrame):
+        X = pd.DataFrame(np.asarray(X, dtype=np.float64), columns=bundle['feature_names'])
+
+    missing = [col for col in bundle['feature_names'] if col not in X.columns]
+    if missing:
+        raise ValueError(f"Missing feature columns: {missing}")
+
+    X_scaled = bundle['scaler'].transform(X[bundle['feature_names']])
+
+    # Same cleaning as training (NaN/Inf -> 0) before PCA
+    return np.nan_to_num(X_scaled, nan=0.0, posinf=0.0, neginf=0.0)
+
+def transform(bundle, X):
+    """
+    Apply the training-time preprocessing to raw features
+
+    Returns:
+        List of PCA inputs, one per model
+    """
+    X_scaled = scale(bundle, X)
+    return [pca.transform(X_scaled) for pca in bundle['pcas']]
+
+def predict_proba(bundle, models, X):
+    """Averaged ensemble fraud probability for raw features X"""
+    inputs = transform(bundle, X)
+    predictions = [m.predict(X_pca, verbose=0).flatten() for m, X_pca in zip(models, inputs)]
+    return np.mean(predictions, axis=0)
+
+def predict(bundle, models, X):
+    """
+    Ensemble prediction with the bundled threshold
+
+    Returns:
+        (labels, probabilities) - label 1 = Fraud
+    """
+    proba = predict_proba(bundle, models, X)
+    return (proba > bundle['threshold']).astype(int), proba
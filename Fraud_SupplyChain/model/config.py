@@ -7,6 +7,9 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 DATA_PATH = os.path.join(current_dir, '..', 'data', 'combined_features.csv')
 MODEL_SAVE_PATH = os.path.join(current_dir, 'combined_model.keras')
 RESULTS_PATH = os.path.join(current_dir, 'results')
+BUNDLE_PATH = os.path.join(current_dir, 'ensemble_bundle.pkl')  # Scaler + per-seed PCA + threshold
+FUSED_MODEL_PATH = os.path.join(current_dir, 'ensemble_fused.keras')  # 3 towers + average in one graph
+NUMPY_MODEL_PATH = os.path.join(current_dir, 'ensemble_numpy.npz')  # Folded weights for numpy_runtime.py
 
 # PCA Components
 N_COMPONENTS = 45  # Increased from 35 to retain more information
@@ -16,11 +19,28 @@ EPOCHS = 100  # Increased from 50 (with early stopping)
 BATCH_SIZE = 32
 VALIDATION_SPLIT = 0.2
 
+# Input pipeline / large-batch training
+USE_TF_DATA = True  # Feed model.fit from a cached, shuffled, prefetched tf.data pipeline
+BASE_LEARNING_RATE = 0.001  # Adam default, tuned at BASE_BATCH_SIZE
+BASE_BATCH_SIZE = 32
+LR_SCALING = 'linear'  # 'linear' or 'sqrt' scaling of the learning rate with BATCH_SIZE, None = fixed
+
 # Evaluation
-THRESHOLD = 0.20  # BEST: Aggressive threshold for maximum Recall (73.08%)
+THRESHOLD = 0.20  # BEST: Aggressive threshold for maximum Recall (73.08%) ('auto' = best F1, 'cost' = min dollar cost)
+FN_DOLLAR_COST = 1000.0  # Missed fraud (see model.cost_sensitive_focal_loss)
+FP_DOLLAR_COST = 20.0  # False alert investigation
+SCORE_HISTOGRAM_PATH = os.path.join(RESULTS_PATH, 'score_histogram.npz')  # Streaming counts for re-tuning
 
 # SMOTE
 SAMPLING_STRATEGY = 1.0  # BEST: Fully balanced training (Fraud = 100% of Not Fraud)
+SMOTE_BACKEND = 'imblearn'  # 'tree' = same samples, chunked/threaded search; 'projection' = approximate, for large data
+# 'projection' trades neighbour recall for speed: ~0.83 recall at 20k rows, ~0.63 at 100k (3.5x faster
+# than 'tree'), tuned by oversample.PROJECTION_N_TREES / PROJECTION_LEAF_SIZE
+SMOTE_N_JOBS = None  # Neighbour-search threads for 'tree' / 'projection' (None = CPU count)
+
+# SMOTE + PCA cache (memory-mapped .npy per data hash / seed / SAMPLING_STRATEGY / SMOTE_BACKEND / N_COMPONENTS)
+USE_PREPROCESS_CACHE = True
+PREPROCESS_CACHE_DIR = os.path.join(current_dir, 'cache')
 
 # Model settings
 USE_FOCAL_LOSS = False  # Disable standard focal loss
@@ -32,6 +52,24 @@ FN_COST = 15.0  # BEST: False Negative costs 15x more than False Positive
 # Ensemble
 USE_ENSEMBLE = True  # Train multiple models with different seeds
 ENSEMBLE_SEEDS = [42, 123, 456]  # 3 random seeds for ensemble
+PARALLEL_TRAINING = False  # Train each seed in its own process (CPU-only machines)
+PARALLEL_JOBS = None  # Number of training processes (None = one per seed, capped at CPU count)
+
+# Hyperparameter sweep (sweep.py)
+SWEEP_TRIALS = 30  # Configurations sampled from sweep.SEARCH_SPACE
+SWEEP_JOBS = None  # Parallel trials (None = CPU count)
+SWEEP_SEED = 42
+SWEEP_RUNGS = [5, 10, 20, 40]  # Epochs at which trials are compared on validation ROC-AUC
+SWEEP_MIN_TRIALS = 3  # Trials needed at a rung before pruning below the median
+SWEEP_RESULTS_PATH = os.path.join(RESULTS_PATH, 'sweep_results.csv')
+
+# Inference server (serve.py)
+SERVE_HOST = '127.0.0.1'
+SERVE_PORT = 8000
+SERVE_MAX_BATCH_SIZE = 256  # Max orders per batched forward pass
+SERVE_MAX_DELAY_MS = 5.0  # Max time a request waits for the batch to fill
+SERVE_USE_FUSED = True  # Serve ensemble_fused.keras when it exists (one forward call per batch)
+FEATURE_STORE_DIR = os.path.join(current_dir, '..', 'data', 'feature_store')  # Per-customer rows (feature_store.py)
 
 # Random state
 RANDOM_STATE = 42
@@ -5,11 +5,16 @@ import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 from imblearn.over_sampling import SMOTE
+import oversample
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common import data_io
 
 def load_data(data_path):
-    """Load combined features dataset"""
-    print(f"Loading data from {data_path}...")
-    df = pd.read_csv(data_path)
+    """Load combined features dataset (CSV, or Parquet/Arrow with the same name)"""
+    print(f"Loading data from {data_io.resolve_path(data_path) or data_path}...")
+    df = data_io.read_table(data_path)
     print(f"Data loaded: {df.shape}")
     return df
 
@@ -49,7 +54,7 @@ def scale_data(X_train, X_test):
     
     return X_train_scaled, X_test_scaled, scaler
 
-def apply_smote(X_train, y_train, random_state=42, sampling_strategy=0.5):
+def apply_smote(X_train, y_train, random_state=42, sampling_strategy=0.5, backend='imblearn', n_jobs=None):
     """
     Apply SMOTE to handle class imbalance
     
@@ -57,7 +62,13 @@ def apply_smote(X_train, y_train, random_state=42, sampling_strategy=0.5):
         sampling_strategy: float, target ratio of minority/majority class
                           0.5 = minority will be 50% of majority (recommended)
                           1.0 = fully balanced (default SMOTE)
+        backend: 'imblearn' (SMOTE), 'tree' (same output, chunked + threaded neighbour
+                 search) or 'projection' (approximate neighbours, for large training sets)
+        n_jobs: Threads for the 'tree' / 'projection' neighbour search (None = CPU count)
     """
+    if backend not in oversample.SMOTE_BACKENDS:
+        raise ValueError(f"Unknown SMOTE backend: {backend!r} (expected one of {oversample.SMOTE_BACKENDS})")
+
     print(f"\nBefore SMOTE: {X_train.shape}")
     print(f"Class distribution: {{0: {(y_train == 0).sum()}, 1: {(y_train == 1).sum()}}}")
     
@@ -77,10 +88,16 @@ def apply_smote(X_train, y_train, random_state=42, sampling_strategy=0.5):
         print("WARNING: Found infinite values in training data. Replacing with 0...")
         X_train = np.nan_to_num(X_train, posinf=0.0, neginf=0.0)
     
-    smote = SMOTE(random_state=random_state, sampling_strategy=sampling_strategy)
-    X_train_res, y_train_res = smote.fit_resample(X_train, y_train)
+    if backend == 'imblearn':
+        smote = SMOTE(random_state=random_state, sampling_strategy=sampling_strategy)
+        X_train_res, y_train_res = smote.fit_resample(X_train, y_train)
+    else:
+        X_train_res, y_train_res = oversample.smote_resample(
+            X_train, y_train, sampling_strategy=sampling_strategy, random_state=random_state,
+            backend=backend, n_jobs=n_jobs
+        )
     
-    print(f"After SMOTE (strategy={sampling_strategy}): {X_train_res.shape}")
+    print(f"After SMOTE (strategy={sampling_strategy}, backend={backend}): {X_train_res.shape}")
     print(f"Class distribution: {{0: {(y_train_res == 0).sum()}, 1: {(y_train_res == 1).sum()}}}")
     
     return X_train_res, y_train_res
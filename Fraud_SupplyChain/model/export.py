@@ -0,0 +1,187 @@
+## Export the ensemble as one fused Keras model (PCA folded into each tower, in-graph average)
+
+import config
+import bundle
+
+import numpy as np
+
+def fold_pca_into_dense(pca, kernel, bias):
+    """
+    Fold a PCA projection into the Dense layer that follows it
+
+    PCA (whiten=False): z = (x - mean) @ components.T
+    Dense:              h = z @ W + b
+                          = x @ (components.T @ W) + (b - mean @ components.T @ W)
+
+    Returns:
+        (kernel, bias) of a Dense layer that takes the scaled features directly
+    """
+    if getattr(pca, 'whiten', False):
+        raise ValueError("Cannot fold a whitened PCA")
+
+    projection = pca.components_.T
+    fused_kernel = projection @ kernel
+    fused_bias = bias - pca.mean_ @ fused_kernel
+    return fused_kernel.astype(kernel.dtype), fused_bias.astype(bias.dtype)
+
+def fold_batchnorm_into_dense(gamma, beta, moving_mean, moving_variance, epsilon, kernel, bias):
+    """
+    Fold an inference-mode BatchNormalization into the Dense layer that follows it
+
+    BN:    y = h * s + t,  s = gamma / sqrt(var + eps),  t = beta - mean * s
+    Dense: y @ W + b = h @ (s[:, None] * W) + (t @ W + b)
+
+    Returns:
+        (kernel, bias) of a Dense layer that takes the pre-BN activations directly
+    """
+    s = gamma / np.sqrt(moving_variance + epsilon)
+    t = beta - moving_mean * s
+    fused_kernel = s[:, None] * kernel
+    fused_bias = t @ kernel + bias
+    return fused_kernel.astype(kernel.dtype), fused_bias.astype(bias.dtype)
+
+def tower_layers(source, pca=None):
+    """
+    Trained Dense stack of one seed model as [(kernel, bias, activation), ...]
+
+    BatchNormalization is folded into the next Dense, Dropout is dropped (identity at
+    inference) and, if given, the PCA projection is folded into the first Dense.
+    """
+    from tensorflow import keras
+
+    layers = []
+    pending_bn = None
+    for layer in source.layers:
+        if isinstance(layer, keras.layers.Dropout):
+            continue
+
+        if isinstance(layer, keras.layers.BatchNormalization):
+            layer_config = layer.get_config()
+            weights = layer.get_weights()
+            # gamma / beta are absent when scale / center are disabled
+            gamma = weights.pop(0) if layer_config.get('scale', True) else None
+            beta = weights.pop(0) if layer_config.get('center', True) else None
+            moving_mean, moving_variance = weights
+            if gamma is None:
+                gamma = np.ones_like(moving_mean)
+            if beta is None:
+                beta = np.zeros_like(moving_mean)
+            pending_bn = (gamma, beta, moving_mean, moving_variance, layer_config['epsilon'])
+            continue
+
+        if not isinstance(layer, keras.layers.Dense):
+            raise ValueError(f"Unsupported layer for export: {layer.name} ({layer.__class__.__name__})")
+
+        kernel, bias = layer.get_weights()
+        if pending_bn is not None:
+            kernel, bias = fold_batchnorm_into_dense(*pending_bn, kernel, bias)
+            pending_bn = None
+        if pca is not None and not layers:
+            kernel, bias = fold_pca_into_dense(pca, kernel, bias)
+
+        layers.append((kernel, bias, layer.get_config()['activation']))
+
+    if pending_bn is not None:
+        raise ValueError("BatchNormalization after the last Dense layer cannot be folded")
+
+    return layers
+
+def build_fused_model(ensemble, models):
+    """
+    One functional model: scaled features -> [tower per seed] -> average
+
+    Each tower reuses the trained weights of its seed model; the first Dense absorbs that
+    seed's PCA. Dropout layers are skipped (identity at inference).
+    """
+    from tensorflow import keras
+
+    inputs = keras.Input(shape=(len(ensemble['feature_names']),), name='features')
+    outputs = []
+
+    for seed, pca, source in zip(ensemble['seeds'], ensemble['pcas'], models):
+        x = inputs
+        first_dense = True
+        for layer in source.layers:
+            if isinstance(layer, keras.layers.Dropout):
+                continue
+
+            layer_config = layer.get_config()
+            layer_config['name'] = f"seed{seed}_{layer.name}"
+            layer_config.pop('batch_input_shape', None)
+            new_layer = layer.__class__.from_config(layer_config)
+            x = new_layer(x)
+
+            weights = layer.get_weights()
+            if first_dense and isinstance(layer, keras.layers.Dense):
+                weights = list(fold_pca_into_dense(pca, weights[0], weights[1]))
+                first_dense = False
+            new_layer.set_weights(weights)
+
+        outputs.append(x)
+
+    averaged = keras.layers.Average(name='ensemble_average')(outputs)
+    return keras.Model(inputs=inputs, outputs=averaged, name='Fused_Ensemble')
+
+def export_fused_model(bundle_path=config.BUNDLE_PATH, output_path=config.FUSED_MODEL_PATH, models=None):
+    """
+    Build and save the fused model next to the bundle
+
+    Args:
+        bundle_path: Bundle saved by main_ensemble.py
+        output_path: Output .keras file
+        models: Already loaded seed models (loaded from the bundle if None)
+
+    Returns:
+        output_path
+    """
+    if models is None:
+        ensemble, models = bundle.load_ensemble(bundle_path)
+    else:
+        ensemble = bundle.load_bundle(bundle_path)
+
+    fused = build_fused_model(ensemble, models)
+    fused.save(output_path)
+
+    print(f"Fused ensemble ({len(models)} towers, PCA folded) saved to: {output_path}")
+    return output_path
+
+def export_numpy_runtime(bundle_path=config.BUNDLE_PATH, output_path=config.NUMPY_MODEL_PATH, models=None):
+    """
+    Dump the ensemble (scaler, folded tower weights, threshold) to one .npz for numpy_runtime.py
+
+    Args:
+        bundle_path: Bundle saved by main_ensemble.py
+        output_path: Output .npz file
+        models: Already loaded seed models (loaded from the bundle if None)
+
+    Returns:
+        output_path
+    """
+    if models is None:
+        ensemble, models = bundle.load_ensemble(bundle_path)
+    else:
+        ensemble = bundle.load_bundle(bundle_path)
+
+    scaler = ensemble['scaler']
+    arrays = {
+        'feature_names': np.array(ensemble['feature_names']),
+        'scaler_mean': np.asarray(scaler.mean_, dtype=np.float64),
+        'scaler_scale': np.asarray(scaler.scale_, dtype=np.float64),
+        'threshold': np.float64(ensemble['threshold']),
+        'seeds': np.array(ensemble['seeds']),
+    }
+    for t, (pca, source) in enumerate(zip(ensemble['pcas'], models)):
+        layers = tower_layers(source, pca)
+        for l, (kernel, bias, activation) in enumerate(layers):
+            arrays[f'tower{t}_kernel{l}'] = kernel.astype(np.float32)
+            arrays[f'tower{t}_bias{l}'] = bias.astype(np.float32)
+        arrays[f'tower{t}_activations'] = np.array([activation for _, _, activation in layers])
+
+    np.savez_compressed(output_path, **arrays)
+
+    print(f"NumPy runtime weights ({len(models)} towers, BN + PCA folded) saved to: {output_path}")
+    return output_path
+
+if __name__ == "__main__":
+    export_fused_model()
+    export_numpy_runtime()
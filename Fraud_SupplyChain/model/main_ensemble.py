@@ -5,12 +5,191 @@ import data_loader
 import model
 import train
 import predict
+import bundle
+import export
+import preprocess_cache
 
 from sklearn.decomposition import PCA
 from sklearn.model_selection import train_test_split
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+import multiprocessing
 import numpy as np
 import os
 
+def resample_and_project(seed, X_train_scaled, y_train, X_test_scaled):
+    """
+    SMOTE + PCA for one seed
+    
+    Returns:
+        (X_train_pca, y_train_res, X_test_pca, fitted PCA)
+    """
+    # Apply SMOTE with this seed
+    X_train_res, y_train_res = data_loader.apply_smote(
+        X_train_scaled, y_train, 
+        random_state=seed,
+        sampling_strategy=config.SAMPLING_STRATEGY,
+        backend=config.SMOTE_BACKEND,
+        n_jobs=config.SMOTE_N_JOBS
+    )
+    
+    # Clean NaN/Inf
+    X_train_res = np.nan_to_num(X_train_res, nan=0.0, posinf=0.0, neginf=0.0)
+    X_test_scaled_clean = np.nan_to_num(X_test_scaled, nan=0.0, posinf=0.0, neginf=0.0)
+    
+    # Apply PCA
+    print(f"\nApplying PCA: {X_train_res.shape[1]} → {config.N_COMPONENTS} components")
+    pca = PCA(n_components=config.N_COMPONENTS, random_state=seed)
+    X_train_pca = pca.fit_transform(X_train_res)
+    X_test_pca = pca.transform(X_test_scaled_clean)
+    
+    return X_train_pca, y_train_res, X_test_pca, pca
+
+def train_seed(seed, X_train_scaled, y_train, X_test_scaled, fit_verbose=1, holdout=None):
+    """
+    SMOTE -> PCA -> train one ensemble member with the given seed
+    
+    holdout: optional (X_scaled, y) kept out of SMOTE; it is projected with this seed's PCA
+    and given to config.EXTRA_CALLBACKS instead of the (resampled) validation split
+    
+    Returns:
+        (trained_model, test probabilities, fitted PCA, saved model path)
+    """
+    if config.USE_PREPROCESS_CACHE:
+        # Skip SMOTE + PCA when data, seed, SAMPLING_STRATEGY, SMOTE_BACKEND and N_COMPONENTS are unchanged
+        X_train_pca, y_train_res, X_test_pca, pca = preprocess_cache.cached_preprocess(
+            lambda: resample_and_project(seed, X_train_scaled, y_train, X_test_scaled),
+            config.PREPROCESS_CACHE_DIR, X_train_scaled, y_train, X_test_scaled,
+            seed, config.SAMPLING_STRATEGY, config.N_COMPONENTS,
+            smote_backend=config.SMOTE_BACKEND
+        )
+    else:
+        X_train_pca, y_train_res, X_test_pca, pca = resample_and_project(
+            seed, X_train_scaled, y_train, X_test_scaled
+        )
+    
+    explained_variance = pca.explained_variance_ratio_.sum()
+    print(f"Explained variance: {explained_variance*100:.2f}%")
+    
+    # Split train/validation
+    X_train_final, X_val, y_train_final, y_val = train_test_split(
+        X_train_pca, y_train_res,
+        test_size=config.VALIDATION_SPLIT,
+        random_state=seed
+    )
+    
+    # Build model with cost-sensitive loss (learning rate scaled to BATCH_SIZE)
+    input_dim = X_train_pca.shape[1]
+    fraud_model = model.build_model(
+        input_dim, 
+        use_focal_loss=config.USE_FOCAL_LOSS,
+        focal_gamma=config.FOCAL_GAMMA,
+        focal_alpha=config.FOCAL_ALPHA,
+        use_cost_sensitive=config.USE_COST_SENSITIVE,
+        fn_cost=config.FN_COST,
+        learning_rate=train.scaled_learning_rate(config)
+    )
+    
+    # Create model-specific save path
+    model_save_path = os.path.join(
+        os.path.dirname(config.MODEL_SAVE_PATH),
+        f'combined_model_seed{seed}.keras'
+    )
+    
+    # Update config for this model
+    class ModelConfig:
+        pass
+    model_config = ModelConfig()
+    for attr in dir(config):
+        if not attr.startswith('_'):
+            setattr(model_config, attr, getattr(config, attr))
+    model_config.MODEL_SAVE_PATH = model_save_path
+    model_config.TRAINING_LOG_PATH = os.path.join(config.RESULTS_PATH, f'training_log_seed{seed}.csv')
+    model_config.FIT_VERBOSE = fit_verbose
+    model_config.SHUFFLE_SEED = seed
+    if holdout is not None:
+        X_holdout, y_holdout = holdout
+        X_holdout = np.nan_to_num(X_holdout, nan=0.0, posinf=0.0, neginf=0.0)
+        model_config.CALLBACK_VALIDATION_DATA = (pca.transform(X_holdout), y_holdout)
+    
+    # Train
+    trained_model, history = train.train_model(
+        fraud_model, X_train_final, y_train_final, X_val, y_val, model_config
+    )
+    
+    # Get predictions on test set
+    y_pred_proba = trained_model.predict(X_test_pca, verbose=0).flatten()
+    
+    return trained_model, y_pred_proba, pca, model_save_path
+
+# Thread pools sized from the environment when numpy / TensorFlow are first imported
+THREAD_ENV_VARS = ['OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS',
+                   'TF_NUM_INTRAOP_THREADS']
+
+@contextmanager
+def training_worker_env(num_threads):
+    """
+    Thread limits in os.environ while spawning training workers, restored afterwards
+    
+    Spawned children inherit os.environ and import numpy / TensorFlow before the pool
+    initializer runs, so the limits must already be in the environment when they start.
+    """
+    env = {var: str(num_threads) for var in THREAD_ENV_VARS}
+    env['TF_NUM_INTEROP_THREADS'] = '1'
+    saved = {var: os.environ.get(var) for var in env}
+    os.environ.update(env)
+    try:
+        yield
+    finally:
+        for var, value in saved.items():
+            if value is None:
+                os.environ.pop(var, None)
+            else:
+                os.environ[var] = value
+
+def _init_training_worker(num_threads):
+    """Limit each training process to its share of the CPU cores"""
+    from threadpoolctl import threadpool_limits
+    import tensorflow as tf
+    
+    # The env vars already sized the pools at import; also cap any BLAS loaded regardless
+    threadpool_limits(limits=num_threads)
+    tf.config.threading.set_intra_op_parallelism_threads(num_threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+def _train_seed_worker(args):
+    """Process pool entry point: the Keras model stays in the worker, only its path is returned"""
+    _, y_pred_proba, pca, model_save_path = train_seed(*args, fit_verbose=2)
+    return y_pred_proba, pca, model_save_path
+
+def train_seeds_parallel(seeds, X_train_scaled, y_train, X_test_scaled, n_jobs=None):
+    """
+    Train one ensemble member per process (spawned, so each loads its own TensorFlow)
+    
+    Each process gets cpu_count // n_jobs threads, so the members share the machine instead
+    of oversubscribing it. Models are reloaded from their checkpoints in this process.
+    
+    Returns:
+        (models, test probabilities, PCAs, model paths) in the order of seeds
+    """
+    from tensorflow import keras
+    
+    n_jobs = min(n_jobs or os.cpu_count() or 1, len(seeds))
+    num_threads = max(1, (os.cpu_count() or 1) // n_jobs)
+    print(f"Training {len(seeds)} models in {n_jobs} processes ({num_threads} threads each)")
+    
+    tasks = [(seed, X_train_scaled, y_train, X_test_scaled) for seed in seeds]
+    with training_worker_env(num_threads), \
+            ProcessPoolExecutor(max_workers=n_jobs, mp_context=multiprocessing.get_context('spawn'),
+                                initializer=_init_training_worker, initargs=(num_threads,)) as executor:
+        results = list(executor.map(_train_seed_worker, tasks))
+    
+    predictions_proba = [y_pred_proba for y_pred_proba, _, _ in results]
+    pcas = [pca for _, pca, _ in results]
+    model_paths = [path for _, _, path in results]
+    models = [keras.models.load_model(path, compile=False) for path in model_paths]
+    return models, predictions_proba, pcas, model_paths
+
 def train_ensemble_models():
     """
     Train multiple models with different random seeds and ensemble predictions
@@ -38,83 +217,36 @@ def train_ensemble_models():
     # Store models and predictions
     models = []
     predictions_proba = []
+    pcas = []
+    model_paths = []
     
     # 2. Train multiple models with different seeds
     print("\n" + "="*70)
     print("STEP 2: TRAINING ENSEMBLE MODELS")
     print("="*70)
     
-    for i, seed in enumerate(config.ENSEMBLE_SEEDS, 1):
-        print(f"\n{'='*70}")
-        print(f"TRAINING MODEL {i}/{len(config.ENSEMBLE_SEEDS)} (seed={seed})")
-        print(f"{'='*70}")
-        
-        # Apply SMOTE with this seed
-        X_train_res, y_train_res = data_loader.apply_smote(
-            X_train_scaled, y_train, 
-            random_state=seed,
-            sampling_strategy=config.SAMPLING_STRATEGY
-        )
-        
-        # Clean NaN/Inf
-        X_train_res = np.nan_to_num(X_train_res, nan=0.0, posinf=0.0, neginf=0.0)
-        X_test_scaled_clean = np.nan_to_num(X_test_scaled, nan=0.0, posinf=0.0, neginf=0.0)
-        
-        # Apply PCA
-        print(f"\nApplying PCA: {X_train_res.shape[1]} → {config.N_COMPONENTS} components")
-        pca = PCA(n_components=config.N_COMPONENTS, random_state=seed)
-        X_train_pca = pca.fit_transform(X_train_res)
-        X_test_pca = pca.transform(X_test_scaled_clean)
-        
-        explained_variance = pca.explained_variance_ratio_.sum()
-        print(f"Explained variance: {explained_variance*100:.2f}%")
-        
-        # Split train/validation
-        X_train_final, X_val, y_train_final, y_val = train_test_split(
-            X_train_pca, y_train_res,
-            test_size=config.VALIDATION_SPLIT,
-            random_state=seed
-        )
-        
-        # Build model with cost-sensitive loss
-        input_dim = X_train_pca.shape[1]
-        fraud_model = model.build_model(
-            input_dim, 
-            use_focal_loss=config.USE_FOCAL_LOSS,
-            focal_gamma=config.FOCAL_GAMMA,
-            focal_alpha=config.FOCAL_ALPHA,
-            use_cost_sensitive=config.USE_COST_SENSITIVE,
-            fn_cost=config.FN_COST
-        )
-        
-        # Create model-specific save path
-        model_save_path = os.path.join(
-            os.path.dirname(config.MODEL_SAVE_PATH),
-            f'combined_model_seed{seed}.keras'
-        )
-        
-        # Update config for this model
-        class ModelConfig:
-            pass
-        model_config = ModelConfig()
-        for attr in dir(config):
-            if not attr.startswith('_'):
-                setattr(model_config, attr, getattr(config, attr))
-        model_config.MODEL_SAVE_PATH = model_save_path
-        
-        # Train
-        trained_model, history = train.train_model(
-            fraud_model, X_train_final, y_train_final, X_val, y_val, model_config
+    if config.PARALLEL_TRAINING:
+        models, predictions_proba, pcas, model_paths = train_seeds_parallel(
+            config.ENSEMBLE_SEEDS, X_train_scaled, y_train, X_test_scaled,
+            n_jobs=config.PARALLEL_JOBS
         )
-        
-        # Get predictions on test set
-        y_pred_proba = trained_model.predict(X_test_pca, verbose=0).flatten()
-        
-        # Store
-        models.append(trained_model)
-        predictions_proba.append(y_pred_proba)
-        
-        print(f"\nModel {i} training completed!")
+    else:
+        for i, seed in enumerate(config.ENSEMBLE_SEEDS, 1):
+            print(f"\n{'='*70}")
+            print(f"TRAINING MODEL {i}/{len(config.ENSEMBLE_SEEDS)} (seed={seed})")
+            print(f"{'='*70}")
+            
+            trained_model, y_pred_proba, pca, model_save_path = train_seed(
+                seed, X_train_scaled, y_train, X_test_scaled
+            )
+            
+            # Store
+            models.append(trained_model)
+            predictions_proba.append(y_pred_proba)
+            pcas.append(pca)
+            model_paths.append(model_save_path)
+            
+            print(f"\nModel {i} training completed!")
     
     # 3. Ensemble predictions
     print("\n" + "="*70)
@@ -136,6 +268,12 @@ def train_ensemble_models():
     if config.THRESHOLD == 'auto':
         threshold = predict.find_optimal_threshold(y_test, ensemble_pred_proba, metric='balanced')
         print(f"\nOptimal threshold found: {threshold:.3f}")
+    elif config.THRESHOLD == 'cost':
+        threshold, cost_metrics = predict.find_cost_optimal_threshold(
+            y_test, ensemble_pred_proba, config.FN_DOLLAR_COST, config.FP_DOLLAR_COST
+        )
+        print(f"\nCost-optimal threshold found: {threshold:.3f} "
+              f"(${cost_metrics['cost']:,.0f} total, ${cost_metrics['cost_per_order']:.2f} per order)")
     else:
         threshold = config.THRESHOLD
         print(f"\nUsing threshold: {threshold}")
@@ -196,6 +334,23 @@ def train_ensemble_models():
     
     print(f"\nResults saved to: {results_file}")
     
+    # Save scaler + PCAs + threshold so inference reuses the training preprocessing
+    bundle.save_bundle(
+        config.BUNDLE_PATH,
+        feature_names=X.columns,
+        scaler=scaler,
+        pcas=pcas,
+        seeds=config.ENSEMBLE_SEEDS,
+        threshold=threshold,
+        model_paths=model_paths
+    )
+    
+    # Single-graph ensemble for serving (PCA folded into each tower, average in-graph)
+    export.export_fused_model(config.BUNDLE_PATH, config.FUSED_MODEL_PATH, models=models)
+    
+    # Folded weights for TensorFlow-free scoring workers (numpy_runtime.py)
+    export.export_numpy_runtime(config.BUNDLE_PATH, config.NUMPY_MODEL_PATH, models=models)
+    
     print("\n" + "="*70)
     print("ENSEMBLE TRAINING COMPLETED!")
     print("="*70)
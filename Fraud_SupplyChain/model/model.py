@@ -73,7 +73,7 @@ def cost_sensitive_focal_loss(gamma=1.0, alpha=0.75, fn_cost=10.0):
     
     return cs_focal_loss_fixed
 
-def build_model(input_dim, use_focal_loss=True, focal_gamma=1.5, focal_alpha=0.65, use_cost_sensitive=False, fn_cost=10.0):
+def build_model(input_dim, use_focal_loss=True, focal_gamma=1.5, focal_alpha=0.65, use_cost_sensitive=False, fn_cost=10.0, learning_rate=0.001):
     """
     Build a Deep Neural Network for fraud detection using combined features
     
@@ -84,6 +84,7 @@ def build_model(input_dim, use_focal_loss=True, focal_gamma=1.5, focal_alpha=0.6
         focal_alpha: Focal loss alpha parameter (default 0.65)
         use_cost_sensitive: Whether to use cost-sensitive focal loss (default False)
         fn_cost: Cost multiplier for False Negatives when use_cost_sensitive=True
+        learning_rate: Adam learning rate (default 0.001 = Keras default)
     
     Returns:
         Compiled Keras Sequential model
@@ -121,7 +122,7 @@ def build_model(input_dim, use_focal_loss=True, focal_gamma=1.5, focal_alpha=0.6
     
     # Compile model
     clf.compile(
-        optimizer='adam',
+        optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
         loss=loss_function,
         metrics=['accuracy', tf.keras.metrics.Precision(), tf.keras.metrics.Recall()]
     )
@@ -0,0 +1,66 @@
+## NumPy-only inference runtime for the DNN ensemble (no TensorFlow / scikit-learn import)
+
+import numpy as np
+
+ACTIVATIONS = {
+    'linear': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0.0),
+    # exp(-log(1 + exp(-x))): no overflow for large |x|
+    'sigmoid': lambda x: np.exp(-np.logaddexp(0.0, -x)),
+}
+
+class NumpyEnsemble:
+    """
+    Ensemble scorer from the .npz written by export.export_numpy_runtime
+
+    Each tower is a plain Dense stack: BatchNorm is folded into the following Dense,
+    the seed's PCA into the first Dense, and Dropout is dropped. Scoring is
+    scale -> (relu(x @ W + b) ...) -> sigmoid per tower -> average.
+    """
+
+    def __init__(self, npz_path):
+        with np.load(npz_path, allow_pickle=False) as data:
+            self.feature_names = data['feature_names'].tolist()
+            self.scaler_mean = data['scaler_mean']
+            self.scaler_scale = data['scaler_scale']
+            self.threshold = float(data['threshold'])
+            self.seeds = data['seeds'].tolist()
+
+            self.towers = []
+            for t in range(len(self.seeds)):
+                activations = data[f'tower{t}_activations'].tolist()
+                for name in activations:
+                    if name not in ACTIVATIONS:
+                        raise ValueError(f"Unsupported activation in {npz_path}: {name}")
+                self.towers.append([
+                    (data[f'tower{t}_kernel{l}'], data[f'tower{t}_bias{l}'], ACTIVATIONS[name])
+                    for l, name in enumerate(activations)
+                ])
+
+    def scale(self, X):
+        """Training scaler + NaN/Inf cleaning; X is a DataFrame or array in feature_names order"""
+        if hasattr(X, 'columns'):
+            X = X[self.feature_names].values
+        X_scaled = (np.asarray(X, dtype=np.float64) - self.scaler_mean) / self.scaler_scale
+        return np.nan_to_num(X_scaled, nan=0.0, posinf=0.0, neginf=0.0).astype(np.float32)
+
+    def predict_proba(self, X):
+        """Averaged ensemble fraud probability"""
+        X_scaled = self.scale(X)
+        predictions = []
+        for layers in self.towers:
+            h = X_scaled
+            for kernel, bias, activation in layers:
+                h = activation(h @ kernel + bias)
+            predictions.append(h.reshape(-1))
+        return np.mean(predictions, axis=0)
+
+    def predict(self, X):
+        """
+        Ensemble prediction with the exported threshold
+
+        Returns:
+            (labels, probabilities) - label 1 = Fraud
+        """
+        proba = self.predict_proba(X)
+        return (proba > self.threshold).astype(int), proba
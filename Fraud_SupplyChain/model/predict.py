@@ -11,76 +11,228 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 import os
 
-def find_optimal_threshold_with_constraint(y_true, y_pred_proba, min_recall=0.60):
+def threshold_curve(y_true, y_pred_proba, thresholds=None, inclusive=True, fn_cost=None, fp_cost=None):
     """
-    Find optimal threshold that maintains minimum Recall while maximizing Precision/F1
+    Confusion counts and metrics for every threshold in one pass
+    
+    Scores are sorted once per class; TP/FP at each threshold come from a binary search
+    into the sorted positive/negative scores, so the cost is O((n + k) log n) for n scores
+    and k thresholds instead of k full metric evaluations.
+    
+    Args:
+        y_true: True labels (0/1)
+        y_pred_proba: Predicted probabilities
+        thresholds: Thresholds to evaluate (default: every distinct score, plus one step past
+                    the end so "flag every order" and "flag none" are both on the curve)
+        inclusive: True -> predict fraud when score >= threshold, False -> score > threshold
+        fn_cost, fp_cost: If both given, also return the total cost fn*fn_cost + fp*fp_cost
+    
+    Returns:
+        Dict of arrays: threshold, tp, fp, fn, tn, precision, recall, f1 (, cost)
+        with zero_division=0 semantics like sklearn
+    """
+    y_true = np.asarray(y_true).astype(bool)
+    y_pred_proba = np.asarray(y_pred_proba, dtype=np.float64)
+    
+    if thresholds is None:
+        thresholds = np.unique(y_pred_proba)
+        # With score > t no distinct score flags every order, with score >= t none flags no order
+        if len(thresholds) and inclusive:
+            thresholds = np.append(thresholds, np.nextafter(thresholds[-1], np.inf))
+        elif len(thresholds):
+            thresholds = np.insert(thresholds, 0, np.nextafter(thresholds[0], -np.inf))
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    
+    positive_scores = np.sort(y_pred_proba[y_true])
+    negative_scores = np.sort(y_pred_proba[~y_true])
+    
+    # Number of scores below the threshold ('left') or at/below it ('right') are predicted 0
+    side = 'left' if inclusive else 'right'
+    tp = len(positive_scores) - np.searchsorted(positive_scores, thresholds, side=side)
+    fp = len(negative_scores) - np.searchsorted(negative_scores, thresholds, side=side)
+    fn = len(positive_scores) - tp
+    tn = len(negative_scores) - fp
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+        recall = np.where(tp + fn > 0, tp / (tp + fn), 0.0)
+        f1 = np.where(2 * tp + fp + fn > 0, 2 * tp / (2 * tp + fp + fn), 0.0)
+    
+    curve = {
+        'threshold': thresholds,
+        'tp': tp, 'fp': fp, 'fn': fn, 'tn': tn,
+        'precision': precision,
+        'recall': recall,
+        'f1': f1
+    }
+    if fn_cost is not None and fp_cost is not None:
+        curve['cost'] = fn * fn_cost + fp * fp_cost
+    
+    return curve
+
+def find_cost_optimal_threshold(y_true, y_pred_proba, fn_cost, fp_cost, thresholds=None, inclusive=False):
+    """
+    Threshold minimizing total dollar cost fn * fn_cost + fp * fp_cost
     
     Args:
         y_true: True labels
         y_pred_proba: Predicted probabilities
-        min_recall: Minimum acceptable recall (default 0.60 = 60%)
+        fn_cost: Cost of a missed fraud
+        fp_cost: Cost of a false alert
+        thresholds: Thresholds to scan (default: every distinct score, plus the threshold just
+                    below the lowest score, i.e. flag every order)
+        inclusive: False -> fraud when score > threshold (as in evaluation), True -> >=
     
     Returns:
         Optimal threshold value, metrics at that threshold
     """
-    thresholds = np.arange(0.05, 0.95, 0.01)
-    best_f1 = 0
-    optimal_threshold = 0.3
-    best_metrics = {}
+    curve = threshold_curve(y_true, y_pred_proba, thresholds, inclusive=inclusive,
+                            fn_cost=fn_cost, fp_cost=fp_cost)
+    return _cost_optimum(curve)
+
+def _cost_optimum(curve):
+    """Lowest-cost point of a threshold_curve (first one on ties)"""
+    best_idx = int(np.argmin(curve['cost']))
+    num_orders = curve['tp'][best_idx] + curve['fp'][best_idx] + curve['fn'][best_idx] + curve['tn'][best_idx]
+    return curve['threshold'][best_idx], {
+        'threshold': curve['threshold'][best_idx],
+        'cost': float(curve['cost'][best_idx]),
+        'cost_per_order': curve['cost'][best_idx] / max(num_orders, 1),
+        'fn': int(curve['fn'][best_idx]),
+        'fp': int(curve['fp'][best_idx]),
+        'recall': curve['recall'][best_idx],
+        'precision': curve['precision'][best_idx],
+        'f1': curve['f1'][best_idx]
+    }
+
+class ScoreHistogram:
+    """
+    Per-class histogram of scores in fixed bins over [0, 1]
+    
+    Counts can be accumulated batch by batch (update / merge) and saved between runs, so the
+    operating point can be re-tuned over the full score history in constant memory. Thresholds
+    are the bin left edges and a score counts as fraud at edge e when score > e, as in serving
+    and evaluation: bin i holds the scores in (i/num_bins, (i+1)/num_bins]. The first edge sits
+    just below 0 (flag every order), so scores of exactly 0 are counted consistently too.
+    applied_batches holds the ids of the batches already added (see retune_threshold).
+    """
     
-    results = []
+    def __init__(self, num_bins=10000):
+        self.num_bins = num_bins
+        self.positive_counts = np.zeros(num_bins, dtype=np.int64)
+        self.negative_counts = np.zeros(num_bins, dtype=np.int64)
+        self.applied_batches = []
     
-    for thresh in thresholds:
-        y_pred = (y_pred_proba >= thresh).astype(int)
-        
-        recall = recall_score(y_true, y_pred, zero_division=0)
-        precision = precision_score(y_true, y_pred, zero_division=0)
-        f1 = f1_score(y_true, y_pred, zero_division=0)
-        
-        # Only consider thresholds that meet minimum recall constraint
-        if recall >= min_recall:
-            results.append({
-                'threshold': thresh,
-                'recall': recall,
-                'precision': precision,
-                'f1': f1
-            })
-            
-            # Update best if F1 is higher
-            if f1 > best_f1:
-                best_f1 = f1
-                optimal_threshold = thresh
-                best_metrics = {
-                    'threshold': thresh,
-                    'recall': recall,
-                    'precision': precision,
-                    'f1': f1
-                }
-    
-    if not results:
-        # If no threshold meets min_recall, find threshold with highest recall
-        print(f"WARNING: No threshold achieves Recall >= {min_recall:.1%}")
-        print("Finding threshold with maximum Recall instead...")
+    @property
+    def edges(self):
+        edges = np.arange(self.num_bins) / self.num_bins
+        edges[0] = np.nextafter(0.0, -np.inf)
+        return edges
+    
+    def update(self, y_true, y_pred_proba):
+        """Add a batch of labelled scores"""
+        y_true = np.asarray(y_true).astype(bool)
+        scores = np.clip(np.asarray(y_pred_proba, dtype=np.float64), 0.0, 1.0)
+        # Number of edges i/num_bins strictly below each score (compared as floats, like
+        # probability > threshold), so scores rounded onto an edge stay in the bin below it
+        bins = np.searchsorted(np.arange(self.num_bins + 1) / self.num_bins, scores, side='left') - 1
+        bins = np.clip(bins, 0, self.num_bins - 1)
+        self.positive_counts += np.bincount(bins[y_true], minlength=self.num_bins)
+        self.negative_counts += np.bincount(bins[~y_true], minlength=self.num_bins)
+        return self
+    
+    def merge(self, other):
+        """Add the counts of another histogram with the same bins"""
+        if other.num_bins != self.num_bins:
+            raise ValueError(f"Cannot merge histograms with {self.num_bins} and {other.num_bins} bins")
+        self.positive_counts += other.positive_counts
+        self.negative_counts += other.negative_counts
+        self.applied_batches += [batch for batch in other.applied_batches if batch not in self.applied_batches]
+        return self
+    
+    def curve(self, fn_cost=None, fp_cost=None):
+        """threshold_curve equivalent over the bin edges (score > edge -> fraud)"""
+        # Predicted fraud at edge i = every score in bins i..end
+        tp = np.cumsum(self.positive_counts[::-1])[::-1]
+        fp = np.cumsum(self.negative_counts[::-1])[::-1]
+        fn = self.positive_counts.sum() - tp
+        tn = self.negative_counts.sum() - fp
         
-        for thresh in thresholds:
-            y_pred = (y_pred_proba >= thresh).astype(int)
-            recall = recall_score(y_true, y_pred, zero_division=0)
-            precision = precision_score(y_true, y_pred, zero_division=0)
-            f1 = f1_score(y_true, y_pred, zero_division=0)
-            
-            results.append({
-                'threshold': thresh,
-                'recall': recall,
-                'precision': precision,
-                'f1': f1
-            })
+        with np.errstate(divide='ignore', invalid='ignore'):
+            precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+            recall = np.where(tp + fn > 0, tp / (tp + fn), 0.0)
+            f1 = np.where(2 * tp + fp + fn > 0, 2 * tp / (2 * tp + fp + fn), 0.0)
         
-        # Sort by F1-score descending
-        results.sort(key=lambda x: x['f1'], reverse=True)
-        best_metrics = results[0]
-        optimal_threshold = best_metrics['threshold']
+        curve = {
+            'threshold': self.edges,
+            'tp': tp, 'fp': fp, 'fn': fn, 'tn': tn,
+            'precision': precision,
+            'recall': recall,
+            'f1': f1
+        }
+        if fn_cost is not None and fp_cost is not None:
+            curve['cost'] = fn * fn_cost + fp * fp_cost
+        return curve
+    
+    def optimal_threshold(self, fn_cost, fp_cost):
+        """Cost-minimizing bin edge and the metrics there (see find_cost_optimal_threshold)"""
+        return _cost_optimum(self.curve(fn_cost=fn_cost, fp_cost=fp_cost))
     
-    return optimal_threshold, best_metrics
+    def save(self, path):
+        np.savez(path, positive_counts=self.positive_counts, negative_counts=self.negative_counts,
+                 applied_batches=np.array(self.applied_batches, dtype=str))
+    
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            histogram = cls(num_bins=len(data['positive_counts']))
+            histogram.positive_counts = data['positive_counts'].astype(np.int64)
+            histogram.negative_counts = data['negative_counts'].astype(np.int64)
+            if 'applied_batches' in data.files:
+                histogram.applied_batches = data['applied_batches'].tolist()
+        return histogram
+
+def find_optimal_threshold_with_constraint(y_true, y_pred_proba, min_recall=0.60, thresholds=None):
+    """
+    Find optimal threshold that maintains minimum Recall while maximizing Precision/F1
+    
+    Args:
+        y_true: True labels
+        y_pred_proba: Predicted probabilities
+        min_recall: Minimum acceptable recall (default 0.60 = 60%)
+        thresholds: Thresholds to scan (default 0.05 to 0.94 in steps of 0.01)
+    
+    Returns:
+        Optimal threshold value, metrics at that threshold
+    """
+    if thresholds is None:
+        thresholds = np.arange(0.05, 0.95, 0.01)
+    curve = threshold_curve(y_true, y_pred_proba, thresholds, inclusive=True)
+    
+    def metrics_at(idx):
+        return {
+            'threshold': thresholds[idx],
+            'recall': curve['recall'][idx],
+            'precision': curve['precision'][idx],
+            'f1': curve['f1'][idx]
+        }
+    
+    # Only consider thresholds that meet minimum recall constraint
+    meets_recall = curve['recall'] >= min_recall
+    
+    if meets_recall.any():
+        # Highest F1 among them (first one on ties); keep the defaults if every F1 is 0
+        f1 = np.where(meets_recall, curve['f1'], -1.0)
+        best_idx = int(np.argmax(f1))
+        if f1[best_idx] > 0:
+            return thresholds[best_idx], metrics_at(best_idx)
+        return 0.3, {}
+    
+    # If no threshold meets min_recall, find threshold with highest F1 instead
+    print(f"WARNING: No threshold achieves Recall >= {min_recall:.1%}")
+    print("Finding threshold with maximum Recall instead...")
+    best_idx = int(np.argmax(curve['f1']))
+    return thresholds[best_idx], metrics_at(best_idx)
 
 def find_optimal_threshold(y_true, y_pred_proba, metric='f1'):
     """
@@ -101,24 +253,12 @@ def find_optimal_threshold(y_true, y_pred_proba, metric='f1'):
         optimal_idx = np.argmax(f1_scores)
         optimal_threshold = thresholds[optimal_idx] if optimal_idx < len(thresholds) else 0.5
     else:
-        # Try different thresholds and find best F1
+        # Try different thresholds and find best score
         thresholds = np.arange(0.1, 0.9, 0.05)
-        best_score = 0
-        optimal_threshold = 0.3
-        
-        for thresh in thresholds:
-            y_pred = (y_pred_proba > thresh).astype(int)
-            
-            if metric == 'f1':
-                score = f1_score(y_true, y_pred, zero_division=0)
-            elif metric == 'precision':
-                score = precision_score(y_true, y_pred, zero_division=0)
-            elif metric == 'recall':
-                score = recall_score(y_true, y_pred, zero_division=0)
-            
-            if score > best_score:
-                best_score = score
-                optimal_threshold = thresh
+        curve = threshold_curve(y_true, y_pred_proba, thresholds, inclusive=False)
+        scores = curve[metric]
+        best_idx = int(np.argmax(scores))
+        optimal_threshold = thresholds[best_idx] if scores[best_idx] > 0 else 0.3
     
     return optimal_threshold
 
@@ -0,0 +1,83 @@
+## Content-addressed cache of the per-seed SMOTE + PCA training matrices
+
+import oversample
+
+import numpy as np
+import hashlib
+import pickle
+import shutil
+import os
+
+ARRAY_NAMES = ['X_train_pca', 'y_train_res', 'X_test_pca']
+
+def cache_key(X_train_scaled, y_train, X_test_scaled, seed, sampling_strategy, n_components,
+              smote_backend='imblearn'):
+    """SHA-256 (first 16 hex chars) of the input matrices and every parameter that shapes the output"""
+    digest = hashlib.sha256()
+    for array in (X_train_scaled, y_train, X_test_scaled):
+        array = np.ascontiguousarray(np.asarray(array))
+        digest.update(f"{array.dtype.str}{array.shape}".encode())
+        digest.update(array.data)
+    digest.update(f"seed={seed};sampling_strategy={sampling_strategy};n_components={n_components}".encode())
+    # 'imblearn' and 'tree' produce identical samples; 'projection' does not
+    if smote_backend == 'projection':
+        digest.update(f";smote_backend=projection;n_trees={oversample.PROJECTION_N_TREES}"
+                      f";leaf_size={oversample.PROJECTION_LEAF_SIZE}".encode())
+    return digest.hexdigest()[:16]
+
+def load(cache_dir, key):
+    """
+    Cached (X_train_pca, y_train_res, X_test_pca, pca) for key, or None
+
+    Arrays are memory-mapped read-only, so a hit costs no copy until they are indexed.
+    """
+    entry_dir = os.path.join(cache_dir, key)
+    if not os.path.exists(os.path.join(entry_dir, 'pca.pkl')):
+        return None
+
+    arrays = [np.load(os.path.join(entry_dir, f'{name}.npy'), mmap_mode='r') for name in ARRAY_NAMES]
+    with open(os.path.join(entry_dir, 'pca.pkl'), 'rb') as f:
+        pca = pickle.load(f)
+    return (*arrays, pca)
+
+def save(cache_dir, key, X_train_pca, y_train_res, X_test_pca, pca):
+    """Write an entry to a temporary directory, then rename it into place"""
+    entry_dir = os.path.join(cache_dir, key)
+    tmp_dir = f"{entry_dir}.tmp{os.getpid()}"
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    for name, array in zip(ARRAY_NAMES, (X_train_pca, y_train_res, X_test_pca)):
+        np.save(os.path.join(tmp_dir, f'{name}.npy'), np.asarray(array))
+    # pca.pkl is written last: load() treats its presence as a complete entry
+    with open(os.path.join(tmp_dir, 'pca.pkl'), 'wb') as f:
+        pickle.dump(pca, f)
+
+    try:
+        os.rename(tmp_dir, entry_dir)
+    except OSError:
+        # Another process (e.g. a parallel seed or sweep trial) stored the same entry first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def cached_preprocess(compute_fn, cache_dir, X_train_scaled, y_train, X_test_scaled,
+                      seed, sampling_strategy, n_components, smote_backend='imblearn'):
+    """
+    Return compute_fn()'s (X_train_pca, y_train_res, X_test_pca, pca), from the cache if possible
+
+    Args:
+        compute_fn: Runs SMOTE + PCA for this seed when the entry is missing
+        cache_dir: Cache root; one subdirectory per key
+        X_train_scaled, y_train, X_test_scaled, seed, sampling_strategy, n_components, smote_backend:
+            Everything the result depends on (hashed into the key)
+    """
+    key = cache_key(X_train_scaled, y_train, X_test_scaled, seed, sampling_strategy, n_components,
+                    smote_backend)
+
+    cached = load(cache_dir, key)
+    if cached is not None:
+        print(f"\nUsing cached SMOTE + PCA for seed {seed} ({key})")
+        return cached
+
+    result = compute_fn()
+    save(cache_dir, key, *result)
+    print(f"Cached SMOTE + PCA for seed {seed} ({key})")
+    return result
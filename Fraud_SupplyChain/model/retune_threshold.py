@@ -0,0 +1,54 @@
+## Nightly cost-based threshold re-tuning over the accumulated score history
+
+import config
+import predict
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common import data_io, ingest
+
+def retune_threshold(batch_paths, histogram_path=config.SCORE_HISTOGRAM_PATH,
+                     fn_cost=config.FN_DOLLAR_COST, fp_cost=config.FP_DOLLAR_COST):
+    """
+    Add labelled production batches to the saved score histogram and re-optimize the threshold
+
+    Args:
+        batch_paths: Tables with 'is_fraud' (confirmed label) and 'fraud_probability' columns;
+                     a file already added by a previous run is skipped
+        histogram_path: Histogram accumulated by previous runs (created if missing)
+        fn_cost, fp_cost: Dollar cost of a missed fraud / a false alert
+
+    Returns:
+        Optimal threshold value, metrics at that threshold
+    """
+    if os.path.exists(histogram_path):
+        histogram = predict.ScoreHistogram.load(histogram_path)
+    else:
+        histogram = predict.ScoreHistogram()
+
+    for path in batch_paths:
+        # A batch file is identified by its content hash, so re-runs and retries add it once
+        batch_id = ingest.file_hash(data_io.resolve_path(path))
+        if batch_id in histogram.applied_batches:
+            print(f"Skipped {path}: already in the score history")
+            continue
+        batch = data_io.read_table(path, columns=['is_fraud', 'fraud_probability'])
+        histogram.update(batch['is_fraud'], batch['fraud_probability'])
+        histogram.applied_batches.append(batch_id)
+        print(f"Added {len(batch):,} scored orders from {path}")
+
+    os.makedirs(os.path.dirname(histogram_path), exist_ok=True)
+    histogram.save(histogram_path)
+
+    total = int(histogram.positive_counts.sum() + histogram.negative_counts.sum())
+    threshold, metrics = histogram.optimal_threshold(fn_cost, fp_cost)
+    print(f"\nScore history: {total:,} orders ({int(histogram.positive_counts.sum()):,} fraud)")
+    print(f"Cost-optimal threshold: {threshold:.4f} (FN ${fn_cost:,.0f}, FP ${fp_cost:,.0f})")
+    print(f"  Cost per order: ${metrics['cost_per_order']:.2f}")
+    print(f"  Recall: {metrics['recall']:.4f}, Precision: {metrics['precision']:.4f}")
+
+    return threshold, metrics
+
+if __name__ == "__main__":
+    retune_threshold(sys.argv[1:])
@@ -0,0 +1,268 @@
+## Ensemble inference server with request micro-batching
+
+import config
+import bundle
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import threading
+import queue
+import json
+import time
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import feature_store
+
+class MicroBatcher:
+    """
+    Coalesce concurrent requests into one batched prediction
+
+    Requests are queued by the HTTP handler threads. A single worker thread takes the
+    first waiting request, keeps collecting until max_batch_size rows are queued or
+    max_delay_ms has passed, then runs predict_fn once on the stacked rows.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=256, max_delay_ms=5.0):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay_ms / 1000.0
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def submit(self, rows):
+        """Queue rows (2D array) and block until their probabilities are ready"""
+        done = threading.Event()
+        request = {'rows': rows, 'done': done, 'result': None, 'error': None}
+        self._queue.put(request)
+        done.wait()
+        if request['error'] is not None:
+            raise request['error']
+        return request['result']
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        num_rows = len(batch[0]['rows'])
+        deadline = time.monotonic() + self.max_delay
+
+        while num_rows < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            batch.append(request)
+            num_rows += len(request['rows'])
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                proba = self.predict_fn(np.vstack([request['rows'] for request in batch]))
+                start = 0
+                for request in batch:
+                    end = start + len(request['rows'])
+                    request['result'] = proba[start:end]
+                    start = end
+            except Exception as e:
+                for request in batch:
+                    request['error'] = e
+            for request in batch:
+                request['done'].set()
+
+def make_predict_fn(ensemble, models):
+    """Batched ensemble probability: preprocess once, one forward pass per seed model"""
+    def predict_fn(X):
+        inputs = bundle.transform(ensemble, X)
+        predictions = [np.asarray(m(X_pca, training=False)).reshape(-1)
+                       for m, X_pca in zip(models, inputs)]
+        return np.mean(predictions, axis=0)
+    return predict_fn
+
+def make_fused_predict_fn(ensemble, fused_model):
+    """Batched ensemble probability from the fused model: scale once, one forward call"""
+    def predict_fn(X):
+        return np.asarray(fused_model(bundle.scale(ensemble, X), training=False)).reshape(-1)
+    return predict_fn
+
+def format_response(order_id, probability, threshold):
+    """Response schema from best_models/README.txt"""
+    probability = float(probability)
+
+    # Confidence: distance of the probability from the decision threshold
+    margin = abs(probability - threshold)
+    if margin >= 0.3:
+        confidence_level = 'HIGH'
+    elif margin >= 0.1:
+        confidence_level = 'MEDIUM'
+    else:
+        confidence_level = 'LOW'
+
+    # Priority 1 (most urgent) to 5
+    if probability >= 0.8:
+        alert_priority = 1
+    elif probability >= 0.6:
+        alert_priority = 2
+    elif probability >= 0.4:
+        alert_priority = 3
+    elif probability > threshold:
+        alert_priority = 4
+    else:
+        alert_priority = 5
+
+    return {
+        'order_id': order_id,
+        'prediction': 'FRAUD' if probability > threshold else 'NOT_FRAUD',
+        'fraud_probability': round(probability, 4),
+        'confidence_level': confidence_level,
+        'alert_priority': alert_priority
+    }
+
+def parse_orders(payload, num_features, store=None, store_columns=None):
+    """
+    Accept one order or {"orders": [...]}; each order has either transaction_features and
+    network_features (concatenated in training column order), or a customer_id whose row
+    is read from the feature store. An order with a customer_id may also carry the raw
+    "transaction" fields, which are folded into the store before the row is read.
+
+    Every order is validated before any transaction touches the store, so a rejected
+    request changes nothing; transactions are applied once per order_id, so a retried
+    request is not counted twice.
+
+    Returns:
+        (order_ids, rows)
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("Request body must be a JSON object (one order or {\"orders\": [...]})")
+    orders = payload['orders'] if 'orders' in payload else [payload]
+    if not isinstance(orders, list) or not orders:
+        raise ValueError("'orders' must be a non-empty list")
+    if not all(isinstance(order, dict) for order in orders):
+        raise ValueError("Each order must be a JSON object")
+
+    # Validate the whole request first (feature vectors are converted here)
+    order_ids = []
+    rows = np.empty((len(orders), num_features), dtype=np.float64)
+    new_customers = set()
+    for i, order in enumerate(orders):
+        if 'transaction_features' in order:
+            features = list(order['transaction_features']) + list(order['network_features'])
+            if len(features) != num_features:
+                raise ValueError(f"Order {order.get('order_id')}: expected {num_features} features, "
+                                 f"got {len(features)}")
+            rows[i] = features
+        elif store is not None:
+            customer_id = int(order['customer_id'])
+            if 'transaction' in order:
+                transaction = order['transaction']
+                if not isinstance(transaction, dict):
+                    raise ValueError(f"Order {order.get('order_id')}: transaction must be an object")
+                try:
+                    feature_store.numerical_values(transaction)
+                except ValueError as e:
+                    raise ValueError(f"Order {order.get('order_id')}: {e}") from None
+                new_customers.add(customer_id)
+            elif customer_id not in new_customers and not store.has_customer(customer_id):
+                raise ValueError(f"Order {order.get('order_id')}: unknown customer {order['customer_id']}")
+        else:
+            raise ValueError(f"Order {order.get('order_id')}: no features given and no feature store loaded")
+        order_ids.append(order.get('order_id'))
+
+    # Then fold the transactions in (in request order) and read the customers' rows
+    for i, order in enumerate(orders):
+        if 'transaction_features' in order:
+            continue
+        if 'transaction' in order:
+            store.update(order['customer_id'], order['transaction'], order_id=order.get('order_id'))
+        rows[i] = store.get(order['customer_id'])[store_columns]
+
+    return order_ids, rows
+
+def make_handler(batcher, threshold, num_features, store=None, store_columns=None):
+    class PredictHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status, body):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == '/health':
+                self._send_json(200, {'status': 'ok'})
+            else:
+                self._send_json(404, {'error': 'not found'})
+
+        def do_POST(self):
+            if self.path != '/predict':
+                self._send_json(404, {'error': 'not found'})
+                return
+
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                payload = json.loads(self.rfile.read(length))
+                order_ids, rows = parse_orders(payload, num_features, store, store_columns)
+            except (ValueError, KeyError, TypeError) as e:
+                self._send_json(400, {'error': str(e)})
+                return
+
+            try:
+                proba = batcher.submit(rows)
+            except Exception as e:
+                self._send_json(500, {'error': f'prediction failed: {e}'})
+                return
+            results = [format_response(order_id, p, threshold) for order_id, p in zip(order_ids, proba)]
+            self._send_json(200, results if 'orders' in payload else results[0])
+
+        def log_message(self, format, *args):
+            pass
+
+    return PredictHandler
+
+def serve(bundle_path=config.BUNDLE_PATH, host=config.SERVE_HOST, port=config.SERVE_PORT,
+          max_batch_size=config.SERVE_MAX_BATCH_SIZE, max_delay_ms=config.SERVE_MAX_DELAY_MS,
+          fused_path=config.FUSED_MODEL_PATH, use_fused=config.SERVE_USE_FUSED,
+          feature_store_dir=config.FEATURE_STORE_DIR):
+    """Load the ensemble (and the feature store, if built) once and serve POST /predict until interrupted"""
+    if use_fused and os.path.exists(fused_path):
+        ensemble, fused_model = bundle.load_fused(bundle_path, fused_path)
+        predict_fn = make_fused_predict_fn(ensemble, fused_model)
+        description = f"fused {len(ensemble['seeds'])}-tower ensemble"
+    else:
+        ensemble, models = bundle.load_ensemble(bundle_path)
+        predict_fn = make_predict_fn(ensemble, models)
+        description = f"{len(models)}-model ensemble"
+    num_features = len(ensemble['feature_names'])
+
+    store, store_columns = None, None
+    if feature_store_dir and os.path.exists(os.path.join(feature_store_dir, 'meta.json')):
+        store = feature_store.CustomerFeatureStore(feature_store_dir)
+        missing = [name for name in ensemble['feature_names'] if name not in store.feature_names]
+        if missing:
+            raise ValueError(f"Feature store {feature_store_dir} lacks model features: {missing}")
+        store_columns = np.array([store.feature_names.index(name) for name in ensemble['feature_names']])
+        print(f"Feature store: {store.num_customers} customers from {feature_store_dir}")
+
+    batcher = MicroBatcher(predict_fn, max_batch_size=max_batch_size, max_delay_ms=max_delay_ms)
+    server = ThreadingHTTPServer((host, port), make_handler(batcher, ensemble['threshold'], num_features,
+                                                            store, store_columns))
+
+    print(f"Serving {description} on http://{host}:{port}/predict")
+    print(f"Micro-batching: up to {max_batch_size} orders or {max_delay_ms} ms per batch")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if store is not None:
+            store.flush()
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,159 @@
+## Hyperparameter sweep over config.py knobs (process pool + median pruning)
+
+import config
+import data_loader
+
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from sklearn.model_selection import train_test_split
+import numpy as np
+import pandas as pd
+import itertools
+import time
+import os
+
+# Values tried for each config knob (random search over the grid)
+SEARCH_SPACE = {
+    'FOCAL_GAMMA': [0.5, 0.8, 1.0, 1.5, 2.0],
+    'FOCAL_ALPHA': [0.65, 0.75, 0.80, 0.85],
+    'FN_COST': [5.0, 10.0, 15.0, 20.0],
+    'SAMPLING_STRATEGY': [0.5, 0.75, 1.0],
+    'N_COMPONENTS': [35, 45, 55],
+    'BATCH_SIZE': [32, 128, 512],
+}
+
+# Worker state, set once per process by _init_sweep_worker
+_DATA = None
+_RUNG_VALUES = None
+_LOCK = None
+
+def sample_trials(search_space, num_trials, seed=42):
+    """Draw num_trials distinct configurations from the grid (all of it if smaller)"""
+    names = list(search_space)
+    grid = list(itertools.product(*(search_space[name] for name in names)))
+    rng = np.random.default_rng(seed)
+    picks = rng.permutation(len(grid))[:num_trials]
+    return [dict(zip(names, grid[i])) for i in picks]
+
+def _init_sweep_worker(num_threads, data, rung_values, lock):
+    global _DATA, _RUNG_VALUES, _LOCK
+    import main_ensemble
+    main_ensemble._init_training_worker(num_threads)
+    _DATA = data
+    _RUNG_VALUES = rung_values
+    _LOCK = lock
+
+def _run_trial(task):
+    """Train one configuration (single seed); report its holdout AUC and test metrics"""
+    import main_ensemble
+    import train
+    from sklearn.metrics import precision_score, recall_score, f1_score, roc_auc_score
+
+    trial_id, params, sweep_dir = task
+    X_train_scaled, y_train, X_holdout, y_holdout, X_test_scaled, y_test = _DATA
+
+    # Trials run one after another in a worker, so overriding the module is safe
+    saved = {name: getattr(config, name) for name in list(params) + ['MODEL_SAVE_PATH', 'RESULTS_PATH']}
+    trial_dir = os.path.join(sweep_dir, f'trial_{trial_id:03d}')
+    os.makedirs(trial_dir, exist_ok=True)
+
+    pruner = train.RungPruner(config.SWEEP_RUNGS, _RUNG_VALUES, _LOCK, min_trials=config.SWEEP_MIN_TRIALS)
+    start = time.perf_counter()
+    try:
+        for name, value in params.items():
+            setattr(config, name, value)
+        config.MODEL_SAVE_PATH = os.path.join(trial_dir, 'combined_model.keras')
+        config.RESULTS_PATH = trial_dir
+        config.EXTRA_CALLBACKS = [pruner]
+
+        _, y_pred_proba, _, _ = main_ensemble.train_seed(
+            config.RANDOM_STATE, X_train_scaled, y_train, X_test_scaled, fit_verbose=0,
+            holdout=(X_holdout, y_holdout)
+        )
+    finally:
+        for name, value in saved.items():
+            setattr(config, name, value)
+        config.EXTRA_CALLBACKS = []
+
+    y_pred = (y_pred_proba > config.THRESHOLD).astype(int)
+    result = {
+        'trial': trial_id,
+        **params,
+        'status': 'pruned' if pruner.pruned_at else 'complete',
+        'pruned_at_epoch': pruner.pruned_at,
+        'val_auc': pruner.final_auc,
+        'test_roc_auc': roc_auc_score(y_test, y_pred_proba),
+        'test_recall': recall_score(y_test, y_pred, zero_division=0),
+        'test_precision': precision_score(y_test, y_pred, zero_division=0),
+        'test_f1': f1_score(y_test, y_pred, zero_division=0),
+        'seconds': time.perf_counter() - start,
+    }
+    print(f"Trial {trial_id}: {result['status']}, val ROC-AUC {result['val_auc']:.4f}, "
+          f"test ROC-AUC {result['test_roc_auc']:.4f}, Recall {result['test_recall']:.4f}")
+    return result
+
+def run_sweep(search_space=SEARCH_SPACE, num_trials=config.SWEEP_TRIALS, n_jobs=config.SWEEP_JOBS,
+              seed=config.SWEEP_SEED, results_path=config.SWEEP_RESULTS_PATH):
+    """
+    Run a random search over search_space and write a results table sorted by validation ROC-AUC
+
+    val_auc is the ROC-AUC of each trial's final model on one holdout carved from the training
+    split before SMOTE and shared by all trials, so it is measured on the same real orders
+    whatever SAMPLING_STRATEGY / N_COMPONENTS a trial uses (the pruner's rungs use it too).
+    Completed trials are ranked ahead of pruned ones, each group by val_auc; the test metrics
+    are reported for information only, so the test split plays no part in the choice.
+
+    Data is loaded, split and scaled once and shipped to each worker once. SMOTE + PCA per
+    (SAMPLING_STRATEGY, N_COMPONENTS) comes from the preprocess cache, so trials that only
+    change loss/network knobs go straight to model fitting.
+    """
+    import main_ensemble
+
+    print("="*70)
+    print("HYPERPARAMETER SWEEP")
+    print("="*70)
+
+    df = data_loader.load_data(config.DATA_PATH)
+    X, y = data_loader.split_features_labels(df)
+    X_train, X_test, y_train, y_test = data_loader.split_data(X, y, test_size=0.2, random_state=42)
+    X_train_scaled, X_test_scaled, _ = data_loader.scale_data(X_train, X_test)
+
+    # Fixed holdout of real training orders, taken before SMOTE and shared by every trial
+    X_fit, X_holdout, y_fit, y_holdout = train_test_split(
+        X_train_scaled, y_train.values,
+        test_size=config.VALIDATION_SPLIT,
+        stratify=y_train.values,
+        random_state=seed
+    )
+    data = (X_fit, y_fit, X_holdout, y_holdout, X_test_scaled, y_test.values)
+
+    trials = sample_trials(search_space, num_trials, seed=seed)
+    sweep_dir = os.path.join(os.path.dirname(results_path), 'sweep_trials')
+    tasks = [(trial_id, params, sweep_dir) for trial_id, params in enumerate(trials)]
+
+    n_jobs = min(n_jobs or os.cpu_count() or 1, len(tasks))
+    num_threads = max(1, (os.cpu_count() or 1) // n_jobs)
+    print(f"\n{len(tasks)} trials in {n_jobs} processes ({num_threads} threads each)")
+
+    context = multiprocessing.get_context('spawn')
+    with context.Manager() as manager:
+        rung_values = manager.dict()
+        lock = manager.Lock()
+        with main_ensemble.training_worker_env(num_threads), \
+                ProcessPoolExecutor(max_workers=n_jobs, mp_context=context,
+                                    initializer=_init_sweep_worker,
+                                    initargs=(num_threads, data, rung_values, lock)) as executor:
+            results = list(executor.map(_run_trial, tasks))
+
+    # 'complete' sorts before 'pruned': finished trials first, then by holdout AUC
+    df_results = pd.DataFrame(results).sort_values(['status', 'val_auc'], ascending=[True, False])
+    os.makedirs(os.path.dirname(results_path), exist_ok=True)
+    df_results.to_csv(results_path, index=False)
+
+    print(f"\nResults saved to: {results_path}")
+    print(df_results.head(10).to_string(index=False))
+
+    return df_results
+
+if __name__ == "__main__":
+    run_sweep()
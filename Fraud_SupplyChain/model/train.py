@@ -1,10 +1,117 @@
 ## Model Training for Combined Fraud Detection
 
-from tensorflow.keras.callbacks import ModelCheckpoint, EarlyStopping, CSVLogger
+import tensorflow as tf
+from tensorflow.keras.callbacks import Callback, ModelCheckpoint, EarlyStopping, CSVLogger
 from sklearn.utils.class_weight import compute_class_weight
+from sklearn.metrics import roc_auc_score
 import numpy as np
+import time
 import os
 
+class ThroughputLogger(Callback):
+    """
+    Measure training samples/sec per epoch and add it to the epoch logs (and CSV log)
+    
+    The clock stops when validation starts (on_test_begin), so only the training
+    batches are timed. Prints the value only when verbose is set, like model.fit.
+    """
+    
+    def __init__(self, num_samples, verbose=1):
+        super().__init__()
+        self.num_samples = num_samples
+        self.verbose = verbose
+    
+    def on_epoch_begin(self, epoch, logs=None):
+        self._start = time.perf_counter()
+        self._train_end = None
+    
+    def on_test_begin(self, logs=None):
+        if self._train_end is None:
+            self._train_end = time.perf_counter()
+    
+    def on_epoch_end(self, epoch, logs=None):
+        train_end = self._train_end if self._train_end is not None else time.perf_counter()
+        samples_per_sec = self.num_samples / (train_end - self._start)
+        if logs is not None:
+            logs['samples_per_sec'] = samples_per_sec
+        if self.verbose:
+            print(f" - {samples_per_sec:,.0f} samples/sec")
+
+class RungPruner(Callback):
+    """
+    Median-stopping pruner for hyperparameter sweeps
+    
+    At each rung epoch the validation ROC-AUC is recorded in a table shared by all trials
+    (rung_values: epoch -> list of AUCs, guarded by lock). Once at least min_trials other
+    trials reported at that rung, a trial below their median stops training.
+    train_model sets validation_data before fit (the sweep's shared holdout, projected with
+    the trial's PCA). last_auc is the AUC at the last rung reached; final_auc is taken in
+    on_train_end on the model fit returns (best weights restored), pruned or not.
+    """
+    
+    def __init__(self, rungs, rung_values, lock, min_trials=3):
+        super().__init__()
+        self.rungs = set(rungs)
+        self.rung_values = rung_values
+        self.lock = lock
+        self.min_trials = min_trials
+        self.validation_data = None
+        self.pruned_at = None
+        self.last_auc = None
+        self.final_auc = None
+    
+    def _validation_auc(self):
+        X_val, y_val = self.validation_data
+        return roc_auc_score(y_val, self.model.predict(X_val, verbose=0).flatten())
+    
+    def on_epoch_end(self, epoch, logs=None):
+        epoch = epoch + 1
+        if epoch not in self.rungs:
+            return
+        
+        self.last_auc = self._validation_auc()
+        
+        with self.lock:
+            others = list(self.rung_values.get(epoch, []))
+            self.rung_values[epoch] = others + [self.last_auc]
+        
+        if len(others) >= self.min_trials and self.last_auc < np.median(others):
+            print(f"Pruned at epoch {epoch}: val AUC {self.last_auc:.4f} < median {np.median(others):.4f}")
+            self.pruned_at = epoch
+            self.model.stop_training = True
+    
+    def on_train_end(self, logs=None):
+        # Runs after EarlyStopping (callbacks are called in list order), so this scores the final model
+        self.final_auc = self._validation_auc()
+
+def scaled_learning_rate(config):
+    """
+    Learning rate for config.BATCH_SIZE, scaled from BASE_LEARNING_RATE at BASE_BATCH_SIZE
+    ('linear': lr * k, 'sqrt': lr * sqrt(k), None: unchanged; k = BATCH_SIZE / BASE_BATCH_SIZE)
+    """
+    ratio = config.BATCH_SIZE / config.BASE_BATCH_SIZE
+    if config.LR_SCALING == 'linear':
+        return config.BASE_LEARNING_RATE * ratio
+    if config.LR_SCALING == 'sqrt':
+        return config.BASE_LEARNING_RATE * np.sqrt(ratio)
+    if config.LR_SCALING is None:
+        return config.BASE_LEARNING_RATE
+    raise ValueError(f"LR_SCALING must be 'linear', 'sqrt' or None, got: {config.LR_SCALING!r}")
+
+def make_dataset(X, y, batch_size, shuffle=False, seed=None):
+    """
+    tf.data pipeline over in-memory arrays: cache -> (shuffle) -> batch -> prefetch
+    
+    Shuffling happens after cache so every epoch sees a new order, like model.fit(shuffle=True).
+    """
+    dataset = tf.data.Dataset.from_tensor_slices((
+        np.asarray(X, dtype=np.float32),
+        np.asarray(y, dtype=np.float32)
+    )).cache()
+    if shuffle:
+        dataset = dataset.shuffle(len(X), seed=seed, reshuffle_each_iteration=True)
+    return dataset.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
 def train_model(model, X_train, y_train, X_val, y_val, config):
     """
     Train the fraud detection model
@@ -50,8 +157,10 @@ def train_model(model, X_train, y_train, X_val, y_val, config):
         verbose=1
     )
     
+    throughput = ThroughputLogger(len(X_train), verbose=getattr(config, 'FIT_VERBOSE', 1))
+    
     csv_logger = CSVLogger(
-        os.path.join(config.RESULTS_PATH, 'training_log.csv'),
+        getattr(config, 'TRAINING_LOG_PATH', os.path.join(config.RESULTS_PATH, 'training_log.csv')),
         append=False
     )
     
@@ -59,16 +168,42 @@ def train_model(model, X_train, y_train, X_val, y_val, config):
     print("Training Combined Model (Transaction + Network)...")
     print("="*60)
     
+    print(f"Batch size: {config.BATCH_SIZE} ({'tf.data pipeline' if config.USE_TF_DATA else 'NumPy arrays'})")
+    
+    # Callbacks added by the caller (e.g. RungPruner in sweeps) see the validation split,
+    # or the caller's own holdout when one is given (CALLBACK_VALIDATION_DATA)
+    extra_callbacks = list(getattr(config, 'EXTRA_CALLBACKS', []))
+    callback_validation = getattr(config, 'CALLBACK_VALIDATION_DATA', None) or (X_val, y_val)
+    for callback in extra_callbacks:
+        callback.validation_data = callback_validation
+    
+    # Throughput logger goes before CSVLogger so samples_per_sec is written to the log
+    callbacks = [checkpoint, early_stop, throughput, csv_logger] + extra_callbacks
+    
     # Train the model with class weights
-    history = model.fit(
-        X_train, y_train,
-        epochs=config.EPOCHS,
-        batch_size=config.BATCH_SIZE,
-        validation_data=(X_val, y_val),
-        class_weight=class_weight_dict,  # Add class weight
-        callbacks=[checkpoint, early_stop, csv_logger],
-        verbose=1
-    )
+    if config.USE_TF_DATA:
+        # Each ensemble member shuffles with its own seed (set by main_ensemble.train_seed)
+        train_dataset = make_dataset(X_train, y_train, config.BATCH_SIZE, shuffle=True,
+                                     seed=getattr(config, 'SHUFFLE_SEED', config.RANDOM_STATE))
+        val_dataset = make_dataset(X_val, y_val, config.BATCH_SIZE)
+        history = model.fit(
+            train_dataset,
+            epochs=config.EPOCHS,
+            validation_data=val_dataset,
+            class_weight=class_weight_dict,  # Add class weight
+            callbacks=callbacks,
+            verbose=getattr(config, 'FIT_VERBOSE', 1)
+        )
+    else:
+        history = model.fit(
+            X_train, y_train,
+            epochs=config.EPOCHS,
+            batch_size=config.BATCH_SIZE,
+            validation_data=(X_val, y_val),
+            class_weight=class_weight_dict,  # Add class weight
+            callbacks=callbacks,
+            verbose=getattr(config, 'FIT_VERBOSE', 1)
+        )
     
     print("\nTraining completed!")
     print(f"Best model saved to: {config.MODEL_SAVE_PATH}")
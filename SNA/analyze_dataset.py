@@ -2,10 +2,16 @@
 Script phân tích cơ bản DataCo Supply Chain Dataset
 Trả lời các câu hỏi về dataset
 """
+import os
+import sys
 import pandas as pd
 import warnings
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import ingest
 warnings.filterwarnings('ignore')
 
+DATASET_PATH = 'data/DataCoSupplyChainDataset.csv'
+
 
 def analyze_dataset():
     """Phân tích dataset và trả lời các câu hỏi"""
@@ -14,10 +20,26 @@ def analyze_dataset():
     print("PHÂN TÍCH DATACO SUPPLY CHAIN DATASET")
     print("="*80)
     
-    # Đọc dữ liệu
+    # Đọc header trước để chỉ load các cột cần cho các câu hỏi bên dưới
     print("\n[1] Đọc dữ liệu...")
-    df = pd.read_csv('data/DataCoSupplyChainDataset.csv', encoding='latin-1')
-    print("✓ Đã đọc dữ liệu thành công!")
+    all_columns = ingest.raw_columns(DATASET_PATH)
+    
+    fraud_keywords = ['fraud', 'status', 'suspicious', 'late', 'delivery']
+    potential_fraud_cols = []
+    
+    for col in all_columns:
+        for keyword in fraud_keywords:
+            if keyword.lower() in col.lower():
+                if col not in potential_fraud_cols:
+                    potential_fraud_cols.append(col)
+    
+    customer_cols = [col for col in all_columns if 'customer' in col.lower() and 'id' in col.lower()]
+    product_cols = [col for col in all_columns if 'product' in col.lower()]
+    indicator_cols = ['Order Status', 'Late_delivery_risk', 'Benefit per order']
+    
+    needed_cols = list(dict.fromkeys(potential_fraud_cols + customer_cols[:1] + product_cols + indicator_cols))
+    df = ingest.load_raw_dataset(DATASET_PATH, columns=needed_cols)
+    print(f"✓ Đã đọc dữ liệu thành công! ({len(df.columns)}/{len(all_columns)} cột cần thiết)")
     
     # Câu hỏi 1: Số rows
     print("\n" + "-"*80)
@@ -30,10 +52,10 @@ def analyze_dataset():
     print("\n" + "-"*80)
     print("CÂU HỎI 2: Có bao nhiêu columns?")
     print("-"*80)
-    num_cols = len(df.columns)
+    num_cols = len(all_columns)
     print(f"✓ Tổng số columns: {num_cols}")
     print(f"\nDanh sách các columns:")
-    for i, col in enumerate(df.columns, 1):
+    for i, col in enumerate(all_columns, 1):
         print(f"  {i:2d}. {col}")
     
     # Câu hỏi 3: Fraud label ở cột nào?
@@ -41,16 +63,7 @@ def analyze_dataset():
     print("CÂU HỎI 3: Fraud label ở cột nào?")
     print("-"*80)
     
-    # Tìm các cột liên quan đến fraud/order status
-    fraud_keywords = ['fraud', 'status', 'suspicious', 'late', 'delivery']
-    potential_fraud_cols = []
-    
-    for col in df.columns:
-        for keyword in fraud_keywords:
-            if keyword.lower() in col.lower():
-                if col not in potential_fraud_cols:
-                    potential_fraud_cols.append(col)
-    
+    # Các cột liên quan đến fraud/order status (đã tìm từ header ở bước [1])
     print(f"✓ Tìm thấy {len(potential_fraud_cols)} cột có thể liên quan đến fraud:")
     for col in potential_fraud_cols:
         unique_vals = df[col].nunique()
@@ -63,9 +76,7 @@ def analyze_dataset():
     print("CÂU HỎI 4: Có bao nhiêu unique customers?")
     print("-"*80)
     
-    # Tìm cột customer
-    customer_cols = [col for col in df.columns if 'customer' in col.lower() and 'id' in col.lower()]
-    
+    # Cột customer (đã tìm từ header ở bước [1])
     if customer_cols:
         customer_col = customer_cols[0]
         num_unique_customers = df[customer_col].nunique()
@@ -79,9 +90,7 @@ def analyze_dataset():
     print("CÂU HỎI 5: Có bao nhiêu unique products?")
     print("-"*80)
     
-    # Tìm cột product
-    product_cols = [col for col in df.columns if 'product' in col.lower()]
-    
+    # Các cột product (đã tìm từ header ở bước [1])
     print(f"Tìm thấy {len(product_cols)} cột liên quan đến product:")
     for col in product_cols:
         num_unique = df[col].nunique()
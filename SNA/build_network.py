@@ -2,25 +2,117 @@
 BƯỚC 2.2: XÂY DỰNG BIPARTITE NETWORK
 Từ edge list → NetworkX graph object
 """
+import numpy as np
 import pandas as pd
 import networkx as nx
 import pickle
 import warnings
+from sparse_graph import SparseBipartiteGraph
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import data_io
 warnings.filterwarnings('ignore')
 
+# Backend lưu graph: 'networkx' (dict-of-dicts) hoặc 'sparse' (SciPy CSR biadjacency)
+GRAPH_BACKEND = 'networkx'
 
-def build_bipartite_network():
+# Định dạng file graph: 'npy' (thư mục .npy CSR + cột thuộc tính, mở bằng mmap)
+# hoặc 'pickle' (gpickle NetworkX / pkl sparse như trước)
+GRAPH_FORMAT = 'npy'
+GRAPH_PATH = 'data/bipartite_graph'
+NETWORKX_GRAPH_PATH = 'data/bipartite_graph.gpickle'
+SPARSE_GRAPH_PATH = 'data/bipartite_graph_sparse.pkl'
+
+# Update incremental (định dạng 'npy') chỉ ghi batch vào thư mục graph; khi tổng transactions
+# của các batch chưa gộp vượt GRAPH_COMPACT_RATIO × số edges, graph được ghi lại đầy đủ
+GRAPH_COMPACT_RATIO = 0.1
+
+
+def fraud_count_attributes(df, id_col, prefix):
+    """Tính fraud_count/normal_count/is_fraud cho mọi node của một phía bằng một lần groupby"""
+    stats = df.groupby(id_col)['is_fraud'].agg(['sum', 'size'])
+    fraud_counts = stats['sum'].astype(int)
+    normal_counts = (stats['size'] - stats['sum']).astype(int)
+    
+    return {
+        f'{prefix}{node_id}': {
+            'fraud_count': int(fraud),
+            'normal_count': int(normal),
+            'is_fraud': int(fraud > 0)
+        }
+        for node_id, fraud, normal in zip(stats.index, fraud_counts, normal_counts)
+    }
+
+
+def save_graph(G, backend=GRAPH_BACKEND, graph_format=GRAPH_FORMAT):
+    """Lưu graph (NetworkX hoặc SparseBipartiteGraph) theo graph_format, trả về đường dẫn"""
+    if graph_format == 'npy':
+        SG = G if backend == 'sparse' else SparseBipartiteGraph.from_networkx(G)
+        SG.save(GRAPH_PATH)
+        return GRAPH_PATH
+    
+    path = SPARSE_GRAPH_PATH if backend == 'sparse' else NETWORKX_GRAPH_PATH
+    with open(path, 'wb') as f:
+        pickle.dump(G, f)
+    return path
+
+
+def save_graph_batch(G, delta, batch_id, backend=GRAPH_BACKEND, graph_format=GRAPH_FORMAT,
+                     compact_ratio=GRAPH_COMPACT_RATIO):
+    """
+    Lưu graph sau khi áp dụng batch delta (G đã gồm batch), trả về đường dẫn
+
+    Định dạng 'npy': chỉ batch được ghi (SparseBipartiteGraph.append_batch), cho tới khi các
+    batch chưa gộp vượt compact_ratio × số edges thì ghi lại G đầy đủ. Mỗi lần ghi đầy đủ
+    đến sau ít nhất compact_ratio × E transactions mới, nên chi phí ghi trung bình tỉ lệ với
+    batch. Định dạng 'pickle' luôn ghi lại cả file.
+    """
+    if graph_format == 'npy':
+        num_edges = G.num_edges if backend == 'sparse' else G.number_of_edges()
+        if SparseBipartiteGraph.pending_rows(GRAPH_PATH) + len(delta) <= compact_ratio * num_edges:
+            SparseBipartiteGraph.append_batch(GRAPH_PATH, delta, batch_id)
+            return GRAPH_PATH
+    return save_graph(G, backend, graph_format)
+
+
+def load_graph(backend=GRAPH_BACKEND, graph_format=GRAPH_FORMAT):
+    """
+    Load graph đã lưu bởi save_graph
+
+    Định dạng 'npy' + backend 'sparse' chỉ memory-map các mảng (gần như O(1));
+    backend 'networkx' dựng lại NetworkX graph từ các mảng đó.
+    """
+    if graph_format not in ('npy', 'pickle'):
+        raise ValueError(f"graph_format phải là 'npy' hoặc 'pickle', nhận được: {graph_format!r}")
+    
+    if graph_format == 'npy':
+        SG = SparseBipartiteGraph.load(GRAPH_PATH)
+        return SG if backend == 'sparse' else SG.to_networkx()
+    
+    path = SPARSE_GRAPH_PATH if backend == 'sparse' else NETWORKX_GRAPH_PATH
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def build_bipartite_network(backend=GRAPH_BACKEND, graph_format=GRAPH_FORMAT):
     """Xây dựng bipartite network từ edge list"""
     
+    if backend not in ('networkx', 'sparse'):
+        raise ValueError(f"backend phải là 'networkx' hoặc 'sparse', nhận được: {backend!r}")
+    
     print("="*80)
     print("BƯỚC 2.2: XÂY DỰNG BIPARTITE NETWORK")
     print("="*80)
     
     # Đọc edge list
     print("\n[1] Đọc edge list...")
-    df = pd.read_csv('data/edgelist.csv')
+    df = data_io.read_table('data/edgelist.csv')
     print(f"✓ Đã đọc {len(df):,} edges")
     
+    if backend == 'sparse':
+        return build_sparse_network(df, graph_format)
+    
     # Tạo bipartite graph
     print("\n[2] Tạo bipartite graph...")
     G = nx.Graph()
@@ -28,18 +120,15 @@ def build_bipartite_network():
     # Thêm customer nodes (set 0)
     customer_nodes = df['customer_id'].unique()
     print(f"   Thêm {len(customer_nodes):,} customer nodes...")
-    for cust in customer_nodes:
-        G.add_node(f'C_{cust}', bipartite=0)
+    G.add_nodes_from((f'C_{cust}' for cust in customer_nodes), bipartite=0)
     
     # Thêm product nodes (set 1)
     product_nodes = df['product_id'].unique()
     print(f"   Thêm {len(product_nodes):,} product nodes...")
-    for prod in product_nodes:
-        G.add_node(f'P_{prod}', bipartite=1)
+    G.add_nodes_from((f'P_{prod}' for prod in product_nodes), bipartite=1)
     
     # Thêm edges với attributes
     print(f"\n[3] Thêm edges với attributes...")
-    edge_count = 0
     
     # Group by customer-product pairs để aggregate
     grouped = df.groupby(['customer_id', 'product_id']).agg({
@@ -48,41 +137,29 @@ def build_bipartite_network():
         'is_fraud': 'max'  # Nếu có 1 transaction fraud thì edge = fraud
     }).reset_index()
     
-    for _, row in grouped.iterrows():
-        customer_node = f"C_{row['customer_id']}"
-        product_node = f"P_{row['product_id']}"
-        
-        G.add_edge(
-            customer_node,
-            product_node,
-            weight=1,  # Số lần mua (có thể adjust)
-            total_sales=float(row['sales']),
-            total_quantity=int(row['quantity'])
+    # Thêm toàn bộ edges một lần (không dùng iterrows: iterrows ép kiểu
+    # customer_id/product_id sang float → sinh node 'C_1.0' thay vì 'C_1')
+    G.add_edges_from(
+        (f'C_{cust}', f'P_{prod}', {
+            'weight': 1,  # Số lần mua (có thể adjust)
+            'total_sales': float(sales),
+            'total_quantity': int(quantity)
+        })
+        for cust, prod, sales, quantity in zip(
+            grouped['customer_id'], grouped['product_id'],
+            grouped['sales'], grouped['quantity']
         )
-        edge_count += 1
+    )
+    edge_count = len(grouped)
     
     print(f"✓ Đã thêm {edge_count:,} unique edges")
     
     # Thêm node attributes: fraud count và normal count
     print("\n[4] Tính fraud count cho mỗi node...")
     
-    # Customer nodes
-    for cust_id in customer_nodes:
-        cust_node = f'C_{cust_id}'
-        cust_data = df[df['customer_id'] == cust_id]
-        fraud_count = cust_data['is_fraud'].sum()
-        normal_count = len(cust_data) - fraud_count
-        G.nodes[cust_node]['fraud_count'] = int(fraud_count)
-        G.nodes[cust_node]['normal_count'] = int(normal_count)
-    
-    # Product nodes
-    for prod_id in product_nodes:
-        prod_node = f'P_{prod_id}'
-        prod_data = df[df['product_id'] == prod_id]
-        fraud_count = prod_data['is_fraud'].sum()
-        normal_count = len(prod_data) - fraud_count
-        G.nodes[prod_node]['fraud_count'] = int(fraud_count)
-        G.nodes[prod_node]['normal_count'] = int(normal_count)
+    # Một lần groupby cho mỗi loại node thay vì lọc df theo từng node
+    nx.set_node_attributes(G, fraud_count_attributes(df, 'customer_id', 'C_'))
+    nx.set_node_attributes(G, fraud_count_attributes(df, 'product_id', 'P_'))
     
     # Network statistics
     print("\n[5] Thống kê network...")
@@ -100,9 +177,8 @@ def build_bipartite_network():
     
     # Lưu graph object
     print("\n[6] Lưu graph object...")
-    with open('data/bipartite_graph.gpickle', 'wb') as f:
-        pickle.dump(G, f)
-    print("✓ Đã lưu: data/bipartite_graph.gpickle")
+    graph_path = save_graph(G, 'networkx', graph_format)
+    print(f"✓ Đã lưu: {graph_path}")
     
     # Lưu graph info (metadata nhỏ gọn)
     graph_info = {
@@ -132,5 +208,55 @@ def build_bipartite_network():
     return G, graph_info
 
 
+def build_sparse_network(df, graph_format=GRAPH_FORMAT):
+    """Xây dựng bipartite network dạng CSR biadjacency (backend 'sparse')"""
+    
+    print("\n[2] Tạo CSR biadjacency matrix...")
+    G = SparseBipartiteGraph.from_edgelist(df)
+    print(f"   {G.num_customers:,} customers × {G.num_products:,} products")
+    print(f"✓ Đã thêm {G.num_edges:,} unique edges")
+    
+    # Network statistics (vectorized trên sparse matrix)
+    print("\n[3] Thống kê network...")
+    num_components, labels = G.connected_components()
+    is_connected = num_components == 1
+    print(f"   Total nodes: {G.num_nodes:,}")
+    print(f"   Total edges: {G.num_edges:,}")
+    print(f"   Density: {G.density():.6f}")
+    print(f"   Is bipartite: True")
+    print(f"   Is connected: {is_connected}")
+    
+    if not is_connected:
+        print(f"   Number of components: {num_components}")
+        print(f"   Largest component size: {np.bincount(labels).max():,} nodes")
+    
+    # Lưu graph object
+    print("\n[4] Lưu graph object...")
+    graph_path = save_graph(G, 'sparse', graph_format)
+    print(f"✓ Đã lưu: {graph_path}")
+    
+    graph_info = {
+        'num_nodes': G.num_nodes,
+        'num_customers': G.num_customers,
+        'num_products': G.num_products,
+        'num_edges': G.num_edges,
+        'num_fraud_customers': int(G.customer_attrs['is_fraud'].sum()),
+        'density': G.density(),
+        'is_bipartite': True,  # Edges chỉ nối customer ↔ product theo cấu trúc CSR
+        'is_connected': is_connected,
+        'avg_degree': 2 * G.num_edges / G.num_nodes
+    }
+    
+    with open('data/graph_info.pkl', 'wb') as f:
+        pickle.dump(graph_info, f)
+    print("✓ Đã lưu: data/graph_info.pkl")
+    
+    print("\n" + "="*80)
+    print("HOÀN TẤT XÂY DỰNG NETWORK (SPARSE BACKEND)!")
+    print("="*80)
+    
+    return G, graph_info
+
+
 if __name__ == "__main__":
     G, info = build_bipartite_network()
@@ -2,64 +2,149 @@
 TÍNH NETWORK FEATURES
 Extract các centrality measures và community detection
 """
+import os
 import pickle
+import sys
 import networkx as nx
+import numpy as np
 import pandas as pd
 from tqdm import tqdm
 import warnings
+import centrality
+import louvain
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import data_io
+from build_network import GRAPH_BACKEND, GRAPH_FORMAT, load_graph
 warnings.filterwarnings('ignore')
 
+# Closeness: 'serial' (nx.closeness_centrality từng customer) hoặc
+# 'parallel' (batch BFS trên sparse adjacency, chia qua process pool - cùng kết quả)
+CLOSENESS_MODE = 'parallel'
 
-def calculate_network_features():
+# Betweenness: 'parallel' (k pivots chia qua process pool, có sai số chuẩn mỗi node) hoặc
+# 'networkx' (nx.betweenness_centrality đơn luồng). Cả hai đều dùng BETWEENNESS_SEED
+BETWEENNESS_MODE = 'parallel'
+BETWEENNESS_K = 5000
+BETWEENNESS_SEED = 42
+
+# Community: 'louvain' (louvain.py, vectorized trên sparse adjacency, cố định theo LOUVAIN_SEED)
+# hoặc 'python-louvain' (community_louvain.best_partition thuần Python)
+COMMUNITY_MODE = 'louvain'
+LOUVAIN_SEED = 42
+LOUVAIN_RESOLUTION = 1.0
+LOUVAIN_RESTARTS = 4  # Số lần chạy với seed khác nhau (song song), giữ modularity cao nhất
+
+N_JOBS = None  # None = dùng toàn bộ CPU cores
+
+
+def calculate_network_features(backend=GRAPH_BACKEND, closeness_mode=CLOSENESS_MODE,
+                               betweenness_mode=BETWEENNESS_MODE, betweenness_k=BETWEENNESS_K,
+                               betweenness_seed=BETWEENNESS_SEED, n_jobs=N_JOBS,
+                               graph_format=GRAPH_FORMAT, community_mode=COMMUNITY_MODE,
+                               louvain_seed=LOUVAIN_SEED, louvain_resolution=LOUVAIN_RESOLUTION,
+                               louvain_restarts=LOUVAIN_RESTARTS):
     """Tính toán network features cho mỗi customer"""
     
+    if backend not in ('networkx', 'sparse'):
+        raise ValueError(f"backend phải là 'networkx' hoặc 'sparse', nhận được: {backend!r}")
+    if closeness_mode not in ('serial', 'parallel'):
+        raise ValueError(f"closeness_mode phải là 'serial' hoặc 'parallel', nhận được: {closeness_mode!r}")
+    if betweenness_mode not in ('networkx', 'parallel'):
+        raise ValueError(f"betweenness_mode phải là 'networkx' hoặc 'parallel', nhận được: {betweenness_mode!r}")
+    if community_mode not in ('louvain', 'python-louvain'):
+        raise ValueError(f"community_mode phải là 'louvain' hoặc 'python-louvain', nhận được: {community_mode!r}")
+    
     print("="*80)
     print("TÍNH NETWORK FEATURES")
     print("="*80)
     
     # Load network
     print("\n[1] Load bipartite network...")
-    with open('data/bipartite_graph.gpickle', 'rb') as f:
-        G = pickle.load(f)
-    
-    print(f"✓ Đã load network:")
-    print(f"  - Nodes: {G.number_of_nodes():,}")
-    print(f"  - Edges: {G.number_of_edges():,}")
-    
-    # Lọc customer nodes
-    customer_nodes = [n for n in G.nodes() if n.startswith('C_')]
+    if backend == 'sparse':
+        SG = load_graph('sparse', graph_format)
+        
+        print(f"✓ Đã load network (sparse backend):")
+        print(f"  - Nodes: {SG.num_nodes:,}")
+        print(f"  - Edges: {SG.num_edges:,}")
+        
+        # Customers nằm ở index [0, num_customers) của adjacency
+        customer_nodes = SG.customer_nodes()
+        customer_ids = SG.customer_ids
+        adjacency = SG.adjacency()
+        customer_idx = np.arange(SG.num_customers)
+        num_nodes = SG.num_nodes
+        
+        # Betweenness/closeness dạng NetworkX và python-louvain vẫn cần NetworkX graph
+        needs_networkx = (betweenness_mode == 'networkx' or closeness_mode == 'serial'
+                          or community_mode == 'python-louvain')
+        G = SG.to_networkx() if needs_networkx else None
+    else:
+        G = load_graph('networkx', graph_format)
+        
+        print(f"✓ Đã load network:")
+        print(f"  - Nodes: {G.number_of_nodes():,}")
+        print(f"  - Edges: {G.number_of_edges():,}")
+        
+        # Phân hoạch customer/product một lần bằng mảng index (thay vì lọc list theo từng node)
+        nodelist = list(G.nodes())
+        customer_idx = np.flatnonzero(np.char.startswith(np.array(nodelist, dtype=str), 'C_'))
+        customer_nodes = [nodelist[i] for i in customer_idx]
+        customer_ids = np.array([node[2:] for node in customer_nodes])
+        
+        # CSR adjacency theo đúng thứ tự nodelist nên customer_idx dùng trực tiếp được
+        adjacency = nx.to_scipy_sparse_array(G, nodelist=nodelist, weight=None, format='csr')
+        num_nodes = len(nodelist)
     print(f"  - Customer nodes: {len(customer_nodes):,}")
     
+    # Degree thực (số products) của mỗi customer, đọc thẳng từ CSR
+    degree = np.diff(adjacency.indptr)[customer_idx]
+    
     # 1. DEGREE CENTRALITY
     print("\n[2] Tính Degree Centrality...")
     print("  (Đo lường số lượng connections của node)")
     
-    degree_centrality = nx.degree_centrality(G)
-    
-    # Chỉ lấy customers
-    degree_dict = {node: degree_centrality[node] for node in customer_nodes}
+    if backend == 'sparse':
+        degree_centrality = SG.degree_centrality()[customer_idx]
+    else:
+        # Giống nx.degree_centrality: degree · 1/(n - 1)
+        degree_centrality = degree * (1.0 / (num_nodes - 1)) if num_nodes > 1 else np.ones(len(customer_idx))
     
-    print(f"  ✓ Đã tính degree centrality cho {len(degree_dict):,} customers")
-    print(f"  - Min: {min(degree_dict.values()):.6f}")
-    print(f"  - Max: {max(degree_dict.values()):.6f}")
-    print(f"  - Mean: {sum(degree_dict.values())/len(degree_dict):.6f}")
+    print(f"  ✓ Đã tính degree centrality cho {len(degree_centrality):,} customers")
+    print(f"  - Min: {degree_centrality.min():.6f}")
+    print(f"  - Max: {degree_centrality.max():.6f}")
+    print(f"  - Mean: {degree_centrality.mean():.6f}")
     
     # 2. BETWEENNESS CENTRALITY
     print("\n[3] Tính Betweenness Centrality...")
     print("  (Đo lường vai trò làm cầu nối giữa các nodes)")
     print("  ⏳ Đây có thể mất vài phút...")
     
-    # Sử dụng sampling để tăng tốc
-    k = min(5000, G.number_of_nodes())
-    betweenness_centrality = nx.betweenness_centrality(G, k=k)
+    # Sử dụng sampling để tăng tốc (pivots cố định theo seed)
+    k = min(betweenness_k, num_nodes)
     
-    # Chỉ lấy customers
-    betweenness_dict = {node: betweenness_centrality[node] for node in customer_nodes}
+    if betweenness_mode == 'parallel':
+        print(f"  ⏳ {k:,} pivots (seed={betweenness_seed}), {n_jobs or 'tất cả'} processes...")
+        betweenness, betweenness_std = centrality.betweenness_centrality(
+            adjacency, k=k, seed=betweenness_seed, n_jobs=n_jobs
+        )
+        
+        # Chỉ lấy customers
+        betweenness = betweenness[customer_idx]
+        betweenness_error = betweenness_std[customer_idx]
+    else:
+        betweenness_centrality = nx.betweenness_centrality(G, k=k, seed=betweenness_seed)
+        
+        # Chỉ lấy customers
+        betweenness = np.array([betweenness_centrality[node] for node in customer_nodes])
+        betweenness_error = None
     
-    print(f"  ✓ Đã tính betweenness centrality cho {len(betweenness_dict):,} customers")
-    print(f"  - Min: {min(betweenness_dict.values()):.6f}")
-    print(f"  - Max: {max(betweenness_dict.values()):.6f}")
-    print(f"  - Mean: {sum(betweenness_dict.values())/len(betweenness_dict):.6f}")
+    print(f"  ✓ Đã tính betweenness centrality cho {len(betweenness):,} customers")
+    print(f"  - Min: {betweenness.min():.6f}")
+    print(f"  - Max: {betweenness.max():.6f}")
+    print(f"  - Mean: {betweenness.mean():.6f}")
+    if betweenness_error is not None:
+        print(f"  - Sai số chuẩn (k={k:,}): mean {np.nanmean(betweenness_error):.2e}, "
+              f"max {np.nanmax(betweenness_error):.2e}")
     
     # 3. CLOSENESS CENTRALITY
     print("\n[4] Tính Closeness Centrality...")
@@ -67,79 +152,81 @@ def calculate_network_features():
     
     # Network không connected, nên tính cho từng component
     # Hoặc dùng closeness cho disconnected graph
-    closeness_dict = {}
-    
-    print("  ⏳ Tính closeness cho từng customer...")
-    for node in tqdm(customer_nodes, desc="  Progress"):
-        try:
-            # Chỉ tính closeness trong component của node
-            closeness_dict[node] = nx.closeness_centrality(G, node)
-        except:
-            closeness_dict[node] = 0.0
-    
-    print(f"  ✓ Đã tính closeness centrality cho {len(closeness_dict):,} customers")
-    print(f"  - Min: {min(closeness_dict.values()):.6f}")
-    print(f"  - Max: {max(closeness_dict.values()):.6f}")
-    print(f"  - Mean: {sum(closeness_dict.values())/len(closeness_dict):.6f}")
+    if closeness_mode == 'parallel':
+        print(f"  ⏳ Batch BFS trên sparse adjacency ({n_jobs or 'tất cả'} processes)...")
+        closeness = centrality.closeness_centrality(adjacency, customer_idx, n_jobs=n_jobs)
+    else:
+        print("  ⏳ Tính closeness cho từng customer...")
+        closeness = np.zeros(len(customer_nodes))
+        for i, node in enumerate(tqdm(customer_nodes, desc="  Progress")):
+            try:
+                # Chỉ tính closeness trong component của node
+                closeness[i] = nx.closeness_centrality(G, node)
+            except:
+                closeness[i] = 0.0
+    
+    print(f"  ✓ Đã tính closeness centrality cho {len(closeness):,} customers")
+    print(f"  - Min: {closeness.min():.6f}")
+    print(f"  - Max: {closeness.max():.6f}")
+    print(f"  - Mean: {closeness.mean():.6f}")
     
     # 4. COMMUNITY DETECTION
     print("\n[5] Detect Communities...")
     print("  (Phát hiện nhóm nodes có kết nối chặt chẽ)")
     
-    try:
-        import community as community_louvain
-        
+    if community_mode == 'python-louvain':
+        try:
+            import community as community_louvain
+        except ImportError:
+            print("  ⚠️ python-louvain not installed → dùng louvain.py")
+            community_mode = 'louvain'
+    
+    if community_mode == 'python-louvain':
         # Louvain algorithm cần undirected graph (đã có rồi)
-        print("  ⏳ Chạy Louvain algorithm...")
-        communities = community_louvain.best_partition(G)
+        print(f"  ⏳ Chạy python-louvain (seed={louvain_seed})...")
+        communities = community_louvain.best_partition(G, resolution=louvain_resolution,
+                                                       random_state=louvain_seed)
         
         # Chỉ lấy customers
-        community_dict = {node: communities[node] for node in customer_nodes}
-        
-        num_communities = len(set(community_dict.values()))
+        community_ids = np.array([communities[node] for node in customer_nodes])
         modularity = community_louvain.modularity(communities, G)
+    else:
+        print(f"  ⏳ Louvain trên sparse adjacency ({louvain_restarts} lần chạy, seed={louvain_seed})...")
+        labels, modularity = louvain.louvain(
+            adjacency, seed=louvain_seed, resolution=louvain_resolution,
+            n_restarts=louvain_restarts, n_jobs=n_jobs
+        )
         
-        print(f"  ✓ Đã phát hiện {num_communities} communities")
-        print(f"  - Modularity score: {modularity:.4f}")
-        
-        # Phân bố communities
-        from collections import Counter
-        comm_counts = Counter(community_dict.values())
-        print(f"  - Largest community: {max(comm_counts.values()):,} members")
-        print(f"  - Smallest community: {min(comm_counts.values()):,} members")
-        
-    except ImportError:
-        print("  ⚠️ python-louvain not installed")
-        print("  Tạo community IDs dựa trên connected components thay thế...")
-        
-        community_dict = {}
-        for i, component in enumerate(nx.connected_components(G)):
-            for node in component:
-                if node in customer_nodes:
-                    community_dict[node] = i
-        
-        num_communities = len(set(community_dict.values()))
-        print(f"  ✓ Đã tạo {num_communities} communities từ connected components")
+        # Chỉ lấy customers
+        community_ids = labels[customer_idx]
+    
+    # Phân bố communities
+    comm_counts = np.unique(community_ids, return_counts=True)[1]
+    num_communities = len(comm_counts)
+    print(f"  ✓ Đã phát hiện {num_communities} communities")
+    print(f"  - Modularity score: {modularity:.4f}")
+    print(f"  - Largest community: {comm_counts.max():,} members")
+    print(f"  - Smallest community: {comm_counts.min():,} members")
     
     # Tổng hợp kết quả
     print("\n[6] Tạo DataFrame tổng hợp...")
     
-    # Tạo DataFrame
-    results = []
-    for node in customer_nodes:
-        customer_id = node.replace('C_', '')
-        
-        results.append({
-            'customer_id': customer_id,
-            'degree_centrality': degree_dict.get(node, 0),
-            'betweenness_centrality': betweenness_dict.get(node, 0),
-            'closeness_centrality': closeness_dict.get(node, 0),
-            'community_id': community_dict.get(node, 0),
-            'degree': G.degree(node),  # Actual degree (number of products)
-            'is_fraud': G.nodes[node].get('is_fraud', 0)
-        })
-    
-    df_features = pd.DataFrame(results)
+    # Mọi cột là mảng cùng thứ tự customer_nodes → tạo DataFrame một lần
+    if backend == 'sparse':
+        is_fraud = SG.customer_attrs['is_fraud']
+    else:
+        is_fraud = np.array([G.nodes[node].get('is_fraud', 0) for node in customer_nodes])
+    
+    df_features = pd.DataFrame({
+        'customer_id': customer_ids,
+        'degree_centrality': degree_centrality,
+        'betweenness_centrality': betweenness,
+        'closeness_centrality': closeness,
+        'betweenness_error': betweenness_error if betweenness_error is not None else np.nan,
+        'community_id': community_ids,
+        'degree': degree,  # Actual degree (number of products)
+        'is_fraud': is_fraud
+    })
     
     print(f"  ✓ Đã tạo DataFrame với {len(df_features):,} rows và {len(df_features.columns)} columns")
     
@@ -169,10 +256,12 @@ def calculate_network_features():
     print("\n[9] Lưu dictionaries...")
     
     features_dict = {
-        'degree_centrality': degree_dict,
-        'betweenness_centrality': betweenness_dict,
-        'closeness_centrality': closeness_dict,
-        'community_id': community_dict
+        'degree_centrality': dict(zip(customer_nodes, degree_centrality.tolist())),
+        'betweenness_centrality': dict(zip(customer_nodes, betweenness.tolist())),
+        'closeness_centrality': dict(zip(customer_nodes, closeness.tolist())),
+        'community_id': dict(zip(customer_nodes, community_ids.tolist())),
+        'betweenness_error': (dict(zip(customer_nodes, betweenness_error.tolist()))
+                              if betweenness_error is not None else {})
     }
     
     with open('data/network_features_dict.pkl', 'wb') as f:
@@ -180,8 +269,8 @@ def calculate_network_features():
     print(f"  ✓ Đã lưu dictionaries vào: data/network_features_dict.pkl")
     
     # Lưu DataFrame
-    df_features.to_csv('data/network_features.csv', index=False)
-    print(f"  ✓ Đã lưu DataFrame vào: data/network_features.csv")
+    features_path = data_io.write_table(df_features, 'data/network_features.csv')
+    print(f"  ✓ Đã lưu DataFrame vào: {features_path}")
     
     # Tóm tắt
     print("\n" + "="*80)
@@ -196,7 +285,7 @@ def calculate_network_features():
     print(f"  - {len(df_features):,} customers có features")
     print(f"  - {num_communities} communities được phát hiện")
     print(f"  - Files đã tạo:")
-    print(f"    • network_features_dict.pkl (4 dictionaries)")
+    print(f"    • network_features_dict.pkl (4 dictionaries + betweenness_error)")
     print(f"    • network_features.csv (DataFrame)")
     print(f"\n✓ Sẵn sàng để so sánh với traditional features!")
     print("="*80)
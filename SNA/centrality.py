@@ -0,0 +1,180 @@
+"""
+CENTRALITY TRÊN SPARSE ADJACENCY
+Tính centrality theo batch trên CSR adjacency matrix và chia batch qua process pool
+"""
+import os
+import numpy as np
+import networkx as nx
+from concurrent.futures import ProcessPoolExecutor
+from scipy.sparse import csgraph
+from tqdm import tqdm
+
+
+# Adjacency được gửi sang mỗi worker một lần (qua initializer), không gửi lại theo từng batch
+_ADJACENCY = None
+
+
+def _init_worker(adjacency):
+    global _ADJACENCY
+    _ADJACENCY = adjacency
+
+
+def networkx_adjacency(G, nodes):
+    """CSR adjacency (chỉ cấu trúc) của NetworkX graph và index của `nodes` trong đó"""
+    nodelist = list(G.nodes())
+    adjacency = nx.to_scipy_sparse_array(G, nodelist=nodelist, weight=None, format='csr')
+    position = {node: i for i, node in enumerate(nodelist)}
+    return adjacency, np.array([position[node] for node in nodes], dtype=np.int64)
+
+
+def _run_batches(func, adjacency, batches, n_jobs, desc):
+    """Chạy func trên từng batch, tuần tự (n_jobs=1) hoặc qua process pool"""
+    n_jobs = n_jobs or os.cpu_count() or 1
+    if n_jobs == 1 or len(batches) <= 1:
+        _init_worker(adjacency)
+        return [func(batch) for batch in tqdm(batches, desc=desc)]
+
+    with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                             initargs=(adjacency,)) as executor:
+        return list(tqdm(executor.map(func, batches), total=len(batches), desc=desc))
+
+
+def _closeness_batch(sources):
+    """Closeness cho một batch source nodes: BFS từ cả batch trong một lần gọi csgraph"""
+    n = _ADJACENCY.shape[0]
+    dist = csgraph.shortest_path(_ADJACENCY, method='D', directed=False,
+                                 unweighted=True, indices=sources)
+    reachable = np.isfinite(dist)
+
+    # Giống nx.closeness_centrality: len(sp) gồm cả chính node, totsp = tổng khoảng cách
+    len_sp = reachable.sum(axis=1).astype(np.float64)
+    totsp = np.where(reachable, dist, 0.0).sum(axis=1)
+
+    closeness = np.zeros(len(sources))
+    valid = (totsp > 0.0) & (n > 1)
+    closeness[valid] = (len_sp[valid] - 1.0) / totsp[valid]
+    # Wasserman-Faust: normalize theo số node trong connected part
+    closeness[valid] *= (len_sp[valid] - 1.0) / (n - 1)
+    return closeness
+
+
+def closeness_centrality(adjacency, sources, n_jobs=None, batch_size=256):
+    """
+    Closeness centrality cho các node `sources` (index trong adjacency)
+
+    Kết quả trùng khớp với nx.closeness_centrality(G, node) (wf_improved=True):
+    khoảng cách BFS là số nguyên nên tổng và phép chia cho ra cùng giá trị float.
+
+    Args:
+        adjacency: CSR adjacency đối xứng (num_nodes × num_nodes)
+        sources: index các node cần tính
+        n_jobs: số process (None = số CPU, 1 = chạy tuần tự)
+        batch_size: số source BFS cùng lúc (bộ nhớ ~ batch_size × num_nodes × 8 bytes)
+
+    Returns:
+        np.ndarray closeness theo thứ tự `sources`
+    """
+    sources = np.asarray(sources, dtype=np.int64)
+    if len(sources) == 0:
+        return np.zeros(0)
+
+    batches = [sources[i:i + batch_size] for i in range(0, len(sources), batch_size)]
+    results = _run_batches(_closeness_batch, adjacency, batches, n_jobs, desc="  Progress")
+    return np.concatenate(results)
+
+
+def _betweenness_batch(sources):
+    """
+    Brandes cho một batch pivot sources, dạng ma trận (level-synchronous BFS)
+
+    Returns:
+        (tổng dependency, tổng bình phương dependency) của batch cho mỗi node
+    """
+    A = _ADJACENCY
+    b, n = len(sources), A.shape[0]
+    rows = np.arange(b)
+
+    # Forward: BFS đồng thời từ b sources, đếm số shortest paths (sigma)
+    sigma = np.zeros((b, n))
+    depth = np.full((b, n), -1, dtype=np.int32)
+    sigma[rows, sources] = 1.0
+    depth[rows, sources] = 0
+    frontier = sigma.copy()
+    d = 0
+    while True:
+        # A đối xứng nên (frontier @ A) = (A @ frontierᵀ)ᵀ
+        reached = np.asarray(A @ frontier.T).T
+        new = (depth == -1) & (reached > 0)
+        if not new.any():
+            break
+        d += 1
+        sigma[new] = reached[new]
+        depth[new] = d
+        frontier = np.where(new, sigma, 0.0)
+
+    # Backward: delta(v) = Σ_{w successor của v} sigma(v)/sigma(w) * (1 + delta(w))
+    # (không tích luỹ vào source vì endpoints=False)
+    delta = np.zeros((b, n))
+    for level in range(d, 1, -1):
+        at_level = depth == level
+        coeff = np.where(at_level, (1.0 + delta) / np.where(at_level, sigma, 1.0), 0.0)
+        contrib = np.asarray(A @ coeff.T).T
+        parents = depth == level - 1
+        delta[parents] += sigma[parents] * contrib[parents]
+
+    return delta.sum(axis=0), np.square(delta).sum(axis=0)
+
+
+def betweenness_centrality(adjacency, k=None, seed=None, n_jobs=None, batch_size=32):
+    """
+    Betweenness centrality (normalized, undirected, endpoints=False) với k pivot sources
+
+    Pivots được chọn bằng np.random.default_rng(seed) nên kết quả cố định theo seed.
+    Các batch pivot chạy song song; tổng từng phần được cộng theo thứ tự batch nên kết quả
+    không phụ thuộc n_jobs. Scale giống nx.betweenness_centrality(G, k=k): node v được ước
+    lượng từ các pivot khác v.
+
+    Args:
+        adjacency: CSR adjacency đối xứng (num_nodes × num_nodes)
+        k: số pivot sources (None hoặc >= num_nodes = tính chính xác)
+        seed: seed chọn pivots
+        n_jobs: số process (None = số CPU, 1 = chạy tuần tự)
+        batch_size: số pivot xử lý cùng lúc trong một worker
+
+    Returns:
+        (betweenness, std_error): hai np.ndarray theo index node. std_error là sai số chuẩn
+        ước lượng của betweenness (có hiệu chỉnh finite population, = 0 khi tính chính xác)
+    """
+    n = adjacency.shape[0]
+    if n < 3:
+        return np.zeros(n), np.zeros(n)
+
+    if k is None or k >= n:
+        pivots = np.arange(n)
+    else:
+        pivots = np.sort(np.random.default_rng(seed).choice(n, size=k, replace=False))
+
+    batches = [pivots[i:i + batch_size] for i in range(0, len(pivots), batch_size)]
+    results = _run_batches(_betweenness_batch, adjacency, batches, n_jobs, desc="  Pivots")
+
+    total = np.zeros(n)
+    total_sq = np.zeros(n)
+    for partial_sum, partial_sq in results:
+        total += partial_sum
+        total_sq += partial_sq
+
+    # Số pivot dùng để ước lượng cho mỗi node (pivot trùng node không đóng góp)
+    num_samples = np.full(n, len(pivots), dtype=np.float64)
+    num_samples[pivots] -= 1
+    num_samples = np.maximum(num_samples, 1.0)
+
+    mean = total / num_samples
+    betweenness = mean / (n - 2)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        variance = np.maximum(total_sq - num_samples * mean ** 2, 0.0) / (num_samples - 1)
+        fpc = 1.0 - num_samples / (n - 1)
+        std_error = np.sqrt(variance / num_samples * np.maximum(fpc, 0.0)) / (n - 2)
+    std_error[num_samples < 2] = np.nan
+
+    return betweenness, std_error
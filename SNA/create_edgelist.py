@@ -4,23 +4,22 @@ Tạo file edgelist đơn giản để build network
 """
 import pandas as pd
 import warnings
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import data_io, ingest
 warnings.filterwarnings('ignore')
 
 
-def create_edgelist():
-    """Tạo edge list từ dataset gốc"""
+def create_edgelist(fmt=data_io.ARTIFACT_FORMAT):
+    """Tạo edge list từ dataset gốc (fmt: 'csv', 'parquet' hoặc 'arrow')"""
     
     print("="*80)
     print("BƯỚC 2.1: TẠO EDGE LIST CHO NETWORK")
     print("="*80)
     
-    # Đọc dữ liệu gốc
-    print("\n[1] Đọc dữ liệu gốc...")
-    df = pd.read_csv('data/DataCoSupplyChainDataset.csv', encoding='latin-1')
-    print(f"✓ Đã đọc {len(df):,} rows và {len(df.columns)} columns")
-    
     # Chọn các cột cần thiết
-    print("\n[2] Chọn các cột cần thiết cho edge list...")
+    print("\n[1] Chọn các cột cần thiết cho edge list...")
     
     columns_needed = [
         'Customer Id',           # Customer node
@@ -31,14 +30,18 @@ def create_edgelist():
         'Order Status'           # Để xác định fraud
     ]
     
-    # Kiểm tra xem các cột có tồn tại không
-    missing_cols = [col for col in columns_needed if col not in df.columns]
+    # Kiểm tra xem các cột có tồn tại không (chỉ đọc header)
+    dataset_path = 'data/DataCoSupplyChainDataset.csv'
+    all_columns = ingest.raw_columns(dataset_path)
+    missing_cols = [col for col in columns_needed if col not in all_columns]
     if missing_cols:
         print(f"❌ Thiếu các cột: {missing_cols}")
         return None
     
-    # Tạo edge list
-    edgelist = df[columns_needed].copy()
+    # Đọc dữ liệu gốc (chỉ các cột cần thiết, qua cache dùng chung)
+    print("\n[2] Đọc dữ liệu gốc...")
+    edgelist = ingest.load_raw_dataset(dataset_path, columns=columns_needed)
+    print(f"✓ Đã đọc {len(edgelist):,} rows ({len(columns_needed)}/{len(all_columns)} columns)")
     
     print(f"✓ Đã chọn {len(columns_needed)} cột:")
     for col in columns_needed:
@@ -85,15 +88,14 @@ def create_edgelist():
     
     # Lưu file
     print("\n[8] Lưu edge list...")
-    output_path = 'data/edgelist.csv'
-    edgelist.to_csv(output_path, index=False)
+    output_path = data_io.write_table(edgelist, 'data/edgelist.csv', fmt)
     print(f"✓ Đã lưu vào: {output_path}")
     
     # Tóm tắt
     print("\n" + "="*80)
     print("TÓM TẮT EDGE LIST")
     print("="*80)
-    print(f"File: edgelist.csv")
+    print(f"File: {os.path.basename(output_path)}")
     print(f"Số cột: {len(edgelist.columns)}")
     print(f"Số dòng: {len(edgelist):,}")
     print(f"\nCác cột:")
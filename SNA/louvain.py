@@ -0,0 +1,186 @@
+"""
+LOUVAIN TRÊN SPARSE ADJACENCY
+Community detection dạng vectorized (NumPy/SciPy) thay cho python-louvain thuần Python:
+local-move đồng bộ trên toàn bộ node mỗi vòng, gộp community bằng Pᵀ·A·P,
+có seed cố định và chạy nhiều lần khởi tạo song song qua process pool
+"""
+import os
+import numpy as np
+import scipy.sparse as sp
+from concurrent.futures import ProcessPoolExecutor
+
+
+# Adjacency được gửi sang mỗi worker một lần (qua initializer), giống centrality.py
+_ADJACENCY = None
+
+
+def _init_worker(adjacency):
+    global _ADJACENCY
+    _ADJACENCY = adjacency
+
+
+def modularity(adjacency, labels, resolution=1.0):
+    """
+    Modularity của phân hoạch labels (giống nx.community.modularity / community_louvain.modularity)
+
+    Q = Σ_c [ L_c / 2m - resolution · (tot_c / 2m)² ], với L_c = tổng weight hai chiều bên trong c
+    """
+    A = sp.coo_matrix(adjacency)
+    two_m = A.data.sum()
+    if two_m == 0:
+        return 0.0
+
+    labels = np.asarray(labels)
+    num_communities = labels.max() + 1
+    inside = labels[A.row] == labels[A.col]
+    internal = np.bincount(labels[A.row[inside]], weights=A.data[inside], minlength=num_communities)
+    degree = np.bincount(A.row, weights=A.data, minlength=A.shape[0])
+    total = np.bincount(labels, weights=degree, minlength=num_communities)
+    return float(np.sum(internal / two_m - resolution * (total / two_m) ** 2))
+
+
+def _local_move(A, degree, two_m, rng, resolution, max_iter, move_probability, tol, patience):
+    """
+    Pha local-move, đồng bộ: mỗi vòng tính gain của mọi node tới mọi community láng giềng
+    cùng lúc, rồi chỉ một phần ngẫu nhiên (move_probability) các node có gain dương được
+    chuyển, tránh dao động khi hai node đổi chỗ cho nhau. Dừng khi không còn node nào muốn
+    chuyển, hoặc modularity tốt nhất không tăng thêm quá tol sau `patience` vòng liên tiếp.
+
+    Returns:
+        labels (community của mỗi node, chưa đánh số lại)
+    """
+    n = A.shape[0]
+    coo = A.tocoo()
+    off_diagonal = coo.row != coo.col
+    rows, cols, weights = coo.row[off_diagonal], coo.col[off_diagonal], coo.data[off_diagonal]
+
+    labels = np.arange(n)
+    total = degree.copy()
+    best_labels, best_q = labels.copy(), modularity(A, labels, resolution)
+    stalled = 0
+
+    for _ in range(max_iter):
+        # k_i,c: tổng weight từ node i tới community c (không tính self-loop)
+        K = sp.csr_matrix((weights, (rows, labels[cols])), shape=(n, n))
+        K.sum_duplicates()
+        k_rows = np.repeat(np.arange(n), np.diff(K.indptr))
+        own = K.indices == labels[k_rows]
+
+        # Gain khi đặt node i (đã tách khỏi community của nó) vào c:
+        #   k_i,c - resolution · k_i · tot_c\{i} / 2m
+        scale = resolution * degree / two_m
+        gain = K.data - scale[k_rows] * (total[K.indices] - np.where(own, degree[k_rows], 0.0))
+        own_k = np.zeros(n)
+        own_k[k_rows[own]] = K.data[own]
+        own_gain = own_k - scale * (total[labels] - degree)
+
+        # Community tốt nhất mỗi node: gain lớn nhất, hoà thì community có index nhỏ nhất
+        # (indices trong mỗi hàng CSR đã được sắp xếp sau sum_duplicates)
+        nonempty = np.flatnonzero(np.diff(K.indptr))
+        row_max = np.maximum.reduceat(gain, K.indptr[nonempty])
+        is_max = np.flatnonzero(gain >= np.repeat(row_max, np.diff(K.indptr)[nonempty]))
+        _, first = np.unique(k_rows[is_max], return_index=True)
+        best = is_max[first]
+        best_rows = k_rows[best]
+
+        candidates = gain[best] > own_gain[best_rows] + 1e-12 * degree[best_rows]
+        movers = best_rows[candidates]
+        if len(movers) == 0:
+            break
+
+        active = rng.random(len(movers)) < move_probability
+        if not active.any():
+            continue
+        movers = movers[active]
+        labels[movers] = K.indices[best][candidates][active]
+        total = np.bincount(labels, weights=degree, minlength=n)
+
+        q = modularity(A, labels, resolution)
+        stalled = 0 if q > best_q + tol else stalled + 1
+        if q > best_q:
+            best_labels, best_q = labels.copy(), q
+        if stalled >= patience:
+            break
+
+    return best_labels
+
+
+def _louvain_run(seed, adjacency, options):
+    """
+    Một lần chạy Louvain đầy đủ (nhiều level) với một seed
+
+    Returns:
+        (labels của mỗi node gốc, modularity trên adjacency gốc)
+    """
+    rng = np.random.default_rng(seed)
+    A = adjacency
+    two_m = A.data.sum()
+    node_labels = np.arange(A.shape[0])
+    if two_m == 0:
+        return node_labels, 0.0
+
+    for _ in range(options['max_levels']):
+        degree = np.asarray(A.sum(axis=1)).ravel()
+        labels = _local_move(A, degree, two_m, rng, options['resolution'], options['max_iter'],
+                             options['move_probability'], options['tol'], options['patience'])
+        _, labels = np.unique(labels, return_inverse=True)
+        num_communities = labels.max() + 1
+        if num_communities == A.shape[0]:
+            break
+
+        node_labels = labels[node_labels]
+        # Gộp mỗi community thành một node: A' = Pᵀ·A·P (đường chéo = weight bên trong)
+        P = sp.csr_matrix((np.ones(A.shape[0]), (np.arange(A.shape[0]), labels)),
+                          shape=(A.shape[0], num_communities))
+        A = (P.T @ A @ P).tocsr()
+
+    return node_labels, modularity(adjacency, node_labels, options['resolution'])
+
+
+def _louvain_worker(seed, options):
+    return _louvain_run(seed, _ADJACENCY, options)
+
+
+def louvain(adjacency, seed=None, resolution=1.0, n_restarts=1, n_jobs=None,
+            max_levels=20, max_iter=100, move_probability=0.5, tol=1e-6, patience=3):
+    """
+    Louvain community detection trên adjacency đối xứng (CSR)
+
+    Mỗi lần khởi tạo r dùng seed (seed, r) nên kết quả cố định theo seed và không phụ thuộc
+    n_jobs; các lần khởi tạo chạy song song, giữ phân hoạch có modularity cao nhất.
+
+    Args:
+        adjacency: CSR adjacency đối xứng (num_nodes × num_nodes), data = weight
+        seed: seed cho thứ tự chuyển node
+        resolution: > 1 cho nhiều community nhỏ hơn, < 1 cho ít community lớn hơn
+        n_restarts: số lần chạy với seed khác nhau
+        n_jobs: số process (None = số CPU, 1 = chạy tuần tự)
+        max_levels, max_iter: số level gộp tối đa / số vòng local-move tối đa mỗi level
+        move_probability: tỉ lệ node có gain dương được chuyển trong mỗi vòng
+        tol, patience: local-move dừng khi modularity tăng không quá tol sau patience vòng
+
+    Returns:
+        (labels, modularity): community id của mỗi node (đánh số 0, 1, ... theo node đầu tiên
+        xuất hiện) và modularity của phân hoạch
+    """
+    adjacency = sp.csr_matrix(adjacency, dtype=np.float64)
+    seeds = [np.random.SeedSequence([seed if seed is not None else 0, r]) for r in range(n_restarts)]
+    options = dict(resolution=resolution, max_levels=max_levels, max_iter=max_iter,
+                   move_probability=move_probability, tol=tol, patience=patience)
+
+    n_jobs = min(n_jobs or os.cpu_count() or 1, n_restarts)
+    if n_jobs == 1:
+        runs = [_louvain_run(s, adjacency, options) for s in seeds]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                                 initargs=(adjacency,)) as executor:
+            runs = list(executor.map(_louvain_worker, seeds, [options] * len(seeds)))
+
+    # Modularity cao nhất; hoà thì lấy lần chạy đầu tiên
+    best_labels, best_q = max(runs, key=lambda run: run[1])
+
+    # Đánh số lại theo thứ tự node đầu tiên của mỗi community
+    _, first_index, inverse = np.unique(best_labels, return_index=True, return_inverse=True)
+    rank = np.empty(len(first_index), dtype=np.int64)
+    rank[np.argsort(first_index)] = np.arange(len(first_index))
+    return rank[inverse], best_q
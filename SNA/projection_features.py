@@ -0,0 +1,264 @@
+"""
+PROJECTION FEATURES
+Features từ customer–customer projection B·Bᵀ của bipartite network (có weight theo
+total_sales), tính theo chunk customers và chia chunk qua process pool
+"""
+import os
+import sys
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from concurrent.futures import ProcessPoolExecutor
+from tqdm import tqdm
+import warnings
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import data_io
+from build_network import GRAPH_FORMAT, load_graph
+warnings.filterwarnings('ignore')
+
+# Edge attribute làm weight (chuẩn hoá theo tổng của mỗi customer → tỉ trọng chi tiêu),
+# None = chỉ đếm số sản phẩm chung
+PROJECTION_WEIGHT = 'total_sales'
+
+# Số hàng xóm giữ lại cho mỗi customer (theo similarity giảm dần) → bộ nhớ O(customers × k)
+PROJECTION_TOP_K = 50
+
+# Số customers mỗi chunk: bộ nhớ tạm ~ CHUNK_SIZE × số hàng xóm trung bình (gần bằng số
+# customers khi ít products, vd. ~20k customers × 118 products)
+CHUNK_SIZE = 512
+
+N_JOBS = None  # None = dùng toàn bộ CPU cores
+
+PROJECTION_PATH = 'data/customer_projection_topk.npz'
+FEATURES_PATH = 'data/projection_features.csv'
+
+FEATURE_COLUMNS = [
+    'proj_degree', 'proj_weighted_degree', 'proj_strength',
+    'proj_max_jaccard', 'proj_mean_jaccard',
+    'proj_max_neighbor_fraud_share', 'proj_neighbor_fraud_share'
+]
+
+
+# Dữ liệu dùng chung được gửi sang mỗi worker một lần (qua initializer), giống centrality.py
+_SHARED = None
+
+
+def _init_worker(shared):
+    global _SHARED
+    _SHARED = shared
+
+
+def _segment_reduce(ufunc, values, starts, num_rows, empty_value=0.0):
+    """ufunc.reduceat theo từng hàng (values đã sort theo hàng), hàng rỗng = empty_value"""
+    result = np.full(num_rows, empty_value)
+    counts = np.diff(np.append(starts, len(values)))
+    nonempty = counts > 0
+    if len(values):
+        result[nonempty] = ufunc.reduceat(values, starts[nonempty])
+    return result
+
+
+def _aligned_values(target, source):
+    """Giá trị của source tại đúng các vị trí (hàng, cột) của target (0 nếu source không có)"""
+    n_cols = target.shape[1]
+    target_keys = np.repeat(np.arange(target.shape[0]), np.diff(target.indptr)) * n_cols + target.indices
+    source_keys = np.repeat(np.arange(source.shape[0]), np.diff(source.indptr)) * n_cols + source.indices
+    values = np.zeros(len(target_keys))
+    if len(source_keys) == 0:
+        return values
+
+    # Hai CSR đã sort indices nên key (hàng · n_cols + cột) tăng dần
+    position = np.minimum(np.searchsorted(source_keys, target_keys), len(source_keys) - 1)
+    match = source_keys[position] == target_keys
+    values[match] = source.data[position[match]]
+    return values
+
+
+def _projection_chunk(bounds):
+    """
+    Projection cho customers [start, end): features của mỗi hàng và top-k hàng xóm
+
+    Returns:
+        (dict feature → mảng theo hàng, (rows, cols, weights) của các cặp top-k)
+    """
+    start, end = bounds
+    B, B_weighted = _SHARED['B'], _SHARED['B_weighted']
+    customer_degree, fraud_share, top_k = _SHARED['degree'], _SHARED['fraud_share'], _SHARED['top_k']
+    num_rows = end - start
+
+    # c_ij = số sản phẩm chung, w_ij = Σ_p tỉ trọng_ip · tỉ trọng_jp
+    common = (B[start:end] @ B.T).tocsr()
+    similarity = (B_weighted[start:end] @ B_weighted.T).tocsr()
+    if (np.array_equal(common.indptr, similarity.indptr)
+            and np.array_equal(common.indices, similarity.indices)):
+        weights = similarity.data.astype(np.float64)
+    else:
+        # Khác cấu trúc khi có w_ij = 0 (vd. sales = 0) → căn theo (hàng, cột)
+        common.sort_indices()
+        similarity.sort_indices()
+        weights = _aligned_values(common, similarity)
+
+    rows = np.repeat(np.arange(num_rows), np.diff(common.indptr))
+    cols = common.indices.astype(np.int64)
+    counts = common.data.astype(np.float64)
+
+    # Bỏ chính customer (đường chéo của B·Bᵀ)
+    others = cols != rows + start
+    rows, cols, counts, weights = rows[others], cols[others], counts[others], weights[others]
+    starts = np.searchsorted(rows, np.arange(num_rows))
+
+    features = {
+        'proj_degree': np.bincount(rows, minlength=num_rows).astype(np.int64),
+        'proj_weighted_degree': np.bincount(rows, weights=counts, minlength=num_rows),
+        'proj_strength': np.bincount(rows, weights=weights, minlength=num_rows)
+    }
+
+    # Hàng có hơn top_k hàng xóm: chỉ giữ các cặp có w ≥ w lớn thứ k (giữ cả các cặp hoà)
+    # trước khi sort, để không phải sort toàn bộ projection khi nó gần như đầy đủ
+    row_counts = np.bincount(rows, minlength=num_rows)
+    candidate = np.ones(len(rows), dtype=bool)
+    for row in np.flatnonzero(row_counts > top_k):
+        segment = slice(starts[row], starts[row] + row_counts[row])
+        kth = row_counts[row] - top_k
+        candidate[segment] = weights[segment] >= np.partition(weights[segment], kth)[kth]
+    rows, cols, counts, weights = rows[candidate], cols[candidate], counts[candidate], weights[candidate]
+    starts = np.searchsorted(rows, np.arange(num_rows))
+
+    # Top-k hàng xóm mỗi customer: w giảm dần, rồi c giảm dần, rồi index nhỏ hơn
+    order = np.lexsort((cols, -counts, -weights, rows))
+    rows, cols, counts, weights = rows[order], cols[order], counts[order], weights[order]
+    rank = np.arange(len(rows)) - starts[rows]
+    keep = rank < top_k
+    rows, cols, counts, weights = rows[keep], cols[keep], counts[keep], weights[keep]
+    starts = np.searchsorted(rows, np.arange(num_rows))
+    num_kept = np.bincount(rows, minlength=num_rows)
+
+    # Jaccard trên tập sản phẩm: c_ij / (d_i + d_j - c_ij)
+    jaccard = counts / (customer_degree[rows + start] + customer_degree[cols] - counts)
+    neighbor_fraud = fraud_share[cols]
+
+    features['proj_max_jaccard'] = _segment_reduce(np.maximum, jaccard, starts, num_rows)
+    features['proj_mean_jaccard'] = np.bincount(rows, weights=jaccard, minlength=num_rows) / np.maximum(num_kept, 1)
+    features['proj_max_neighbor_fraud_share'] = _segment_reduce(np.maximum, neighbor_fraud, starts, num_rows)
+
+    # Tỉ lệ fraud của hàng xóm, trung bình có trọng số w (fallback c khi mọi w = 0)
+    weight_sum = np.bincount(rows, weights=weights, minlength=num_rows)
+    count_sum = np.bincount(rows, weights=counts, minlength=num_rows)
+    by_weight = np.bincount(rows, weights=weights * neighbor_fraud, minlength=num_rows)
+    by_count = np.bincount(rows, weights=counts * neighbor_fraud, minlength=num_rows)
+    features['proj_neighbor_fraud_share'] = np.where(
+        weight_sum > 0, by_weight / np.where(weight_sum > 0, weight_sum, 1.0),
+        by_count / np.maximum(count_sum, 1.0)
+    )
+
+    return features, (rows + start, cols, weights)
+
+
+def _run_chunks(shared, chunks, n_jobs):
+    """Chạy _projection_chunk trên từng chunk, tuần tự (n_jobs=1) hoặc qua process pool"""
+    n_jobs = n_jobs or os.cpu_count() or 1
+    if n_jobs == 1 or len(chunks) <= 1:
+        _init_worker(shared)
+        return [_projection_chunk(chunk) for chunk in tqdm(chunks, desc="  Chunks")]
+
+    with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                             initargs=(shared,)) as executor:
+        return list(tqdm(executor.map(_projection_chunk, chunks), total=len(chunks), desc="  Chunks"))
+
+
+def projection_features(SG, weight=PROJECTION_WEIGHT, top_k=PROJECTION_TOP_K,
+                        chunk_size=CHUNK_SIZE, n_jobs=N_JOBS):
+    """
+    Features từ customer–customer projection của SparseBipartiteGraph
+
+    proj_degree / proj_weighted_degree / proj_strength tính trên mọi hàng xóm (số customers
+    mua chung ≥ 1 sản phẩm, tổng số sản phẩm chung, tổng similarity w). Các features Jaccard và
+    fraud share của hàng xóm tính trên top_k hàng xóm có similarity cao nhất. Fraud share của
+    một hàng xóm = fraud_count / số transactions của hàng xóm đó (không dùng label của chính
+    customer).
+
+    Kết quả không phụ thuộc n_jobs hay chunk_size.
+
+    Returns:
+        (DataFrame features theo thứ tự customer, CSR top-k projection num_customers × num_customers)
+    """
+    B = SG.biadjacency.copy()
+    B.data = np.ones_like(B.data, dtype=np.float64)
+
+    if weight is None:
+        B_weighted = B
+    else:
+        B_weighted = SG.weighted_biadjacency(weight)
+        row_total = np.asarray(B_weighted.sum(axis=1)).ravel()
+        scale = np.divide(1.0, row_total, out=np.zeros_like(row_total), where=row_total > 0)
+        B_weighted = sp.diags(scale) @ B_weighted
+    B_weighted = sp.csr_matrix(B_weighted, dtype=np.float64)
+
+    fraud = np.asarray(SG.customer_attrs['fraud_count'], dtype=np.float64)
+    total = fraud + np.asarray(SG.customer_attrs['normal_count'], dtype=np.float64)
+    shared = {
+        'B': B,
+        'B_weighted': B_weighted,
+        'degree': SG.customer_degree().astype(np.float64),
+        'fraud_share': np.divide(fraud, total, out=np.zeros_like(fraud), where=total > 0),
+        'top_k': top_k
+    }
+
+    n = SG.num_customers
+    chunks = [(start, min(start + chunk_size, n)) for start in range(0, n, chunk_size)]
+    results = _run_chunks(shared, chunks, n_jobs)
+
+    df = pd.DataFrame({
+        column: np.concatenate([features[column] for features, _ in results])
+        for column in FEATURE_COLUMNS
+    })
+    df.insert(0, 'customer_id', SG.customer_ids)
+
+    rows, cols, weights = (np.concatenate(parts) for parts in zip(*(pairs for _, pairs in results)))
+    projection = sp.csr_matrix((weights, (rows, cols)), shape=(n, n))
+    return df, projection
+
+
+def calculate_projection_features(weight=PROJECTION_WEIGHT, top_k=PROJECTION_TOP_K,
+                                  chunk_size=CHUNK_SIZE, n_jobs=N_JOBS, graph_format=GRAPH_FORMAT):
+    """Tính và lưu projection features cho mỗi customer"""
+
+    print("="*80)
+    print("TÍNH PROJECTION FEATURES (CUSTOMER–CUSTOMER)")
+    print("="*80)
+
+    print("\n[1] Load bipartite network...")
+    SG = load_graph('sparse', graph_format)
+    print(f"✓ {SG.num_customers:,} customers × {SG.num_products:,} products, {SG.num_edges:,} edges")
+
+    print(f"\n[2] Projection B·Bᵀ (weight={weight}, top-k={top_k}, chunk={chunk_size:,})...")
+    df_features, projection = projection_features(SG, weight=weight, top_k=top_k,
+                                                  chunk_size=chunk_size, n_jobs=n_jobs)
+    print(f"  ✓ Top-k projection: {projection.nnz:,} cặp customers")
+
+    print("\n[3] Thống kê projection features:")
+    print(df_features[FEATURE_COLUMNS].describe())
+
+    print("\n[4] So sánh Fraud vs Normal customers:")
+    is_fraud = np.asarray(SG.customer_attrs['is_fraud']) == 1
+    for label, mask in [('Fraud', is_fraud), ('Normal', ~is_fraud)]:
+        print(f"\n  {label} customers ({mask.sum():,}):")
+        for column in FEATURE_COLUMNS:
+            print(f"    - Avg {column}: {df_features.loc[mask, column].mean():.6f}")
+
+    print("\n[5] Lưu kết quả...")
+    df_features['is_fraud'] = np.asarray(SG.customer_attrs['is_fraud'])
+    features_path = data_io.write_table(df_features, FEATURES_PATH)
+    print(f"  ✓ Đã lưu: {features_path}")
+    sp.save_npz(PROJECTION_PATH, projection)
+    print(f"  ✓ Đã lưu: {PROJECTION_PATH}")
+
+    print("\n" + "="*80)
+    print("HOÀN TẤT PROJECTION FEATURES!")
+    print("="*80)
+
+    return df_features, projection
+
+
+if __name__ == "__main__":
+    df_features, projection = calculate_projection_features()
@@ -0,0 +1,464 @@
+"""
+SPARSE BIPARTITE GRAPH
+Lưu customer–product network dưới dạng SciPy CSR biadjacency matrix
+(thay cho dict-of-dicts của NetworkX)
+"""
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+import networkx as nx
+import scipy.sparse as sp
+from scipy.sparse import csgraph
+
+
+EDGE_ATTRS = ['total_sales', 'total_quantity']
+NODE_ATTRS = ['fraud_count', 'normal_count', 'is_fraud']
+
+# Cột của edge list mà add_edges cần (lưu cho mỗi batch bởi append_batch)
+BATCH_COLUMNS = ['customer_id', 'product_id', 'sales', 'quantity', 'is_fraud']
+
+
+class SparseBipartiteGraph:
+    """
+    Bipartite graph customer–product dạng CSR
+
+    - biadjacency: CSR (num_customers × num_products), data = weight của edge
+    - customer_ids / product_ids: id gốc theo thứ tự hàng / cột
+    - edge_attrs: mỗi cột (total_sales, total_quantity) cùng thứ tự với biadjacency.data
+    - customer_attrs / product_attrs: mỗi cột (fraud_count, normal_count, is_fraud) theo index node
+    - applied_batches: hash các batch delta đã áp dụng bằng add_edges (tránh áp dụng lại)
+
+    Thư mục đã lưu có thể kèm các batch ghi bởi append_batch (chưa gộp vào CSR);
+    load() áp dụng chúng, save() ghi lại graph đầy đủ không còn batch nào.
+
+    Trong adjacency đầy đủ, customers chiếm index [0, num_customers),
+    products chiếm index [num_customers, num_nodes).
+    """
+
+    def __init__(self, biadjacency, customer_ids, product_ids,
+                 edge_attrs=None, customer_attrs=None, product_attrs=None, applied_batches=None):
+        self.biadjacency = sp.csr_matrix(biadjacency)
+        self.customer_ids = np.asarray(customer_ids)
+        self.product_ids = np.asarray(product_ids)
+        self.edge_attrs = edge_attrs or {}
+        self.customer_attrs = customer_attrs or {}
+        self.product_attrs = product_attrs or {}
+        self.applied_batches = list(applied_batches or [])
+
+    @classmethod
+    def from_edgelist(cls, df):
+        """Xây dựng từ edge list (customer_id, product_id, sales, quantity, is_fraud)"""
+        customer_ids, customer_idx = np.unique(df['customer_id'].to_numpy(), return_inverse=True)
+        product_ids, product_idx = np.unique(df['product_id'].to_numpy(), return_inverse=True)
+        num_customers, num_products = len(customer_ids), len(product_ids)
+
+        # Aggregate các transaction trùng cặp customer-product thành 1 edge.
+        # Sort theo (row, col) để thứ tự edge trùng với thứ tự CSR
+        grouped = pd.DataFrame({
+            'row': customer_idx,
+            'col': product_idx,
+            'sales': df['sales'].to_numpy(),
+            'quantity': df['quantity'].to_numpy()
+        }).groupby(['row', 'col'], sort=True).agg({'sales': 'sum', 'quantity': 'sum'}).reset_index()
+
+        rows = grouped['row'].to_numpy()
+        indptr = np.zeros(num_customers + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=num_customers), out=indptr[1:])
+        indices = grouped['col'].to_numpy().astype(np.int32)
+        data = np.ones(len(grouped), dtype=np.float32)  # weight = 1 như build_network
+
+        biadjacency = sp.csr_matrix((data, indices, indptr), shape=(num_customers, num_products))
+        edge_attrs = {
+            'total_sales': grouped['sales'].to_numpy(dtype=np.float64),
+            'total_quantity': grouped['quantity'].to_numpy(dtype=np.int64)
+        }
+
+        is_fraud = df['is_fraud'].to_numpy()
+        customer_attrs = cls._fraud_counts(customer_idx, is_fraud, num_customers)
+        product_attrs = cls._fraud_counts(product_idx, is_fraud, num_products)
+
+        return cls(biadjacency, customer_ids, product_ids,
+                   edge_attrs, customer_attrs, product_attrs)
+
+    @classmethod
+    def from_networkx(cls, G):
+        """Chuyển từ NetworkX graph (node 'C_<id>' / 'P_<id>') sang CSR"""
+        customer_nodes = [n for n in G.nodes() if n.startswith('C_')]
+        product_nodes = [n for n in G.nodes() if n.startswith('P_')]
+        customer_index = {n: i for i, n in enumerate(customer_nodes)}
+        product_index = {n: i for i, n in enumerate(product_nodes)}
+
+        rows, cols, sales, quantity, weight = [], [], [], [], []
+        for u, v, attrs in G.edges(data=True):
+            if u.startswith('P_'):
+                u, v = v, u
+            rows.append(customer_index[u])
+            cols.append(product_index[v])
+            sales.append(attrs.get('total_sales', 0.0))
+            quantity.append(attrs.get('total_quantity', 0))
+            weight.append(attrs.get('weight', 1))
+
+        # COO → CSR: sort edges theo (row, col) để thuộc tính khớp thứ tự CSR
+        order = np.lexsort((cols, rows))
+        rows, cols = np.asarray(rows)[order], np.asarray(cols)[order]
+        indptr = np.zeros(len(customer_nodes) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(customer_nodes)), out=indptr[1:])
+        biadjacency = sp.csr_matrix(
+            (np.asarray(weight, dtype=np.float32)[order], cols.astype(np.int32), indptr),
+            shape=(len(customer_nodes), len(product_nodes))
+        )
+        edge_attrs = {
+            'total_sales': np.asarray(sales, dtype=np.float64)[order],
+            'total_quantity': np.asarray(quantity, dtype=np.int64)[order]
+        }
+
+        def node_attrs(nodes):
+            return {
+                attr: np.array([G.nodes[n].get(attr, 0) for n in nodes], dtype=np.int64)
+                for attr in NODE_ATTRS
+            }
+
+        return cls(biadjacency,
+                   [cls._parse_id(n) for n in customer_nodes],
+                   [cls._parse_id(n) for n in product_nodes],
+                   edge_attrs, node_attrs(customer_nodes), node_attrs(product_nodes),
+                   G.graph.get('applied_batches'))
+
+    @staticmethod
+    def _parse_id(node):
+        node_id = node[2:]
+        return int(node_id) if node_id.lstrip('-').isdigit() else node_id
+
+    @staticmethod
+    def _fraud_counts(node_idx, is_fraud, num_nodes):
+        total = np.bincount(node_idx, minlength=num_nodes).astype(np.int64)
+        fraud = np.bincount(node_idx, weights=is_fraud, minlength=num_nodes).astype(np.int64)
+        return {
+            'fraud_count': fraud,
+            'normal_count': total - fraud,
+            'is_fraud': (fraud > 0).astype(np.int64)
+        }
+
+    # ------------------------------------------------------------------
+    # Lưu / load dạng nhị phân (thư mục .npy, memory-mapped)
+    # ------------------------------------------------------------------
+    def _arrays(self):
+        """Mọi mảng của graph theo tên file (không có Python object nào)"""
+        arrays = {
+            'indptr': self.biadjacency.indptr,
+            'indices': self.biadjacency.indices,
+            'data': self.biadjacency.data,
+            'customer_ids': self._id_array(self.customer_ids),
+            'product_ids': self._id_array(self.product_ids)
+        }
+        for prefix, attrs in [('edge', self.edge_attrs), ('customer', self.customer_attrs),
+                              ('product', self.product_attrs)]:
+            for attr, values in attrs.items():
+                arrays[f'{prefix}_{attr}'] = np.asarray(values)
+        return arrays
+
+    @staticmethod
+    def _id_array(ids):
+        """Id dạng object (string) → unicode cố định độ dài để mmap được"""
+        ids = np.asarray(ids)
+        return ids.astype(str) if ids.dtype == object else ids
+
+    def save(self, path):
+        """
+        Lưu graph vào thư mục path: mỗi mảng một file .npy + meta.json
+
+        Ghi vào thư mục tạm rồi đổi tên, nên process khác đang mmap bản cũ không bị ảnh hưởng.
+        """
+        tmp_path = f'{path}.tmp{os.getpid()}'
+        os.makedirs(tmp_path, exist_ok=True)
+
+        arrays = self._arrays()
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_path, f'{name}.npy'), array)
+
+        meta = {
+            'shape': list(self.biadjacency.shape),
+            'edge_attrs': list(self.edge_attrs),
+            'customer_attrs': list(self.customer_attrs),
+            'product_attrs': list(self.product_attrs),
+            'applied_batches': self.applied_batches
+        }
+        # meta.json ghi sau cùng: load() coi sự tồn tại của nó là graph đầy đủ
+        with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+        old_path = f'{path}.old{os.getpid()}'
+        if os.path.exists(path):
+            os.rename(path, old_path)
+        os.rename(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """
+        Mở graph đã lưu bằng save()
+
+        Với mmap_mode='r' các mảng được memory-map: chỉ đọc header, dữ liệu được
+        nạp theo trang khi truy cập, không tạo dict/string Python cho node hay edge.
+        Các batch đang chờ (append_batch) được áp dụng bằng add_edges trong bộ nhớ.
+        """
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+
+        def array(name):
+            return np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode)
+
+        biadjacency = sp.csr_matrix((array('data'), array('indices'), array('indptr')),
+                                    shape=tuple(meta['shape']), copy=False)
+        graph = cls(biadjacency, array('customer_ids'), array('product_ids'),
+                    {attr: array(f'edge_{attr}') for attr in meta['edge_attrs']},
+                    {attr: array(f'customer_{attr}') for attr in meta['customer_attrs']},
+                    {attr: array(f'product_{attr}') for attr in meta['product_attrs']},
+                    meta.get('applied_batches'))
+
+        # applied_batches đã gồm các batch đang chờ, nên add_edges không ghi thêm hash
+        for batch_id in meta.get('pending_batches', []):
+            batch_dir = os.path.join(path, 'batches', batch_id)
+            batch = pd.DataFrame({col: np.load(os.path.join(batch_dir, f'{col}.npy'))
+                                  for col in BATCH_COLUMNS})
+            graph, _ = graph.add_edges(batch)
+        return graph
+
+    @classmethod
+    def append_batch(cls, path, delta, batch_id):
+        """
+        Lưu một batch delta vào thư mục graph đã lưu mà không ghi lại các mảng CSR
+
+        Các cột BATCH_COLUMNS của batch được ghi vào path/batches/<batch_id>/, sau đó meta.json
+        (ghi file tạm rồi os.replace) thêm batch vào pending_batches và applied_batches.
+        Nếu dừng trước khi meta.json được thay, graph đã lưu vẫn như cũ.
+        """
+        batch_dir = os.path.join(path, 'batches', batch_id)
+        os.makedirs(batch_dir, exist_ok=True)
+        for col in BATCH_COLUMNS:
+            np.save(os.path.join(batch_dir, f'{col}.npy'), cls._id_array(delta[col].to_numpy()))
+
+        meta_path = os.path.join(path, 'meta.json')
+        with open(meta_path) as f:
+            meta = json.load(f)
+        meta['pending_batches'] = meta.get('pending_batches', []) + [batch_id]
+        meta['pending_rows'] = meta.get('pending_rows', 0) + len(delta)
+        meta['applied_batches'] = meta.get('applied_batches', []) + [batch_id]
+
+        tmp_path = f'{meta_path}.tmp{os.getpid()}'
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+
+    @staticmethod
+    def pending_rows(path):
+        """Số transactions trong các batch chưa gộp vào CSR của graph đã lưu ở path"""
+        with open(os.path.join(path, 'meta.json')) as f:
+            return json.load(f).get('pending_rows', 0)
+
+    # ------------------------------------------------------------------
+    # Kích thước
+    # ------------------------------------------------------------------
+    @property
+    def num_customers(self):
+        return self.biadjacency.shape[0]
+
+    @property
+    def num_products(self):
+        return self.biadjacency.shape[1]
+
+    @property
+    def num_nodes(self):
+        return self.num_customers + self.num_products
+
+    @property
+    def num_edges(self):
+        return self.biadjacency.nnz
+
+    def customer_nodes(self):
+        """Tên node dạng 'C_<id>' (giống NetworkX backend) theo thứ tự hàng"""
+        return [f'C_{cust}' for cust in self.customer_ids]
+
+    def product_nodes(self):
+        """Tên node dạng 'P_<id>' theo thứ tự cột"""
+        return [f'P_{prod}' for prod in self.product_ids]
+
+    # ------------------------------------------------------------------
+    # Các phép toán vectorized trên sparse matrix
+    # ------------------------------------------------------------------
+    def adjacency(self):
+        """Adjacency đối xứng đầy đủ (num_nodes × num_nodes), chỉ giữ cấu trúc (data = 1)"""
+        pattern = self.biadjacency.copy()
+        pattern.data = np.ones_like(pattern.data, dtype=np.float64)
+        return sp.bmat([[None, pattern], [pattern.T, None]], format='csr')
+
+    def customer_degree(self):
+        return np.diff(self.biadjacency.indptr)
+
+    def product_degree(self):
+        return np.bincount(self.biadjacency.indices, minlength=self.num_products)
+
+    def degree(self):
+        """Degree của mọi node (customers trước, products sau)"""
+        return np.concatenate([self.customer_degree(), self.product_degree()])
+
+    def degree_centrality(self):
+        """Giống nx.degree_centrality: degree / (n - 1)"""
+        if self.num_nodes <= 1:
+            return np.ones(self.num_nodes)
+        return self.degree() / (self.num_nodes - 1)
+
+    def density(self):
+        n = self.num_nodes
+        return 0.0 if n <= 1 else 2 * self.num_edges / (n * (n - 1))
+
+    def connected_components(self):
+        """Trả về (số components, label cho mỗi node)"""
+        return csgraph.connected_components(self.adjacency(), directed=False)
+
+    def weighted_biadjacency(self, weight=None):
+        """Biadjacency với data = cột edge attribute (None → weight gốc)"""
+        matrix = self.biadjacency.copy()
+        if weight is not None:
+            matrix.data = np.asarray(self.edge_attrs[weight], dtype=np.float64)
+        return matrix
+
+    def customer_projection(self, weight=None):
+        """Customer–customer projection B·Bᵀ (đường chéo = tổng weight của chính customer)"""
+        B = self.weighted_biadjacency(weight)
+        return (B @ B.T).tocsr()
+
+    def product_projection(self, weight=None):
+        """Product–product projection Bᵀ·B"""
+        B = self.weighted_biadjacency(weight)
+        return (B.T @ B).tocsr()
+
+    def to_networkx(self):
+        """Chuyển sang NetworkX graph cùng schema với build_network.py"""
+        G = nx.Graph(applied_batches=list(getattr(self, 'applied_batches', [])))
+        for nodes, bipartite, attrs in [
+            (self.customer_nodes(), 0, self.customer_attrs),
+            (self.product_nodes(), 1, self.product_attrs)
+        ]:
+            columns = {attr: values.tolist() for attr, values in attrs.items()}
+            G.add_nodes_from(
+                (node, dict({'bipartite': bipartite},
+                            **{attr: values[i] for attr, values in columns.items()}))
+                for i, node in enumerate(nodes)
+            )
+
+        coo = self.biadjacency.tocoo()
+        customer_nodes = self.customer_nodes()
+        product_nodes = self.product_nodes()
+        sales = self.edge_attrs.get('total_sales', np.zeros(self.num_edges)).tolist()
+        quantity = self.edge_attrs.get('total_quantity', np.zeros(self.num_edges, dtype=np.int64)).tolist()
+        G.add_edges_from(
+            (customer_nodes[row], product_nodes[col], {
+                'weight': int(w),
+                'total_sales': sales[i],
+                'total_quantity': quantity[i]
+            })
+            for i, (row, col, w) in enumerate(zip(coo.row.tolist(), coo.col.tolist(), coo.data.tolist()))
+        )
+        return G
+
+    # ------------------------------------------------------------------
+    # Cập nhật incremental
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _extend_ids(ids, new_ids):
+        """ids + các id trong new_ids chưa có (sort tăng dần), index của id cũ giữ nguyên"""
+        new_ids = np.unique(np.asarray(new_ids))
+        return np.concatenate([ids, new_ids[pd.Index(ids).get_indexer(new_ids) < 0]])
+
+    def add_edges(self, delta, batch_id=None):
+        """
+        Áp dụng một batch edge mới (cùng schema với edgelist.csv)
+
+        Customers/products mới được thêm vào cuối nên index của node cũ không đổi.
+        Edge đã tồn tại được cộng dồn total_sales/total_quantity. Chỉ delta được aggregate và
+        tìm vị trí trong các hàng CSR của customers bị ảnh hưởng; edges mới được chèn đúng vị trí
+        đã sort bằng một lần np.insert, không group lại toàn bộ edges cũ.
+
+        Args:
+            delta: DataFrame transactions mới
+            batch_id: hash của batch, được ghi vào applied_batches của graph mới
+
+        Returns:
+            (graph mới, index các customers bị ảnh hưởng)
+        """
+        customer_ids = self._extend_ids(self.customer_ids, delta['customer_id'])
+        product_ids = self._extend_ids(self.product_ids, delta['product_id'])
+        customer_idx = pd.Index(customer_ids).get_indexer(delta['customer_id'])
+        product_idx = pd.Index(product_ids).get_indexer(delta['product_id'])
+        num_customers, num_products = len(customer_ids), len(product_ids)
+
+        # Aggregate chỉ các transaction của delta theo (row, col), đã sort theo key
+        grouped = pd.DataFrame({
+            'row': customer_idx, 'col': product_idx,
+            'sales': delta['sales'].to_numpy(dtype=np.float64),
+            'quantity': delta['quantity'].to_numpy(dtype=np.int64)
+        }).groupby(['row', 'col'], sort=True).agg({'sales': 'sum', 'quantity': 'sum'}).reset_index()
+        rows, cols = grouped['row'].to_numpy(), grouped['col'].to_numpy()
+        delta_keys = rows * num_products + cols
+
+        # Key (row · num_products + col) của các edge cũ thuộc customers cũ bị ảnh hưởng,
+        # tăng dần vì indices trong mỗi hàng CSR đã sort
+        indptr, indices = self.biadjacency.indptr, self.biadjacency.indices
+        touched = np.unique(rows[rows < self.num_customers])
+        lengths = indptr[touched + 1] - indptr[touched]
+        segment_start = np.repeat(np.cumsum(lengths) - lengths, lengths)
+        positions = np.repeat(indptr[touched], lengths) + np.arange(lengths.sum()) - segment_start
+        existing_keys = np.repeat(touched, lengths) * num_products + indices[positions]
+
+        # Edge đã có: vị trí của nó; edge mới: vị trí chèn trong hàng (cuối mảng nếu customer mới)
+        loc = np.searchsorted(existing_keys, delta_keys)
+        found = loc < len(existing_keys)
+        found[found] = existing_keys[loc[found]] == delta_keys[found]
+        old_row = rows < self.num_customers
+        insert_at = np.full(len(rows), self.num_edges, dtype=np.int64)
+        row_first = np.searchsorted(existing_keys, rows[old_row] * num_products)
+        insert_at[old_row] = indptr[rows[old_row]] + loc[old_row] - row_first
+
+        sales = np.array(self.edge_attrs['total_sales'], dtype=np.float64)
+        quantity = np.array(self.edge_attrs['total_quantity'], dtype=np.int64)
+        sales[positions[loc[found]]] += grouped['sales'].to_numpy()[found]
+        quantity[positions[loc[found]]] += grouped['quantity'].to_numpy()[found]
+
+        # np.insert giữ thứ tự các giá trị chèn cùng vị trí (đã sort theo col)
+        new = ~found
+        insert_at = insert_at[new]
+        indptr_new = np.full(num_customers + 1, indptr[-1], dtype=np.int64)
+        indptr_new[:len(indptr)] = indptr
+        indptr_new[1:] += np.cumsum(np.bincount(rows[new], minlength=num_customers))
+        biadjacency = sp.csr_matrix((
+            np.insert(self.biadjacency.data, insert_at, np.ones(new.sum(), dtype=np.float32)),
+            np.insert(indices, insert_at, cols[new].astype(indices.dtype)),
+            indptr_new
+        ), shape=(num_customers, num_products))
+        edge_attrs = {
+            'total_sales': np.insert(sales, insert_at, grouped['sales'].to_numpy()[new]),
+            'total_quantity': np.insert(quantity, insert_at, grouped['quantity'].to_numpy()[new])
+        }
+
+        is_fraud = delta['is_fraud'].to_numpy()
+
+        def updated_counts(old_attrs, node_idx, num_nodes):
+            added = self._fraud_counts(node_idx, is_fraud, num_nodes)
+            attrs = {}
+            for attr in ('fraud_count', 'normal_count'):
+                values = np.zeros(num_nodes, dtype=np.int64)
+                values[:len(old_attrs[attr])] = old_attrs[attr]
+                attrs[attr] = values + added[attr]
+            attrs['is_fraud'] = (attrs['fraud_count'] > 0).astype(np.int64)
+            return attrs
+
+        graph = SparseBipartiteGraph(
+            biadjacency, customer_ids, product_ids, edge_attrs,
+            updated_counts(self.customer_attrs, customer_idx, num_customers),
+            updated_counts(self.product_attrs, product_idx, num_products),
+            getattr(self, 'applied_batches', []) + ([batch_id] if batch_id is not None else [])
+        )
+        return graph, np.unique(customer_idx)
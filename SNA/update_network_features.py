@@ -0,0 +1,266 @@
+"""
+CẬP NHẬT INCREMENTAL NETWORK FEATURES
+Áp dụng batch transactions mới vào graph đã lưu, chỉ tính lại cho vùng bị ảnh hưởng
+"""
+import os
+import pickle
+import sys
+from collections import Counter
+import numpy as np
+import pandas as pd
+import networkx as nx
+import warnings
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import data_io, ingest
+from build_network import GRAPH_BACKEND, GRAPH_FORMAT, load_graph, save_graph_batch, fraud_count_attributes
+warnings.filterwarnings('ignore')
+
+DELTA_PATH = 'data/edgelist_delta.csv'
+
+
+def apply_delta_networkx(G, delta):
+    """Thêm edges/nodes mới vào NetworkX graph, trả về danh sách customer nodes bị ảnh hưởng"""
+    grouped = delta.groupby(['customer_id', 'product_id']).agg({
+        'sales': 'sum',
+        'quantity': 'sum'
+    }).reset_index()
+
+    for cust, prod, sales, quantity in zip(grouped['customer_id'], grouped['product_id'],
+                                           grouped['sales'], grouped['quantity']):
+        customer_node = f'C_{cust}'
+        product_node = f'P_{prod}'
+
+        if customer_node not in G:
+            G.add_node(customer_node, bipartite=0, fraud_count=0, normal_count=0, is_fraud=0)
+        if product_node not in G:
+            G.add_node(product_node, bipartite=1, fraud_count=0, normal_count=0, is_fraud=0)
+
+        if G.has_edge(customer_node, product_node):
+            edge = G[customer_node][product_node]
+            edge['total_sales'] += float(sales)
+            edge['total_quantity'] += int(quantity)
+        else:
+            G.add_edge(customer_node, product_node, weight=1,
+                       total_sales=float(sales), total_quantity=int(quantity))
+
+    # Cộng dồn fraud/normal count cho các node trong batch
+    for id_col, prefix in [('customer_id', 'C_'), ('product_id', 'P_')]:
+        for node, added in fraud_count_attributes(delta, id_col, prefix).items():
+            attrs = G.nodes[node]
+            attrs['fraud_count'] += added['fraud_count']
+            attrs['normal_count'] += added['normal_count']
+            attrs['is_fraud'] = int(attrs['fraud_count'] > 0)
+
+    return [f'C_{cust}' for cust in delta['customer_id'].unique()]
+
+
+def assign_communities(affected, customer_products, product_customers, community_dict):
+    """
+    Gán lại community cho các customers bị ảnh hưởng (một bước label propagation cục bộ)
+
+    Mỗi customer nhận community phổ biến nhất trong các customers cùng mua sản phẩm với nó
+    (đếm theo số sản phẩm chung). Hoà thì giữ community hiện tại, nếu không thì lấy id nhỏ nhất.
+    Customer không có hàng xóm nào đã có community thì được tạo community mới.
+    """
+    next_community = max(community_dict.values(), default=-1) + 1
+    product_hist = {}
+    updated = {}
+
+    for node in affected:
+        scores = Counter()
+        products = customer_products(node)
+        for prod in products:
+            if prod not in product_hist:
+                product_hist[prod] = Counter(
+                    community_dict[cust] for cust in product_customers(prod) if cust in community_dict
+                )
+            scores.update(product_hist[prod])
+
+        current = community_dict.get(node)
+        if current is not None:
+            # Bỏ chính customer ra khỏi histogram của các sản phẩm nó mua
+            scores[current] -= len(products)
+        scores = {comm: count for comm, count in scores.items() if count > 0}
+
+        if not scores:
+            label = current if current is not None else next_community
+            if current is None:
+                next_community += 1
+        else:
+            best = max(scores.values())
+            candidates = [comm for comm, count in scores.items() if count == best]
+            label = current if current in candidates else min(candidates)
+        updated[node] = label
+
+    community_dict.update(updated)
+    return updated
+
+
+def applied_batches(G):
+    """Hash các batch delta đã áp dụng vào graph (cả hai backend)"""
+    if isinstance(G, nx.Graph):
+        return G.graph.get('applied_batches', [])
+    return getattr(G, 'applied_batches', [])
+
+
+def read_features_table(path='data/network_features.csv'):
+    """
+    Đọc network_features (mỗi customer một row)
+
+    Bảng ghi bởi phiên bản append-log cũ (có cột num_nodes, nhiều row mỗi customer) được
+    gộp lại: giữ row cuối của mỗi customer và bỏ cột num_nodes.
+    """
+    df_features = data_io.read_table(path)
+    if 'num_nodes' in df_features.columns:
+        df_features = df_features.drop_duplicates('customer_id', keep='last').drop(columns='num_nodes')
+    return df_features.reset_index(drop=True)
+
+
+def features_dict_from_table(df_features):
+    """network_features_dict (cùng keys với calculate_network_features.py) từ bảng features"""
+    nodes = ('C_' + df_features['customer_id'].astype(str)).tolist()
+    betweenness_error = df_features['betweenness_error']
+    return {
+        'degree_centrality': dict(zip(nodes, df_features['degree_centrality'].tolist())),
+        'betweenness_centrality': dict(zip(nodes, df_features['betweenness_centrality'].tolist())),
+        'closeness_centrality': dict(zip(nodes, df_features['closeness_centrality'].tolist())),
+        'community_id': dict(zip(nodes, df_features['community_id'].tolist())),
+        'betweenness_error': (dict(zip(nodes, betweenness_error.tolist()))
+                              if betweenness_error.notna().any() else {})
+    }
+
+
+def update_network_features(delta_path=DELTA_PATH, backend=GRAPH_BACKEND, graph_format=GRAPH_FORMAT):
+    """
+    Cập nhật graph và network features với batch transactions mới
+
+    Chỉ các customers bị ảnh hưởng được tính lại; row của họ trong network_features được sửa
+    tại chỗ (customers mới thêm vào cuối), degree_centrality của mọi customer scale lại theo số
+    nodes mới. Graph chỉ ghi thêm batch (save_graph_batch). Batch đã áp dụng (cùng hash) bị bỏ qua.
+    """
+
+    if backend not in ('networkx', 'sparse'):
+        raise ValueError(f"backend phải là 'networkx' hoặc 'sparse', nhận được: {backend!r}")
+
+    print("="*80)
+    print("CẬP NHẬT INCREMENTAL NETWORK FEATURES")
+    print("="*80)
+
+    # Đọc batch mới
+    print("\n[1] Đọc batch transactions mới...")
+    delta = data_io.read_table(delta_path)
+    batch_id = ingest.file_hash(data_io.resolve_path(delta_path))
+    print(f"✓ Đã đọc {len(delta):,} transactions từ {delta_path} (batch {batch_id})")
+
+    # Load graph và bảng features (bảng có đủ mọi feature, không cần đọc lại pickle)
+    print("\n[2] Load graph và network features hiện tại...")
+    G = load_graph(backend, graph_format)
+    if batch_id in applied_batches(G):
+        print(f"⚠️ Batch {batch_id} đã được áp dụng vào graph, bỏ qua")
+        return None, None
+
+    df_features = read_features_table()
+    num_nodes_before = G.num_nodes if backend == 'sparse' else G.number_of_nodes()
+    print(f"✓ Graph: {num_nodes_before:,} nodes, {len(df_features):,} customers có features")
+
+    # Áp dụng delta
+    print("\n[3] Áp dụng edges mới...")
+    if backend == 'sparse':
+        G, affected_idx = G.add_edges(delta, batch_id)
+        num_nodes = G.num_nodes
+        customer_nodes = G.customer_nodes()
+        affected = [customer_nodes[i] for i in affected_idx]
+        affected_ids = G.customer_ids[affected_idx]
+
+        degree = G.customer_degree()[affected_idx]
+        is_fraud = G.customer_attrs['is_fraud'][affected_idx]
+
+        biadjacency_csc = G.biadjacency.tocsc()
+        customer_index = dict(zip(affected, affected_idx.tolist()))
+
+        def customer_products(node):
+            row = customer_index[node]
+            return G.biadjacency.indices[G.biadjacency.indptr[row]:G.biadjacency.indptr[row + 1]].tolist()
+
+        def product_customers(col):
+            rows = biadjacency_csc.indices[biadjacency_csc.indptr[col]:biadjacency_csc.indptr[col + 1]]
+            return [customer_nodes[row] for row in rows]
+    else:
+        affected = apply_delta_networkx(G, delta)
+        G.graph['applied_batches'] = applied_batches(G) + [batch_id]
+        num_nodes = G.number_of_nodes()
+        affected_ids = [node[2:] for node in affected]
+
+        degree = np.array([G.degree(node) for node in affected])
+        is_fraud = np.array([G.nodes[node]['is_fraud'] for node in affected])
+
+        customer_products = lambda node: list(G.neighbors(node))
+        product_customers = lambda prod: list(G.neighbors(prod))
+
+    # Vị trí row của từng customer bị ảnh hưởng (-1: customer mới)
+    keys = pd.Index(df_features['customer_id'].astype(str))
+    rows = keys.get_indexer([str(cust) for cust in affected_ids])
+    is_new = rows < 0
+    new_customers = [node for node, new in zip(affected, is_new) if new]
+    print(f"✓ Graph mới: {num_nodes:,} nodes (+{num_nodes - num_nodes_before:,})")
+    print(f"  - Customers bị ảnh hưởng: {len(affected):,} ({len(new_customers):,} customers mới)")
+
+    # Community: label propagation cục bộ quanh các customers bị ảnh hưởng
+    print("\n[4] Cập nhật community cho vùng bị ảnh hưởng...")
+    community_dict = dict(zip('C_' + keys, df_features['community_id'].tolist()))
+    updated = assign_communities(affected, customer_products, product_customers, community_dict)
+    print(f"  ✓ Đã gán community cho {len(updated):,} customers")
+
+    # Customers mới: thêm row ở cuối. Betweenness/closeness là measures toàn cục: giữ giá trị
+    # cũ, customers mới = 0 cho tới lần chạy đầy đủ calculate_network_features.py tiếp theo
+    print("\n[5] Cập nhật rows của customers bị ảnh hưởng...")
+    if new_customers:
+        new_rows = pd.DataFrame({
+            'customer_id': pd.Series(np.asarray(affected_ids)[is_new]).astype(df_features['customer_id'].dtype),
+            'betweenness_centrality': 0.0,
+            'closeness_centrality': 0.0,
+            'betweenness_error': np.nan
+        })
+        rows[is_new] = len(df_features) + np.arange(len(new_rows))
+        df_features = pd.concat([df_features, new_rows], ignore_index=True)
+        print(f"  ⚠️ {len(new_customers):,} customers mới có betweenness/closeness = 0 "
+              f"tới lần tính lại đầy đủ")
+
+    df_features.loc[rows, 'degree'] = degree
+    df_features.loc[rows, 'is_fraud'] = is_fraud
+    df_features.loc[rows, 'community_id'] = [updated[node] for node in affected]
+    df_features = df_features.astype({'degree': np.int64, 'is_fraud': np.int64, 'community_id': np.int64})
+
+    # degree_centrality = degree · 1/(n - 1): degree chỉ đổi ở customers bị ảnh hưởng, còn
+    # n đổi cho mọi customer nên cả cột được tính lại từ cột degree (vectorized)
+    df_features['degree_centrality'] = (df_features['degree'] * (1.0 / (num_nodes - 1))
+                                        if num_nodes > 1 else 1.0)
+    print(f"  ✓ Đã cập nhật {len(affected):,} rows, degree centrality theo {num_nodes:,} nodes")
+
+    print("\n[6] Lưu kết quả...")
+    features_path = data_io.write_table(df_features, 'data/network_features.csv')
+    print(f"  ✓ Đã cập nhật: {features_path}")
+
+    features_dict = features_dict_from_table(df_features)
+    with open('data/network_features_dict.pkl', 'wb') as f:
+        pickle.dump(features_dict, f)
+    print("  ✓ Đã cập nhật: data/network_features_dict.pkl")
+
+    # Graph (kèm hash của batch) ghi sau các features: nếu dừng giữa chừng, chạy lại sẽ áp dụng
+    # lại batch từ graph cũ và ghi đè đúng các rows trên
+    graph_path = save_graph_batch(G, delta, batch_id, backend, graph_format)
+    print(f"  ✓ Đã cập nhật: {graph_path}")
+
+    # Ghi batch vào edge list để lần build đầy đủ sau có cùng dữ liệu
+    edgelist_path = data_io.append_table(delta, 'data/edgelist.csv')
+    print(f"  ✓ Đã nối batch vào: {edgelist_path}")
+
+    print("\n" + "="*80)
+    print("HOÀN TẤT CẬP NHẬT INCREMENTAL!")
+    print("="*80)
+
+    return df_features, features_dict
+
+
+if __name__ == "__main__":
+    df_features, features_dict = update_network_features()
@@ -0,0 +1,3 @@
+"""
+Shared utilities for the SNA/ and Fraud_SupplyChain/ pipelines
+"""
@@ -0,0 +1,120 @@
+"""
+Read/write artifacts exchanged between pipeline stages
+Supports CSV (default), Parquet and Arrow IPC (memory-mapped on read)
+"""
+import os
+import pandas as pd
+
+# Default artifact format for every stage: 'csv', 'parquet' or 'arrow'
+ARTIFACT_FORMAT = 'csv'
+
+EXTENSIONS = {
+    'csv': '.csv',
+    'parquet': '.parquet',
+    'arrow': '.arrow'
+}
+
+
+def _require_pyarrow(fmt):
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise ImportError(
+            f"Format '{fmt}' requires pyarrow. Install it with: pip install pyarrow "
+            f"(or set ARTIFACT_FORMAT = 'csv')"
+        )
+
+
+def format_of(path):
+    """Infer the artifact format from the file extension"""
+    ext = os.path.splitext(path)[1].lower()
+    for fmt, fmt_ext in EXTENSIONS.items():
+        if ext == fmt_ext:
+            return fmt
+    if ext == '.feather':
+        return 'arrow'
+    raise ValueError(f"Unknown artifact format: {path}")
+
+
+def artifact_path(path, fmt=ARTIFACT_FORMAT):
+    """Swap the extension of path for the given format (data/x.csv -> data/x.parquet)"""
+    if fmt not in EXTENSIONS:
+        raise ValueError(f"fmt must be one of {list(EXTENSIONS)}, got: {fmt!r}")
+    return os.path.splitext(path)[0] + EXTENSIONS[fmt]
+
+
+def resolve_path(path, fmt=ARTIFACT_FORMAT):
+    """
+    Find the artifact file that actually exists for path
+
+    Order of preference: the `fmt` version, `path` itself, then the other formats.
+    Returns None if none of them exists.
+    """
+    candidates = [artifact_path(path, fmt), path]
+    candidates += [artifact_path(path, other) for other in EXTENSIONS if other != fmt]
+    for candidate in candidates:
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+
+def table_exists(path, fmt=ARTIFACT_FORMAT):
+    return resolve_path(path, fmt) is not None
+
+
+def write_table(df, path, fmt=ARTIFACT_FORMAT):
+    """Write df in format `fmt` and return the path written"""
+    out_path = artifact_path(path, fmt)
+    if fmt == 'csv':
+        df.to_csv(out_path, index=False)
+    elif fmt == 'parquet':
+        _require_pyarrow(fmt)
+        df.to_parquet(out_path, index=False)
+    else:
+        _require_pyarrow(fmt)
+        from pyarrow import feather
+        # Uncompressed so that memory-mapped reads need no decompression
+        feather.write_feather(df.reset_index(drop=True), out_path, compression='uncompressed')
+    return out_path
+
+
+def read_table(path, columns=None, fmt=ARTIFACT_FORMAT):
+    """
+    Read an artifact (CSV/Parquet/Arrow) written by write_table
+
+    Args:
+        path: base path (e.g. 'data/edgelist.csv'); a Parquet/Arrow file with the same
+              name is picked up automatically
+        columns: only read these columns (None = all)
+        fmt: preferred format when several versions exist
+    """
+    in_path = resolve_path(path, fmt)
+    if in_path is None:
+        raise FileNotFoundError(f"Artifact not found: {path}")
+
+    in_fmt = format_of(in_path)
+    if in_fmt == 'csv':
+        return pd.read_csv(in_path, usecols=columns)
+
+    _require_pyarrow(in_fmt)
+    if in_fmt == 'parquet':
+        return pd.read_parquet(in_path, columns=columns, memory_map=True)
+
+    from pyarrow import feather
+    return feather.read_table(in_path, columns=columns, memory_map=True).to_pandas()
+
+
+def append_table(df, path, fmt=ARTIFACT_FORMAT):
+    """Append rows to an artifact (CSV is appended in place, Parquet/Arrow are rewritten)"""
+    in_path = resolve_path(path, fmt)
+    if in_path is None:
+        return write_table(df, path, fmt)
+
+    in_fmt = format_of(in_path)
+    if in_fmt == 'csv':
+        columns = pd.read_csv(in_path, nrows=0).columns
+        df[columns].to_csv(in_path, mode='a', header=False, index=False)
+        return in_path
+
+    existing = read_table(in_path, fmt=in_fmt)
+    return write_table(pd.concat([existing, df[existing.columns]], ignore_index=True), in_path, in_fmt)
@@ -0,0 +1,179 @@
+"""
+Shared ingest for the raw DataCo CSV
+Parses only the needed columns with explicit dtypes and keeps a binary snapshot
+keyed by the source file's hash, so every script after the first skips the CSV parse
+"""
+import os
+import json
+import hashlib
+import pandas as pd
+
+RAW_ENCODING = 'latin-1'
+
+# Explicit dtypes for the raw columns used by the pipeline; other columns are inferred
+RAW_DTYPES = {
+    'Customer Id': 'int32',
+    'Product Card Id': 'int32',
+    'Product Category Id': 'int32',
+    'Order Item Quantity': 'int64',
+    'Late_delivery_risk': 'int64',
+    'Days for shipping (real)': 'int64',
+    'Days for shipment (scheduled)': 'int64',
+    'Benefit per order': 'float64',
+    'Order Profit Per Order': 'float64',
+    'Order Item Profit Ratio': 'float64',
+    'Sales': 'float64',
+    'Order Item Total': 'float64',
+    'Order Item Discount': 'float64',
+    'Order Item Discount Rate': 'float64',
+    'Product Price': 'float64',
+    'Type': 'category',
+    'Delivery Status': 'category',
+    'Shipping Mode': 'category',
+    'Customer Segment': 'category',
+    'Market': 'category',
+    'Category Name': 'category',
+    'Department Name': 'category',
+    'Order Status': 'category',
+    'Product Status': 'category',
+}
+
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def raw_columns(path):
+    """Column names of the raw CSV (reads the header only)"""
+    return pd.read_csv(path, encoding=RAW_ENCODING, nrows=0).columns.tolist()
+
+
+def raw_dtypes(columns):
+    """Explicit dtypes for the given raw columns"""
+    return {col: RAW_DTYPES[col] for col in columns if col in RAW_DTYPES}
+
+
+def file_hash(path):
+    """
+    SHA-256 of the source file (first 16 hex chars)
+
+    The digest is memoized next to the cache keyed by size + mtime, so an unchanged
+    file is not re-hashed on every run.
+    """
+    stat = os.stat(path)
+    memo_path = os.path.join(cache_dir_for(path), os.path.basename(path) + '.hash.json')
+    if os.path.exists(memo_path):
+        with open(memo_path) as f:
+            memo = json.load(f)
+        if memo.get('size') == stat.st_size and memo.get('mtime') == stat.st_mtime:
+            return memo['hash']
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(block)
+    file_digest = digest.hexdigest()[:16]
+
+    os.makedirs(os.path.dirname(memo_path), exist_ok=True)
+    with open(memo_path, 'w') as f:
+        json.dump({'size': stat.st_size, 'mtime': stat.st_mtime, 'hash': file_digest}, f)
+    return file_digest
+
+
+def cache_dir_for(path):
+    return os.path.join(os.path.dirname(os.path.abspath(path)), '.cache')
+
+
+def _snapshot_path(path, digest):
+    try:
+        import pyarrow  # noqa: F401
+        ext = '.arrow'
+    except ImportError:
+        ext = '.pkl'
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_dir_for(path), f'{stem}_{digest}{ext}')
+
+
+def _read_snapshot(snapshot_path, columns=None):
+    if snapshot_path.endswith('.arrow'):
+        from pyarrow import feather
+        return feather.read_table(snapshot_path, columns=columns, memory_map=True).to_pandas()
+    df = pd.read_pickle(snapshot_path)
+    return df if columns is None else df[columns]
+
+
+def _snapshot_columns(snapshot_path):
+    if snapshot_path.endswith('.arrow'):
+        import pyarrow as pa
+        with pa.memory_map(snapshot_path) as source:
+            return pa.ipc.open_file(source).schema.names
+    return pd.read_pickle(snapshot_path).columns.tolist()
+
+
+def _write_snapshot(df, snapshot_path):
+    os.makedirs(os.path.dirname(snapshot_path), exist_ok=True)
+    tmp_path = snapshot_path + '.tmp'
+    if snapshot_path.endswith('.arrow'):
+        from pyarrow import feather
+        feather.write_feather(df, tmp_path, compression='uncompressed')
+    else:
+        df.to_pickle(tmp_path)
+    os.replace(tmp_path, snapshot_path)
+
+
+def iter_raw_chunks(path, columns=None, chunksize=500_000):
+    """
+    Stream the raw DataCo CSV in chunks of `chunksize` rows (bypasses the snapshot cache)
+
+    For datasets that do not fit in memory; every chunk gets the same explicit dtypes.
+    """
+    header = raw_columns(path)
+    if columns is None:
+        columns = header
+    columns = [col for col in columns if col in header]
+
+    reader = pd.read_csv(path, encoding=RAW_ENCODING, usecols=columns,
+                         dtype=raw_dtypes(columns), chunksize=chunksize)
+    for chunk in reader:
+        yield chunk[columns]
+
+
+def load_raw_dataset(path, columns=None):
+    """
+    Load the raw DataCo CSV through the shared snapshot cache
+
+    The snapshot holds every column requested so far for this exact file content.
+    A request for a column the snapshot lacks re-parses the CSV once with the union of
+    columns and replaces the snapshot; stale snapshots of older file versions are removed.
+
+    Args:
+        path: path to DataCoSupplyChainDataset.csv
+        columns: columns to load (None = all columns); names missing from the file are skipped
+
+    Returns:
+        DataFrame with the requested columns in the requested order
+    """
+    header = raw_columns(path)
+    if columns is None:
+        columns = header
+    columns = [col for col in columns if col in header]
+
+    digest = file_hash(path)
+    snapshot_path = _snapshot_path(path, digest)
+
+    cached = _snapshot_columns(snapshot_path) if os.path.exists(snapshot_path) else []
+    if all(col in cached for col in columns):
+        print(f"  (cache) {os.path.basename(snapshot_path)}")
+        return _read_snapshot(snapshot_path, columns)
+
+    usecols = cached + [col for col in columns if col not in cached]
+    df = pd.read_csv(path, encoding=RAW_ENCODING, usecols=usecols, dtype=raw_dtypes(usecols))
+    df = df[[col for col in header if col in usecols]]
+
+    # Drop snapshots of previous versions of the same file before writing the new one
+    stem = os.path.splitext(os.path.basename(path))[0] + '_'
+    for name in os.listdir(cache_dir_for(path)):
+        old_path = os.path.join(cache_dir_for(path), name)
+        if name.startswith(stem) and old_path != snapshot_path and not name.endswith('.json'):
+            os.remove(old_path)
+    _write_snapshot(df, snapshot_path)
+
+    return df[columns]